@@ -2,6 +2,8 @@ from django.contrib import admin
 from leaflet.admin import LeafletGeoAdmin
 
 from wps import models
+from wps.utils.jobs import requeue_jobs
+from wps.utils.water_balance import refresh_permit_allocations
 
 
 @admin.register(models.NaceCode)
@@ -65,11 +67,21 @@ class DischargePointWaterUseAdmin(WaterUseAdmin):
     list_display = ('discharge_point', ) + WaterUseAdmin.list_display
 
 
+class PermitMonthlyValueInline(admin.TabularInline):
+    model = models.PermitMonthlyValue
+    extra = 0
+
+
 @admin.register(models.Permit)
 class PermitAdmin(LeafletGeoAdmin):
     list_display = ('submitted_on', 'submitted_by', 'validated_on', 'validated_by', 'status')
     list_filter = ('status', 'submitted_on', 'validated_on')
     read_only_fields = ('uid', )
+    inlines = (PermitMonthlyValueInline, )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_permit_allocations(form.instance)
 
 
 @admin.register(models.SurfaceWaterBody)
@@ -96,3 +108,27 @@ class NodeFlowMeasurementAdmin(LeafletGeoAdmin):
 @admin.register(models.Wetland)
 class WetlandAdmin(LeafletGeoAdmin):
     list_display = ('name', )
+
+
+@admin.register(models.WaterBodyMonthlyAllocation)
+class WaterBodyMonthlyAllocationAdmin(admin.ModelAdmin):
+    list_display = ('water_body', 'kind', 'month', 'total_m3', 'total_m3s', 'updated_on')
+    list_filter = ('kind', 'month')
+
+
+@admin.register(models.OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'created_on', 'sent_on')
+    list_filter = ('status', )
+    search_fields = ('subject', 'recipients')
+
+
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'status', 'attempts', 'created_on', 'available_on', 'finished_on')
+    list_filter = ('kind', 'status')
+    actions = ['requeue']
+
+    @admin.action(description='Queue selected jobs again')
+    def requeue(self, request, queryset):
+        self.message_user(request, '{} jobs queued'.format(requeue_jobs(queryset)))
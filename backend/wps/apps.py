@@ -13,6 +13,7 @@ class WpsConfig(AppConfig):
     def ready(self):
         try:
             import wps.signals  # noqa
+            import wps.tasks  # noqa
         except ProgrammingError as e:
             custom_error_msg = "Error when importing wps signals. Make sure all migrations are applied"
             logger.critical("{}\nVerbose: {}".format(custom_error_msg, str(e)))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from wps.models import WaterBodyNode
+from wps.utils.flow_statistics import refresh_flow_statistics
+
+
+class Command(BaseCommand):
+    help = """
+        Recompute monthly flow statistics (Q50, Q95, environmental flow, WAFU) from daily flows
+        usage: python manage.py compute_flow_statistics [--node NODE_ID ...]
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--node', type=int, nargs='+', help='Node IDs to recompute (default: all)')
+
+    def handle(self, *args, **options):
+        node_ids = None
+        if options['node']:
+            node_ids = WaterBodyNode.objects.filter(node_id__in=options['node']).values_list('pk', flat=True)
+
+        count = refresh_flow_statistics(node_ids)
+
+        self.stdout.write(self.style.SUCCESS('{} monthly flow statistics computed successfully'.format(count)))
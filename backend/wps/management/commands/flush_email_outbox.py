@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from wps.utils.outbox import FLUSH_BATCH_SIZE, MAX_ATTEMPTS, flush_outbox
+
+
+class Command(BaseCommand):
+    help = """
+        Send queued e-mails from the outbox (retries failed ones with backoff)
+        usage: python manage.py flush_email_outbox [--batch-size 100] [--interval 30]
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=FLUSH_BATCH_SIZE, help='Number of e-mails sent in one transaction')
+        parser.add_argument(
+            '--max-attempts', type=int, default=MAX_ATTEMPTS, help='Attempts before an e-mail is marked as failed')
+        parser.add_argument(
+            '--interval', type=int, help='Keep running and flush every <interval> seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            stats = flush_outbox(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+            self.stdout.write('{} sent, {} to retry, {} failed'.format(stats['sent'], stats['retried'], stats['failed']))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('E-mail outbox flushed successfully'))
@@ -0,0 +1,172 @@
+import io
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(__file__), 'geodata', 'manifest.json')
+
+# the manifest may live in the (read-only) package, checkpoints are kept with the data
+CHECKPOINT_DIR = os.path.join(settings.DATA_DIR, 'import')
+
+
+def run_layer(command, args):
+    """
+        Run import command in a worker process.
+
+        Returns: (elapsed seconds, command output)
+    """
+
+    started = time.monotonic()
+    stdout = io.StringIO()
+    try:
+        call_command(command, *args, stdout=stdout)
+    finally:
+        connections.close_all()
+    return time.monotonic() - started, stdout.getvalue()
+
+
+def load_manifest(path):
+    with open(path) as f:
+        layers = json.load(f)['layers']
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for name, layer in layers.items():
+        if 'command' not in layer:
+            raise CommandError('Layer "{}" has no command'.format(name))
+
+        # file arguments are relative to the manifest
+        layer['args'] = [
+            os.path.join(base_dir, arg) if not arg.startswith('-') and os.path.exists(os.path.join(base_dir, arg))
+            else arg for arg in layer.get('args', [])
+        ]
+        layer['depends_on'] = layer.get('depends_on', [])
+
+        for dependency in layer['depends_on']:
+            if dependency not in layers:
+                raise CommandError('Layer "{}" depends on unknown layer "{}"'.format(name, dependency))
+
+    return layers
+
+
+def check_acyclic(layers):
+    done = set()
+    while len(done) < len(layers):
+        ready = [name for name, layer in layers.items() if name not in done and set(layer['depends_on']) <= done]
+        if not ready:
+            raise CommandError('Dependency cycle between layers: {}'.format(', '.join(sorted(set(layers) - done))))
+        done.update(ready)
+
+
+class Command(BaseCommand):
+    help = """
+        Import all layers from a manifest, running independent layers in parallel worker processes
+        usage: python manage.py import_all [path/to/manifest.json] [--workers 4] [--resume]
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'manifest', type=str, nargs='?', default=DEFAULT_MANIFEST, help='Path to the JSON manifest')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+        parser.add_argument(
+            '--checkpoint', type=str,
+            help='Path to the checkpoint file, written with --resume or when given (default: in DATA_DIR/import)')
+        parser.add_argument(
+            '--resume', action='store_true', help='Skip layers completed by the previous run')
+
+    def get_checkpoint_path(self, options):
+        if options['checkpoint']:
+            return options['checkpoint']
+
+        name = os.path.splitext(os.path.basename(options['manifest']))[0]
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        return os.path.join(CHECKPOINT_DIR, '{}.checkpoint.json'.format(name))
+
+    def read_checkpoint(self, path):
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def write_checkpoint(self, path, completed):
+        # write to a temporary file first so an interrupted run never leaves a broken checkpoint
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(completed, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def handle(self, *args, **options):
+        layers = load_manifest(options['manifest'])
+        check_acyclic(layers)
+
+        # without --resume or --checkpoint the run keeps no state
+        checkpoint = None
+        if options['resume'] or options['checkpoint']:
+            checkpoint = self.get_checkpoint_path(options)
+
+        completed = self.read_checkpoint(checkpoint) if options['resume'] else {}
+        completed = {name: value for name, value in completed.items() if name in layers}
+        if checkpoint:
+            self.write_checkpoint(checkpoint, completed)
+
+        for name in completed:
+            self.stdout.write('Skipping {} (completed on {})'.format(name, completed[name]['finished_on']))
+
+        failed = set()
+        running = {}
+        started = time.monotonic()
+
+        # workers are forked, they must not share DB connections with this process
+        connections.close_all()
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                for name, layer in layers.items():
+                    if name in completed or name in failed or name in running.values():
+                        continue
+                    if any(dependency in failed for dependency in layer['depends_on']):
+                        failed.add(name)
+                        self.stdout.write(self.style.ERROR('Skipping {}, a dependency failed'.format(name)))
+                    elif all(dependency in completed for dependency in layer['depends_on']):
+                        self.stdout.write('Starting {}'.format(name))
+                        running[executor.submit(run_layer, layer['command'], layer['args'])] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        elapsed, output = future.result()
+                    except Exception as e:
+                        failed.add(name)
+                        self.stdout.write(self.style.ERROR('{} failed: {}'.format(name, e)))
+                        continue
+
+                    self.stdout.write(output.rstrip())
+                    self.stdout.write('{} finished in {:.1f}s'.format(name, elapsed))
+                    completed[name] = {'finished_on': datetime.now().isoformat(), 'seconds': round(elapsed, 1)}
+                    if checkpoint:
+                        self.write_checkpoint(checkpoint, completed)
+
+        # layers depending (transitively) on a failed layer
+        failed.update(set(layers) - set(completed))
+
+        self.stdout.write('Stage timings:')
+        for name, value in completed.items():
+            self.stdout.write('  {:<30} {:>8.1f}s'.format(name, value['seconds']))
+        self.stdout.write('Total wall time: {:.1f}s'.format(time.monotonic() - started))
+
+        if failed:
+            hint = 'Re-run with --resume to continue.' if checkpoint else 'Run with --resume to keep completed layers.'
+            raise CommandError('Import failed for: {}. {}'.format(', '.join(sorted(failed)), hint))
+
+        self.stdout.write(self.style.SUCCESS('All layers imported successfully'))
@@ -2,7 +2,9 @@ import json
 
 from django.contrib.gis.geos import Point
 from django.core.management.base import BaseCommand
-from wps.models import GaugingStation, SurfaceWaterBody
+from wps.models import GaugingStation
+from wps.utils.layer_cache import batch_layer_bumps, bump_layer_version
+from wps.utils.spatial_join import spatial_join
 
 
 class Command(BaseCommand):
@@ -20,15 +22,20 @@ class Command(BaseCommand):
         with open(file_path) as f:
             data = json.load(f)
 
-        for obj in data:
-            geom = Point(obj['coordinates'])
-            water_body = SurfaceWaterBody.objects.filter(buffer200__intersects=geom).first()
+        # one layer bump for all stations instead of one per saved row
+        with batch_layer_bumps():
+            for obj in data:
+                geom = Point(obj['coordinates'])
 
-            gs, _ = GaugingStation.objects.get_or_create(
-                name=obj['name'],
-                altitude=obj['altitude'],
-                geom=geom,
-                water_body=water_body
-            )
+                gs, _ = GaugingStation.objects.get_or_create(
+                    name=obj['name'],
+                    altitude=obj['altitude'],
+                    geom=geom
+                )
+
+            # water bodies of all stations in one statement
+            spatial_join('gauging-station-water-body')
+
+            bump_layer_version('gauging-stations')
 
         self.stdout.write(self.style.SUCCESS('Gauging stations imported successfully!'))
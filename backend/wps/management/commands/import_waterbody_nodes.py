@@ -1,34 +1,25 @@
-import json
-
 from django.contrib.gis.geos import Point
-from django.core.management.base import BaseCommand
-from wps.models import WaterBodyNode
+from wps.models import AbstractionPoint, WaterBodyNode
+from wps.utils.importers import FeatureImportCommand
 
 
-class Command(BaseCommand):
+class Command(FeatureImportCommand):
     help = """
         Import waterbody nodes from GeoJSON to DB
         usage: python manage.py import_waterbody_nodes.py
     """
 
-    def add_arguments(self, parser):
-        parser.add_argument('file_path', type=str, help='Path to the JSON file')
-
-    def handle(self, *args, **options):
-        file_path = options['file_path']
-
-        with open(file_path) as f:
-            data = json.load(f)
-
-        features = data['features']
-
-        for obj in features:
-            geom = Point(obj['geometry']['coordinates'])
-            node_id = obj['properties']['Id']
+    model = WaterBodyNode
+    source_id_property = 'Id'
+    fields = ('node_id', 'geom')
+    layer = 'waterbody-nodes'
 
-            WaterBodyNode.objects.get_or_create(
-                node_id=node_id,
-                geom=geom,
-            )
+    def build_object(self, feature):
+        geom = Point(feature['geometry']['coordinates'])
+        node_id = feature['properties']['Id']
+        return WaterBodyNode(node_id=node_id, geom=geom)
 
-        self.stdout.write(self.style.SUCCESS('Waterbody nodes imported successfully!'))
+    def after_import(self, stats):
+        # bulk_update does not send post_save, moved nodes may change the nearest node of abstraction points
+        if stats['updated'] or stats['deleted']:
+            AbstractionPoint.objects.exclude(water_body=None).refresh_nearest_node()
@@ -1,42 +1,74 @@
 import json
 from datetime import datetime
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from wps.models import NodeFlowMeasurement, WaterBodyNode
 
 
 class Command(BaseCommand):
     help = """
-        Import data for waterbody nodes from JSON to DB
-        usage: python manage.py import_waterbody_nodes_flows path/to/file.json
+        Import data for waterbody nodes from JSON to DB, one file per hydrological year
+        usage: python manage.py import_waterbody_nodes_flows path/to/2022.json path/to/2023.json --year 2022 2023
     """
 
     def add_arguments(self, parser):
-        parser.add_argument('file_path', type=str, help='Path to the JSON file')
+        parser.add_argument('file_path', type=str, nargs='+', help='Path to the JSON file')
+        parser.add_argument(
+            '--year', type=int, nargs='+', default=[2023], help='Hydrological year of each file')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000, help='Number of measurements written at once')
 
     def handle(self, *args, **options):
-        file_path = options['file_path']
-
-        with open(file_path) as f:
-            data = json.load(f)
-
-        for obj in data:
-            for month_name, values in obj.items():
-                month = datetime.strptime('2023-{}'.format(month_name), '%Y-%B')
-                for node in values:
-                    node_id = node['node_id']
-
-                    node_obj = WaterBodyNode.objects.get(node_id=node_id)
-                    q50 = node['q50']
-                    q95 = node['q95']
-                    wafu = node['wafu']
-
-                    NodeFlowMeasurement.objects.get_or_create(
-                        month=month,
-                        node=node_obj,
-                        q50_value=q50,
-                        ef_value=q95,
-                        wafu_value=wafu
-                    )
-
-        self.stdout.write(self.style.SUCCESS('Node flows imported successfully!'))
+        file_paths = options['file_path']
+        years = options['year']
+
+        if len(years) != len(file_paths):
+            raise CommandError('One year is required for each file')
+
+        try:
+            nodes = WaterBodyNode.objects.pks_by_node_id()
+        except ValueError as e:
+            raise CommandError(e)
+
+        # (node, month) -> measurement, the last value in the files wins
+        measurements = {}
+        missing = set()
+
+        for file_path, year in zip(file_paths, years):
+            with open(file_path) as f:
+                data = json.load(f)
+
+            for obj in data:
+                for month_name, values in obj.items():
+                    month = datetime.strptime('{}-{}'.format(year, month_name), '%Y-%B').date()
+                    for node in values:
+                        node_pk = nodes.get(node['node_id'])
+                        if node_pk is None:
+                            missing.add(node['node_id'])
+                            continue
+
+                        measurements[(node_pk, month)] = NodeFlowMeasurement(
+                            month=month,
+                            node_id=node_pk,
+                            q50_value=node['q50'],
+                            ef_value=node['q95'],
+                            wafu_value=node['wafu']
+                        )
+
+        with transaction.atomic():
+            NodeFlowMeasurement.objects.bulk_create(
+                measurements.values(),
+                batch_size=options['batch_size'],
+                update_conflicts=True,
+                # computed statistics of the same month are stored separately and kept
+                unique_fields=['node', 'month', 'computed'],
+                update_fields=['q50_value', 'ef_value', 'wafu_value']
+            )
+
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                '{} unknown nodes skipped: {}'.format(len(missing), ', '.join(str(n) for n in sorted(missing)))))
+
+        self.stdout.write(self.style.SUCCESS(
+            '{} node flows imported successfully!'.format(len(measurements))))
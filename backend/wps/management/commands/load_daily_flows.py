@@ -0,0 +1,56 @@
+import csv
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from wps.models import WaterBodyNode
+from wps.utils.flow_statistics import ingest_daily_flows
+
+
+class Command(BaseCommand):
+    help = """
+        Import daily flows of waterbody nodes from CSV (node_id,date,value) to DB and recompute
+        flow statistics of the affected nodes and months
+        usage: python manage.py load_daily_flows path/to/flows.csv
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_path', type=str, help='Path to the CSV file')
+
+    def handle(self, *args, **options):
+        try:
+            nodes = WaterBodyNode.objects.pks_by_node_id()
+        except ValueError as e:
+            raise CommandError(e)
+
+        rows = []
+        missing = set()
+        invalid = []
+
+        with open(options['file_path'], newline='') as f:
+            reader = csv.DictReader(f)
+            for record in reader:
+                try:
+                    node_id = int(record['node_id'])
+                    row = (date.fromisoformat(record['date']), float(record['value']))
+                except (KeyError, TypeError, ValueError):
+                    invalid.append(reader.line_num)
+                    continue
+
+                node_pk = nodes.get(node_id)
+                if node_pk is None:
+                    missing.add(node_id)
+                    continue
+                rows.append((node_pk, *row))
+
+        if invalid:
+            self.stdout.write(self.style.WARNING(
+                '{} invalid rows skipped, lines: {}'.format(len(invalid), ', '.join(str(n) for n in invalid[:100]))))
+
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                '{} unknown nodes skipped: {}'.format(len(missing), ', '.join(str(n) for n in sorted(missing)))))
+
+        count = ingest_daily_flows(rows)
+
+        self.stdout.write(self.style.SUCCESS(
+            '{} daily flows imported, {} monthly statistics recomputed'.format(len(rows), count)))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from wps.utils.telemetry import BATCH_SIZE, FORMATS, iter_records, load_water_heights
+
+
+class Command(BaseCommand):
+    help = """
+        Load water height readings of gauging stations from CSV (station,measured_on,value) or NDJSON to the DB
+        usage: python manage.py load_water_heights path/to/readings.csv [--format csv] [--batch-size 100000]
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_path', type=str, help='Path to the CSV or NDJSON file')
+        parser.add_argument('--format', choices=FORMATS, help='File format (default: from the file extension)')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE, help='Number of readings loaded by a single COPY')
+
+    def handle(self, *args, **options):
+        file_path = options['file_path']
+        fmt = options['format'] or file_path.rsplit('.', 1)[-1].lower()
+
+        if fmt not in FORMATS:
+            raise CommandError('Unknown format "{}", use --format'.format(fmt))
+
+        accepted = 0
+        rejected = 0
+        started = time.monotonic()
+
+        with open(file_path, newline='') as f:
+            for batch in load_water_heights(iter_records(f, fmt), batch_size=options['batch_size']):
+                accepted += batch['accepted']
+                rejected += batch['rejected']
+                elapsed = time.monotonic() - started
+
+                self.stdout.write('Batch {}: {} accepted, {} rejected ({:.0f} readings/s)'.format(
+                    batch['batch'], batch['accepted'], batch['rejected'], (accepted + rejected) / elapsed))
+                for error in batch['errors']:
+                    self.stdout.write(self.style.WARNING('  record {}: {}'.format(error['record'], error['error'])))
+
+        self.stdout.write(self.style.SUCCESS(
+            '{} readings loaded, {} rejected in {:.1f}s'.format(accepted, rejected, time.monotonic() - started)))
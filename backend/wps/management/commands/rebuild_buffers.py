@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from wps.models import BUFFER_DISTANCE, BUFFER_SRID, SurfaceWaterBody
+from wps.utils.layer_cache import bump_layer_version
+from wps.utils.spatial_index import water_body_index
+
+
+class Command(BaseCommand):
+    help = """
+        Recompute buffers of all surface water bodies in the DB
+        usage: python manage.py rebuild_buffers [--distance 200] [--srid 32634]
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--distance', type=float, default=BUFFER_DISTANCE, help='Buffer distance in meters')
+        parser.add_argument(
+            '--srid', type=int, default=BUFFER_SRID, help='Metric projection used for buffering')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = SurfaceWaterBody.objects.all().refresh_buffers(options['distance'], options['srid'])
+
+        water_body_index.invalidate()
+        bump_layer_version('water-bodies')
+
+        self.stdout.write(self.style.SUCCESS('Buffers of {} water bodies rebuilt successfully'.format(count)))
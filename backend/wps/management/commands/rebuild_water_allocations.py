@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from wps.models import WaterBodyMonthlyAllocation
+from wps.utils.water_balance import KINDS, MONTHS, compute_allocated_totals
+
+
+class Command(BaseCommand):
+    help = """
+        Rebuild materialized water body monthly allocations from permits and report drift
+        usage: python manage.py rebuild_water_allocations [--dry-run]
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Only report drift, do not rewrite the allocation table')
+
+    def handle(self, *args, **options):
+        stored = {
+            (wb_id, kind, month): (total_m3, total_m3s)
+            for wb_id, kind, month, total_m3, total_m3s in WaterBodyMonthlyAllocation.objects.values_list(
+                'water_body', 'kind', 'month', 'total_m3', 'total_m3s')
+        }
+
+        expected = {}
+        for kind in KINDS.keys():
+            for wb_id, wb_totals in compute_allocated_totals(kind=kind).items():
+                for month in MONTHS:
+                    expected[(wb_id, kind, int(month))] = (wb_totals['m3'][month], wb_totals['m3s'][month])
+
+        drift = 0
+        for key in set(stored) | set(expected):
+            stored_values = stored.get(key, (0, 0))
+            expected_values = expected.get(key, (0, 0))
+            if any(abs(a - b) > 1e-6 for a, b in zip(stored_values, expected_values)):
+                drift += 1
+                self.stdout.write(
+                    'Drift for water body {} ({}, month {}): stored {} - expected {}'.format(
+                        key[0], key[1], key[2], stored_values, expected_values))
+
+        self.stdout.write('{} drifted rows found'.format(drift))
+
+        if options['dry_run']:
+            return
+
+        objs = [
+            WaterBodyMonthlyAllocation(
+                water_body_id=wb_id, kind=kind, month=month, total_m3=total_m3, total_m3s=total_m3s)
+            for (wb_id, kind, month), (total_m3, total_m3s) in expected.items()
+        ]
+
+        with transaction.atomic():
+            WaterBodyMonthlyAllocation.objects.all().delete()
+            WaterBodyMonthlyAllocation.objects.bulk_create(objs)
+
+        self.stdout.write(self.style.SUCCESS('Water body allocations rebuilt successfully'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from wps.utils.spatial_join import SPATIAL_JOINS, relink_spatial
+
+
+class Command(BaseCommand):
+    help = """
+        Reassign spatial parents (sub-basin basins, gauging station water bodies, point sub-basins)
+        usage: python manage.py relink_spatial [--only subbasin-basin ...]
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only', nargs='+', choices=list(SPATIAL_JOINS.keys()), help='Spatial joins to run (default: all)')
+
+    def handle(self, *args, **options):
+        for name, count in relink_spatial(options['only']).items():
+            self.stdout.write('{}: {} rows changed'.format(name, count))
+
+        self.stdout.write(self.style.SUCCESS('Spatial links rebuilt successfully'))
@@ -0,0 +1,87 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from wps.tasks import PDF_JOB_KINDS
+from wps.utils.jobs import JOB_HANDLERS, prune_jobs, run_pending_jobs
+from wps.utils.pdf import PDF_WORKERS
+
+# Seconds between deleting old done jobs
+PRUNE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = """
+        Run queued background jobs (PDF rendering, e-mails), retrying failed ones with backoff.
+        PDF jobs run in their own worker threads (by default one per PDF render process),
+        so that e-mails are not queued behind renders.
+        usage: python manage.py run_jobs [--kind create_pdf] [--concurrency 2] [--interval 1] [--once]
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', action='append', choices=sorted(JOB_HANDLERS), help='Run only jobs of this kind (repeatable)')
+        parser.add_argument(
+            '--concurrency', type=int,
+            help='Number of worker threads for PDF jobs and for other jobs (default: PDF render processes and 1)')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds between polls when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once there are no due jobs')
+
+    def get_worker_kinds(self, options):
+        """
+            Job kinds of each worker thread. A PDF job waits for its render in the pool, at least
+            one thread per render process keeps the pool busy.
+        """
+
+        kinds = options['kind'] or sorted(JOB_HANDLERS)
+        pdf_kinds = [kind for kind in kinds if kind in PDF_JOB_KINDS]
+        other_kinds = [kind for kind in kinds if kind not in PDF_JOB_KINDS]
+
+        workers = []
+        if pdf_kinds:
+            workers += [pdf_kinds] * (options['concurrency'] or max(PDF_WORKERS, 1))
+        if other_kinds:
+            workers += [other_kinds] * (options['concurrency'] or 1)
+        return workers
+
+    def work(self, kinds, options, totals, lock):
+        try:
+            while True:
+                stats = run_pending_jobs(kinds=kinds)
+
+                with lock:
+                    for key, value in stats.items():
+                        totals[key] += value
+
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        totals = {'done': 0, 'retried': 0, 'dead': 0}
+        lock = threading.Lock()
+
+        workers = [
+            threading.Thread(target=self.work, args=(kinds, options, totals, lock), daemon=True)
+            for kinds in self.get_worker_kinds(options)
+        ]
+        for worker in workers:
+            worker.start()
+
+        pruned_on = None
+        try:
+            while any(worker.is_alive() for worker in workers):
+                if pruned_on is None or time.monotonic() - pruned_on > PRUNE_INTERVAL:
+                    prune_jobs()
+                    pruned_on = time.monotonic()
+                for worker in workers:
+                    worker.join(timeout=options['interval'])
+        except KeyboardInterrupt:
+            # running jobs are claimed again once their lease expires
+            self.stdout.write('Interrupted')
+
+        self.stdout.write('{} done, {} to retry, {} dead'.format(totals['done'], totals['retried'], totals['dead']))
+        self.stdout.write(self.style.SUCCESS('Jobs processed successfully'))
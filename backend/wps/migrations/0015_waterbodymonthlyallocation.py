@@ -0,0 +1,78 @@
+# Generated by Django 4.1 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+POPULATE_SQL = """
+INSERT INTO wps_waterbodymonthlyallocation (water_body_id, kind, month, total_m3, total_m3s, updated_on)
+SELECT
+  pt.water_body_id,
+  '{kind}',
+  m.month,
+  SUM(COALESCE((p.{kind}_m3_per_month ->> m.month::text)::float, 0)),
+  SUM(COALESCE((p.{kind}_m3s_per_month ->> m.month::text)::float, 0)),
+  now()
+FROM wps_{kind}point pt
+JOIN wps_permit_{kind}_points pp ON pp.{kind}point_id = pt.id
+JOIN wps_permit p ON p.id = pp.permit_id
+CROSS JOIN generate_series(1, 12) AS m(month)
+WHERE pt.approved AND pt.water_body_id IS NOT NULL
+GROUP BY pt.water_body_id, m.month;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wps", "0014_alter_surfacewaterbody_node1_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WaterBodyMonthlyAllocation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("abstraction", "Abstraction"),
+                            ("discharge", "Discharge"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                ("month", models.PositiveSmallIntegerField()),
+                ("total_m3", models.FloatField(default=0)),
+                ("total_m3s", models.FloatField(default=0)),
+                ("updated_on", models.DateTimeField(auto_now=True)),
+                (
+                    "water_body",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_allocations",
+                        to="wps.surfacewaterbody",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="waterbodymonthlyallocation",
+            constraint=models.UniqueConstraint(
+                fields=("water_body", "kind", "month"),
+                name="unique_water_body_kind_month",
+            ),
+        ),
+        migrations.RunSQL(
+            POPULATE_SQL.format(kind="abstraction") + POPULATE_SQL.format(kind="discharge"),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
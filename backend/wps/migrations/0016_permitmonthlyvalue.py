@@ -0,0 +1,188 @@
+# Generated by Django 4.1 on 2026-10-18 10:04
+
+import logging
+import math
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+logger = logging.getLogger(__name__)
+
+MONTHLY_QUANTITIES = [
+    "time_per_month",
+    "abstraction_m3_per_month",
+    "abstraction_m3s_per_month",
+    "discharge_m3_per_month",
+    "discharge_m3s_per_month",
+    "ev1_per_month",
+    "ev2_per_month",
+    "ev3_per_month",
+    "ev123_per_month",
+]
+
+
+def to_month(month):
+    try:
+        month = int(month)
+    except (TypeError, ValueError):
+        return None
+    return month if 1 <= month <= 12 else None
+
+
+def to_value(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def json_to_monthly_values(apps, schema_editor):
+    Permit = apps.get_model("wps", "Permit")
+    PermitMonthlyValue = apps.get_model("wps", "PermitMonthlyValue")
+
+    objs = []
+    for permit in Permit.objects.only("id", *MONTHLY_QUANTITIES).iterator():
+        for quantity in MONTHLY_QUANTITIES:
+            values = getattr(permit, quantity) or {}
+            if not isinstance(values, dict):
+                logger.warning("Permit %s: skipping %s, not a month object: %r", permit.id, quantity, values)
+                continue
+
+            months = set()
+            for month, value in values.items():
+                if value is None:
+                    continue
+
+                # legacy values were not validated, skip what can't be stored as a number
+                month_number, number = to_month(month), to_value(value)
+                if month_number is None or number is None or month_number in months:
+                    logger.warning(
+                        "Permit %s: skipping invalid %s value %r for month %r", permit.id, quantity, value, month)
+                    continue
+                months.add(month_number)
+
+                objs.append(
+                    PermitMonthlyValue(permit_id=permit.id, quantity=quantity, month=month_number, value=number))
+
+        if len(objs) >= 10000:
+            PermitMonthlyValue.objects.bulk_create(objs)
+            objs = []
+
+    PermitMonthlyValue.objects.bulk_create(objs)
+
+
+def monthly_values_to_json(apps, schema_editor):
+    Permit = apps.get_model("wps", "Permit")
+    PermitMonthlyValue = apps.get_model("wps", "PermitMonthlyValue")
+
+    data = {}
+    for permit_id, quantity, month, value in PermitMonthlyValue.objects.values_list(
+            "permit", "quantity", "month", "value"):
+        data.setdefault(permit_id, {}).setdefault(quantity, {})[str(month)] = value
+
+    for permit_id, values in data.items():
+        Permit.objects.filter(pk=permit_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wps", "0015_waterbodymonthlyallocation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PermitMonthlyValue",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.CharField(
+                        choices=[
+                            ("time_per_month", "Time per month"),
+                            ("abstraction_m3_per_month", "Abstraction m3 per month"),
+                            ("abstraction_m3s_per_month", "Abstraction m3/s per month"),
+                            ("discharge_m3_per_month", "Discharge m3 per month"),
+                            ("discharge_m3s_per_month", "Discharge m3/s per month"),
+                            ("ev1_per_month", "EV 1 per month"),
+                            ("ev2_per_month", "EV 2 per month"),
+                            ("ev3_per_month", "EV 3 per month"),
+                            ("ev123_per_month", "EV 1 2 3 per month"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                ("month", models.PositiveSmallIntegerField()),
+                ("value", models.FloatField()),
+                (
+                    "permit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_values",
+                        to="wps.permit",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="permitmonthlyvalue",
+            constraint=models.UniqueConstraint(
+                fields=("permit", "quantity", "month"),
+                name="unique_permit_quantity_month",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="permitmonthlyvalue",
+            index=models.Index(
+                fields=["quantity", "month"], name="permit_value_quantity_month"
+            ),
+        ),
+        migrations.RunPython(json_to_monthly_values, monthly_values_to_json),
+        migrations.RemoveField(
+            model_name="permit",
+            name="time_per_month",
+        ),
+        migrations.RemoveField(
+            model_name="permit",
+            name="abstraction_m3_per_month",
+        ),
+        migrations.RemoveField(
+            model_name="permit",
+            name="abstraction_m3s_per_month",
+        ),
+        migrations.RemoveField(
+            model_name="permit",
+            name="discharge_m3_per_month",
+        ),
+        migrations.RemoveField(
+            model_name="permit",
+            name="discharge_m3s_per_month",
+        ),
+        migrations.RemoveField(
+            model_name="permit",
+            name="ev1_per_month",
+        ),
+        migrations.RemoveField(
+            model_name="permit",
+            name="ev2_per_month",
+        ),
+        migrations.RemoveField(
+            model_name="permit",
+            name="ev3_per_month",
+        ),
+        migrations.RemoveField(
+            model_name="permit",
+            name="ev123_per_month",
+        ),
+    ]
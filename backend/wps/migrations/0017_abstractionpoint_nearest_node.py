@@ -0,0 +1,40 @@
+# Generated by Django 4.1 on 2026-10-18 13:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wps", "0016_permitmonthlyvalue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="abstractionpoint",
+            name="nearest_node",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="nearest_abstraction_points",
+                to="wps.waterbodynode",
+            ),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE wps_abstractionpoint ap
+            SET nearest_node_id = (
+              SELECT n.id
+              FROM wps_surfacewaterbody swb
+              JOIN wps_waterbodynode n ON n.id IN (swb.node1_id, swb.node2_id)
+              WHERE swb.id = ap.water_body_id
+              ORDER BY n.geom <-> ap.geom
+              LIMIT 1
+            )
+            WHERE ap.water_body_id IS NOT NULL;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.1 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+# (table, column holding the ID of the feature in the source dataset)
+SOURCE_KEYS = [
+    ("wps_basin", "name"),
+    ("wps_subbasin", "name"),
+    ("wps_waterbodynode", "node_id::text"),
+    ("wps_surfacewaterbody", "wb_code"),
+    ("wps_watercoursenetwork", "name"),
+    ("wps_wetland", "name"),
+]
+
+# duplicates created by earlier imports keep an empty source_id and are removed by `--delete-missing`
+POPULATE_SQL = """
+UPDATE {table} SET source_id = {key}
+WHERE id IN (
+  SELECT MIN(id) FROM {table} WHERE COALESCE({key}, '') <> '' GROUP BY {key}
+);
+"""
+
+
+def source_fields(model_name):
+    return [
+        migrations.AddField(
+            model_name=model_name,
+            name="source_id",
+            field=models.CharField(editable=False, max_length=128, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name=model_name,
+            name="content_hash",
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wps", "0017_abstractionpoint_nearest_node"),
+    ]
+
+    operations = [
+        *source_fields("basin"),
+        *source_fields("subbasin"),
+        *source_fields("waterbodynode"),
+        *source_fields("surfacewaterbody"),
+        *source_fields("watercoursenetwork"),
+        *source_fields("wetland"),
+        migrations.RunSQL(
+            [POPULATE_SQL.format(table=table, key=key) for table, key in SOURCE_KEYS],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
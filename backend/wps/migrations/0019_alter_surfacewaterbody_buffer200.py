@@ -0,0 +1,19 @@
+# Generated by Django 4.1 on 2026-10-18 14:31
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wps", "0018_source_ids"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="surfacewaterbody",
+            name="buffer200",
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, null=True, srid=4326),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+# keep the most recently imported measurement of every node and month
+DEDUPLICATE_SQL = """
+DELETE FROM wps_nodeflowmeasurement
+WHERE id NOT IN (
+  SELECT MAX(id) FROM wps_nodeflowmeasurement GROUP BY node_id, month
+);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wps", "0019_alter_surfacewaterbody_buffer200"),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPLICATE_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="nodeflowmeasurement",
+            constraint=models.UniqueConstraint(fields=("node", "month"), name="unique_node_month"),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.1 on 2026-10-18 15:48
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wps", "0020_nodeflowmeasurement_unique_node_month"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="permit",
+            name="uid",
+            field=models.UUIDField(db_index=True, default=uuid.uuid4, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="permit",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("denied", "Denied"),
+                    ("approved", "Approved"),
+                    ("archived", "Archived"),
+                ],
+                db_index=True,
+                default="pending",
+                max_length=128,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="abstractionpoint",
+            index=models.Index(
+                condition=models.Q(("approved", True)),
+                fields=["water_body"],
+                name="approved_abstraction_wb",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dischargepoint",
+            index=models.Index(
+                condition=models.Q(("approved", True)),
+                fields=["water_body"],
+                name="approved_discharge_wb",
+            ),
+        ),
+    ]
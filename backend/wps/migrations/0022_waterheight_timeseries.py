@@ -0,0 +1,36 @@
+# Generated by Django 4.1 on 2026-10-18 16:20
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+# keep the most recently stored reading of every station and timestamp
+DEDUPLICATE_SQL = """
+DELETE FROM wps_waterheight
+WHERE id NOT IN (
+  SELECT MAX(id) FROM wps_waterheight GROUP BY gauging_station_id, measured_on
+);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wps", "0021_query_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEDUPLICATE_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="waterheight",
+            constraint=models.UniqueConstraint(
+                fields=("gauging_station", "measured_on"),
+                name="unique_station_measured_on",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="waterheight",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["measured_on"], name="water_height_time_brin"
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1 on 2026-10-18 17:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wps", "0022_waterheight_timeseries"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="nodeflowmeasurement",
+            name="computed",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="NodeDailyFlow",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("value", models.FloatField()),
+                (
+                    "node",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_flows",
+                        to="wps.waterbodynode",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="nodedailyflow",
+            constraint=models.UniqueConstraint(fields=("node", "date"), name="unique_node_date"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wps", "0025_job_outboxemail_key"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="nodeflowmeasurement",
+            name="unique_node_month",
+        ),
+        migrations.AddConstraint(
+            model_name="nodeflowmeasurement",
+            constraint=models.UniqueConstraint(
+                fields=("node", "month", "computed"),
+                name="unique_node_month_computed",
+            ),
+        ),
+    ]
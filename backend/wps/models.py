@@ -3,13 +3,20 @@ import random
 import string
 import uuid
 
+from django.conf import settings
 from django.contrib.gis.db import models as geomodels
-from django.contrib.gis.geos import GeometryCollection
-from django.db import models
+from django.contrib.gis.db.models.aggregates import Collect
+from django.contrib.gis.db.models.functions import Centroid
+from django.contrib.gis.geos import GeometryCollection, GEOSGeometry
+from django.contrib.postgres.indexes import BrinIndex
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, models
+from django.db.models import Func, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 from wps.utils.storage import DataStorage
-from wps.validators import (validate_monthly_json_values,
-                            validate_point_within_water_body)
+from wps.validators import validate_point_within_water_body
 
 PERMIT_DATA_FS = DataStorage()
 
@@ -30,7 +37,19 @@ class WaterUseSector(models.Model):
         return self.name
 
 
-class Basin(models.Model):
+class BaseSourceFeature(models.Model):
+    """
+        Feature imported from an external GeoJSON dataset, identified by its ID in the source.
+    """
+
+    source_id = models.CharField(max_length=128, unique=True, null=True, editable=False)
+    content_hash = models.CharField(max_length=40, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+
+class Basin(BaseSourceFeature):
     name = models.CharField(max_length=128)
     geom = geomodels.PolygonField(srid=4326)
 
@@ -38,7 +57,7 @@ class Basin(models.Model):
         return self.name
 
 
-class SubBasin(models.Model):
+class SubBasin(BaseSourceFeature):
     name = models.CharField(max_length=128)
     geom = geomodels.PolygonField(srid=4326)
     basin = models.ForeignKey(Basin, null=True, on_delete=models.SET_NULL)
@@ -51,27 +70,99 @@ class SubBasin(models.Model):
         return self.name
 
 
-class WaterBodyNode(models.Model):
+class WaterBodyNodeQuerySet(models.QuerySet):
+
+    def pks_by_node_id(self):
+        """
+            {node_id: pk} of the nodes. node_id isn't unique, a node id shared by several
+            nodes raises ValueError instead of being mapped to an arbitrary node.
+        """
+
+        pks = {}
+        duplicates = set()
+        for node_id, pk in self.values_list('node_id', 'pk'):
+            if node_id in pks:
+                duplicates.add(node_id)
+            pks[node_id] = pk
+
+        if duplicates:
+            raise ValueError('Node ids used by several nodes: {}'.format(
+                ', '.join(str(node_id) for node_id in sorted(duplicates))))
+
+        return pks
+
+
+class WaterBodyNode(BaseSourceFeature):
     node_id = models.PositiveBigIntegerField()
     geom = geomodels.PointField(srid=4326, null=True)
 
+    objects = WaterBodyNodeQuerySet.as_manager()
+
     def __str__(self):
         return 'Node - {}'.format(self.node_id)
 
 
-class SurfaceWaterBody(models.Model):
+# Buffer around water courses (in meters), computed in a metric projection (UTM 34N covers Albania)
+BUFFER_DISTANCE = getattr(settings, 'WPS_BUFFER_DISTANCE', 200)
+BUFFER_SRID = getattr(settings, 'WPS_BUFFER_SRID', 32634)
+
+BUFFER_EXPRESSION = 'ST_Multi(ST_Transform(ST_Buffer(ST_Transform({}, %s), %s), 4326))'
+
+BUFFER_SQL = """
+UPDATE wps_surfacewaterbody
+SET buffer200 = {}
+WHERE id IN ({{}})
+""".format(BUFFER_EXPRESSION.format('geom'))
+
+
+def compute_buffer(geom, distance=BUFFER_DISTANCE, srid=BUFFER_SRID):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT ST_AsEWKB({})'.format(BUFFER_EXPRESSION.format('ST_GeomFromWKB(%s, 4326)')),
+            (bytes(geom.wkb), srid, distance))
+        return GEOSGeometry(bytes(cursor.fetchone()[0]))
+
+
+class SurfaceWaterBodyQuerySet(models.QuerySet):
+
+    def refresh_buffers(self, distance=BUFFER_DISTANCE, srid=BUFFER_SRID):
+        """
+            Compute buffer200 of all water bodies in one UPDATE.
+
+            Returns: number of updated water bodies
+        """
+
+        try:
+            sql, params = self.values('pk').query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+
+        with connection.cursor() as cursor:
+            cursor.execute(BUFFER_SQL.format(sql), (srid, distance, *params))
+            return cursor.rowcount
+
+
+class SurfaceWaterBody(BaseSourceFeature):
     name = models.CharField(max_length=128)
     wb_code = models.CharField(max_length=128, blank=True)
     geom = geomodels.MultiLineStringField()
-    buffer200 = geomodels.MultiPolygonField(srid=4326)
+    # computed from geom (BUFFER_DISTANCE meters) when empty
+    buffer200 = geomodels.MultiPolygonField(srid=4326, null=True, blank=True)
     node1 = models.ForeignKey(WaterBodyNode, related_name='swb_nodes1', on_delete=models.SET_NULL, blank=True, null=True)
     node2 = models.ForeignKey(WaterBodyNode, related_name='swb_nodes2', on_delete=models.SET_NULL, blank=True, null=True)
 
+    objects = SurfaceWaterBodyQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        if self.buffer200 is None and self.geom:
+            self.buffer200 = compute_buffer(self.geom)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
 
-class WaterCourseNetwork(models.Model):
+class WaterCourseNetwork(BaseSourceFeature):
     name = models.CharField(max_length=128)
     geom = geomodels.MultiLineStringField()
 
@@ -79,7 +170,7 @@ class WaterCourseNetwork(models.Model):
         return self.name
 
 
-class Wetland(models.Model):
+class Wetland(BaseSourceFeature):
     name = models.CharField(max_length=128)
     geom = geomodels.MultiPolygonField(srid=4326)
 
@@ -100,10 +191,55 @@ class AssessmentPoint(BaseWaterPoint):
     pass
 
 
+NEAREST_NODE_SQL = """
+UPDATE wps_abstractionpoint ap
+SET nearest_node_id = (
+  SELECT n.id
+  FROM wps_surfacewaterbody swb
+  JOIN wps_waterbodynode n ON n.id IN (swb.node1_id, swb.node2_id)
+  WHERE swb.id = ap.water_body_id
+  ORDER BY n.geom <-> ap.geom
+  LIMIT 1
+)
+WHERE ap.id IN ({})
+RETURNING ap.id, ap.nearest_node_id
+"""
+
+
+class AbstractionPointQuerySet(models.QuerySet):
+
+    def refresh_nearest_node(self):
+        """
+            Store the closest node (node1/node2 of the water body) for all points in one UPDATE.
+
+            Returns: {point_id: nearest_node_id}
+        """
+
+        try:
+            sql, params = self.values('pk').query.sql_with_params()
+        except EmptyResultSet:
+            return {}
+
+        with connection.cursor() as cursor:
+            cursor.execute(NEAREST_NODE_SQL.format(sql), params)
+            return dict(cursor.fetchall())
+
+
 class AbstractionPoint(BaseWaterPoint):
     approved = models.BooleanField(default=False)
     water_body = models.ForeignKey(
         SurfaceWaterBody, related_name='course_abstraction_points', on_delete=models.SET_NULL, null=True)
+    nearest_node = models.ForeignKey(
+        WaterBodyNode, related_name='nearest_abstraction_points', on_delete=models.SET_NULL, null=True,
+        editable=False)
+
+    objects = AbstractionPointQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('water_body',), name='approved_abstraction_wb', condition=models.Q(approved=True))
+        ]
 
     @property
     def wb_code(self):
@@ -113,31 +249,9 @@ class AbstractionPoint(BaseWaterPoint):
 
     @property
     def closest_node(self):
-        if not self.water_body:
+        if not self.nearest_node_id:
             return None
-
-        node1 = self.water_body.node1
-        node2 = self.water_body.node2
-
-        if node1 and node2:
-            # Calculate the distance between the current SurfaceWaterBody and each node
-            distance_node1 = self.geom.distance(node1.geom)
-            distance_node2 = self.geom.distance(node2.geom)
-
-            # Return the closer node based on distance
-            if distance_node1 < distance_node2:
-                return {'id': node1.id, 'node_id': node1.node_id}
-            else:
-                return {'id': node2.id, 'node_id': node2.node_id}
-
-        # If only one node is present, return it
-        if node1:
-            return {'id': node1.id, 'node_id': node1.node_id}
-        if node2:
-            return {'id': node2.id, 'node_id': node2.node_id}
-
-        # If no nodes are present, return None
-        return None
+        return {'id': self.nearest_node_id, 'node_id': self.nearest_node.node_id}
 
     def generate_identifier(self):
         random_number = str(random.randint(10000, 99999))
@@ -153,6 +267,11 @@ class AbstractionPoint(BaseWaterPoint):
             self.identifier = self.generate_identifier()
         super().save(*args, **kwargs)
 
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'geom', 'water_body'} & set(update_fields):
+            nearest = AbstractionPoint.objects.filter(pk=self.pk).refresh_nearest_node()
+            self.nearest_node_id = nearest.get(self.pk)
+
     def __str__(self):
         return 'Abstraction - {}'.format(self.id)
 
@@ -162,6 +281,12 @@ class DischargePoint(BaseWaterPoint):
     water_body = models.ForeignKey(
         SurfaceWaterBody, related_name='course_discharge_points', on_delete=models.SET_NULL, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('water_body',), name='approved_discharge_wb', condition=models.Q(approved=True))
+        ]
+
     def generate_identifier(self):
         random_number = str(random.randint(10000, 99999))
         random_string = ''.join(random.choices(string.ascii_uppercase + string.ascii_lowercase, k=5))
@@ -205,6 +330,49 @@ def get_permit_dir(instance, filename):
     return os.path.join(str(instance.uid), filename)
 
 
+def monthly_values_property(quantity):
+    return property(lambda self: self.monthly_values_by_quantity.get(quantity))
+
+
+class PermitQuerySet(models.QuerySet):
+
+    def with_map_location(self):
+        """
+            Centroid of all abstraction and discharge points computed in the database
+        """
+
+        def collect_points(relation):
+            # points of the permit collected in a correlated subquery grouped by the permit
+            field = self.model._meta.get_field(relation)
+            related_name = field.related_query_name()
+            points = field.related_model.objects.filter(**{related_name: OuterRef('pk')}).order_by().values(
+                related_name).annotate(points=Collect('geom')).values('points')
+            return Subquery(points, output_field=geomodels.GeometryField(srid=4326))
+
+        # ST_Collect skips a NULL argument (permit without discharge or abstraction points)
+        points = Func(
+            collect_points('abstraction_points'), collect_points('discharge_points'),
+            function='ST_Collect', output_field=geomodels.GeometryField(srid=4326))
+
+        return self.annotate(map_centroid=Centroid(points))
+
+    def for_list(self):
+        """
+            Related objects used by PermitReadOnlySerializer and the monthly value properties,
+            fetched with a constant number of queries
+        """
+
+        return self.with_map_location().select_related(
+            'submitted_by', 'validated_by', 'nace_code', 'water_use_sector'
+        ).prefetch_related(
+            models.Prefetch(
+                'abstraction_points',
+                queryset=AbstractionPoint.objects.select_related('nearest_node')),
+            'discharge_points',
+            'monthly_values'
+        )
+
+
 class Permit(models.Model):
 
     STATUS_CHOICES = (
@@ -223,14 +391,14 @@ class Permit(models.Model):
         ('combined', 'Combined'),
     )
 
-    uid = models.UUIDField(default=uuid.uuid4, editable=False)
+    uid = models.UUIDField(default=uuid.uuid4, editable=False, db_index=True)
     submitted_by = models.ForeignKey("user.User", related_name='submitted_permits', on_delete=models.CASCADE)
     submitted_on = models.DateTimeField(auto_now_add=True)
     validated_by = models.ForeignKey(
         "user.User", related_name='validated_permits', blank=True, null=True, on_delete=models.SET_NULL)
     validated_on = models.DateTimeField(blank=True, null=True)
     remark = models.TextField(blank=True)
-    status = models.CharField(max_length=128, choices=STATUS_CHOICES, default='pending')
+    status = models.CharField(max_length=128, choices=STATUS_CHOICES, default='pending', db_index=True)
     water_type = models.CharField(max_length=128, choices=WATER_TYPE_CHOICES, default='surface')
     abstraction_points = models.ManyToManyField(AbstractionPoint, blank=True, related_name='permit_abstraction_points')
     discharge_points = models.ManyToManyField(DischargePoint, blank=True, related_name='permit_discharge_points')
@@ -240,19 +408,54 @@ class Permit(models.Model):
         WaterUseSector, related_name='sector_permits', blank=True, null=True, on_delete=models.SET_NULL)
     nace_code = models.ForeignKey(
         NaceCode, related_name='code_permits', null=True, on_delete=models.SET_NULL)
-    time_per_month = models.JSONField(blank=True, null=True)
-    abstraction_m3_per_month = models.JSONField(blank=True, null=True, validators=[validate_monthly_json_values])
-    abstraction_m3s_per_month = models.JSONField(blank=True, null=True, validators=[validate_monthly_json_values])
-    discharge_m3_per_month = models.JSONField(blank=True, null=True, validators=[validate_monthly_json_values])
-    discharge_m3s_per_month = models.JSONField(blank=True, null=True, validators=[validate_monthly_json_values])
-    ev1_per_month = models.JSONField(blank=True, null=True, validators=[validate_monthly_json_values])
-    ev2_per_month = models.JSONField(blank=True, null=True, validators=[validate_monthly_json_values])
-    ev3_per_month = models.JSONField(blank=True, null=True, validators=[validate_monthly_json_values])
-    ev123_per_month = models.JSONField(blank=True, null=True, validators=[validate_monthly_json_values])
     pdf = models.FileField(max_length=255, upload_to=get_permit_dir, storage=PERMIT_DATA_FS, blank=True, null=True)
 
+    objects = PermitQuerySet.as_manager()
+
+    time_per_month = monthly_values_property('time_per_month')
+    abstraction_m3_per_month = monthly_values_property('abstraction_m3_per_month')
+    abstraction_m3s_per_month = monthly_values_property('abstraction_m3s_per_month')
+    discharge_m3_per_month = monthly_values_property('discharge_m3_per_month')
+    discharge_m3s_per_month = monthly_values_property('discharge_m3s_per_month')
+    ev1_per_month = monthly_values_property('ev1_per_month')
+    ev2_per_month = monthly_values_property('ev2_per_month')
+    ev3_per_month = monthly_values_property('ev3_per_month')
+    ev123_per_month = monthly_values_property('ev123_per_month')
+
+    @cached_property
+    def monthly_values_by_quantity(self):
+        """
+            Monthly values grouped by quantity in the {'1': value, ..., '12': value} format
+        """
+
+        values = {}
+        for obj in self.monthly_values.all():
+            values.setdefault(obj.quantity, {})[str(obj.month)] = obj.value
+        return values
+
+    def set_monthly_values(self, data):
+        """
+            Replace monthly values for given quantities.
+            data format: {'abstraction_m3_per_month': {'1': value, ..., '12': value}, ...}
+        """
+
+        self.monthly_values.filter(quantity__in=data.keys()).delete()
+
+        objs = []
+        for quantity, values in data.items():
+            if not values:
+                continue
+            for month, value in values.items():
+                objs.append(PermitMonthlyValue(permit=self, quantity=quantity, month=int(month), value=value))
+
+        PermitMonthlyValue.objects.bulk_create(objs)
+        self.__dict__.pop('monthly_values_by_quantity', None)
+
     @property
     def map_location(self):
+        if 'map_centroid' in self.__dict__:
+            return self.map_centroid.coords if self.map_centroid else None
+
         ap_points = [obj.geom for obj in self.abstraction_points.all()]
         dp_points = [obj.geom for obj in self.discharge_points.all()]
         all_points = ap_points + dp_points
@@ -263,6 +466,37 @@ class Permit(models.Model):
         return '{} - {}'.format(self.submitted_on.strftime('%d.%m.%Y'), self.submitted_by.full_name)
 
 
+class PermitMonthlyValue(models.Model):
+
+    QUANTITY_CHOICES = (
+        ('time_per_month', 'Time per month'),
+        ('abstraction_m3_per_month', 'Abstraction m3 per month'),
+        ('abstraction_m3s_per_month', 'Abstraction m3/s per month'),
+        ('discharge_m3_per_month', 'Discharge m3 per month'),
+        ('discharge_m3s_per_month', 'Discharge m3/s per month'),
+        ('ev1_per_month', 'EV 1 per month'),
+        ('ev2_per_month', 'EV 2 per month'),
+        ('ev3_per_month', 'EV 3 per month'),
+        ('ev123_per_month', 'EV 1 2 3 per month'),
+    )
+
+    permit = models.ForeignKey(Permit, related_name='monthly_values', on_delete=models.CASCADE)
+    quantity = models.CharField(max_length=32, choices=QUANTITY_CHOICES)
+    month = models.PositiveSmallIntegerField()
+    value = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('permit', 'quantity', 'month'), name='unique_permit_quantity_month')
+        ]
+        indexes = [
+            models.Index(fields=('quantity', 'month'), name='permit_value_quantity_month')
+        ]
+
+    def __str__(self):
+        return '{} - {} - {}'.format(self.permit_id, self.quantity, self.month)
+
+
 class GaugingStation(models.Model):
     name = models.CharField(max_length=128)
     geom = geomodels.PointField(srid=4326)
@@ -279,6 +513,15 @@ class WaterHeight(models.Model):
     value = models.FloatField()
     measured_on = models.DateTimeField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('gauging_station', 'measured_on'), name='unique_station_measured_on')
+        ]
+        indexes = [
+            # readings are appended in time order, BRIN stays tiny for range scans over the whole table
+            BrinIndex(fields=('measured_on',), name='water_height_time_brin')
+        ]
+
     def __str__(self):
         return '{} - {}'.format(self.measured_on.isoformat(), self.value)
 
@@ -289,6 +532,114 @@ class NodeFlowMeasurement(models.Model):
     q50_value = models.FloatField()
     ef_value = models.FloatField()
     wafu_value = models.FloatField()
+    # computed from NodeDailyFlow series (see wps.utils.flow_statistics), otherwise imported.
+    # Both may exist for the same month, readers prefer computed statistics.
+    computed = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('node', 'month', 'computed'), name='unique_node_month_computed')
+        ]
 
     def __str__(self):
         return '{} - {}'.format(self.node.node_id, self.month.strftime('%Y-%m'))
+
+
+class NodeDailyFlow(models.Model):
+    node = models.ForeignKey(WaterBodyNode, related_name='daily_flows', on_delete=models.CASCADE)
+    date = models.DateField()
+    value = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('node', 'date'), name='unique_node_date')
+        ]
+
+    def __str__(self):
+        return '{} - {}'.format(self.node_id, self.date.isoformat())
+
+
+class WaterBodyMonthlyAllocation(models.Model):
+
+    KIND_CHOICES = (
+        ('abstraction', 'Abstraction'),
+        ('discharge', 'Discharge'),
+    )
+
+    water_body = models.ForeignKey(SurfaceWaterBody, related_name='monthly_allocations', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    month = models.PositiveSmallIntegerField()
+    total_m3 = models.FloatField(default=0)
+    total_m3s = models.FloatField(default=0)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('water_body', 'kind', 'month'), name='unique_water_body_kind_month')
+        ]
+
+    def __str__(self):
+        return '{} - {} - {}'.format(self.water_body_id, self.kind, self.month)
+
+
+class OutboxEmail(models.Model):
+
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField()
+    # set by job handlers, a retried job doesn't queue the same e-mail twice
+    key = models.CharField(max_length=255, unique=True, blank=True, null=True)
+    status = models.CharField(max_length=32, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    next_attempt_on = models.DateTimeField(default=timezone.now)
+    sent_on = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('next_attempt_on',), name='queued_email_next_attempt', condition=models.Q(status='queued'))
+        ]
+
+    def __str__(self):
+        return '{} - {}'.format(self.subject, ', '.join(self.recipients))
+
+
+class Job(models.Model):
+
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),
+    )
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=32, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    available_on = models.DateTimeField(default=timezone.now)
+    # lease of a running job, the job is claimed again once it expires (e.g. the worker died)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    finished_on = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('kind', 'available_on'), name='pending_job_kind_available',
+                condition=models.Q(status__in=('queued', 'running')))
+        ]
+
+    def __str__(self):
+        return '{} #{} ({})'.format(self.kind, self.pk, self.status)
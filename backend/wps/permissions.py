@@ -48,3 +48,24 @@ class PermitObjectPermission(permissions.BasePermission):
         # admin is allowed to view it
         app_role = Group.objects.get(pk=request.user.app_role_id)
         return app_role.name == 'Admin'
+
+
+class WaterHeightPermission(permissions.BasePermission):
+    """
+    Custom permission to allow all authenticated users to read
+    water heights and only admins to ingest them.
+    """
+
+    def has_permission(self, request, view):
+
+        if not request.user.is_authenticated:
+            return False
+
+        if request.method in permissions.SAFE_METHODS:
+            return True
+
+        if not request.user.app_role_id:
+            return False
+
+        app_role = Group.objects.get(pk=request.user.app_role_id)
+        return app_role.name == 'Admin'
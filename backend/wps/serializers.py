@@ -1,10 +1,40 @@
+import json
+
 from rest_framework import serializers
 from user.serializers import UserSimpleSerializer
 
 from .models import (AbstractionPoint, AbstractionPointWaterUse, Basin,
-                     DischargePoint, DischargePointWaterUse, GaugingStation, WaterBodyNode,
-                     NaceCode, Permit, SubBasin, SurfaceWaterBody,
-                     NodeFlowMeasurement, WaterUseSector)
+                     DischargePoint, DischargePointWaterUse, GaugingStation, Job, WaterBodyNode,
+                     NaceCode, Permit, PermitMonthlyValue, SubBasin, SurfaceWaterBody,
+                     NodeFlowMeasurement, WaterHeight, WaterUseSector)
+from .validators import (validate_monthly_json_values,
+                         validate_partial_monthly_json_values)
+
+MONTHLY_QUANTITIES = [quantity for quantity, _ in PermitMonthlyValue.QUANTITY_CHOICES]
+
+
+class GeoJSONGeometryField(serializers.Field):
+    """
+        Geometry rendered from GeoJSON generated in the database (geom_json annotation)
+        or from the cached simplified geometries passed in the serializer context.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj):
+        geometries = self.context.get('geometries')
+
+        if geometries is not None:
+            geom_json = geometries.get(obj.pk)
+        elif hasattr(obj, 'geom_json'):
+            geom_json = obj.geom_json
+        else:
+            geom_json = obj.geom.geojson if obj.geom else None
+
+        return json.loads(geom_json) if geom_json else None
 
 
 class NaceCodeSerializer(serializers.ModelSerializer):
@@ -16,6 +46,8 @@ class NaceCodeSerializer(serializers.ModelSerializer):
 
 class WaterUseSectorSerializer(serializers.ModelSerializer):
 
+    geom = GeoJSONGeometryField()
+
     class Meta:
         model = WaterUseSector
         fields = ('id', 'name', 'geom')
@@ -37,6 +69,8 @@ class SubBasinSerializer(serializers.ModelSerializer):
 
 class SubBasinMapSerializer(serializers.ModelSerializer):
 
+    geom = GeoJSONGeometryField()
+
     class Meta:
         model = SubBasin
         fields = ('id', 'name', 'geom')
@@ -74,10 +108,29 @@ class DischargePointWaterUseSerializer(serializers.ModelSerializer):
         read_only_fields = ('discharge_point', )
 
 
+class MonthlyValuesField(serializers.JSONField):
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('allow_null', True)
+        kwargs.setdefault('validators', [validate_monthly_json_values])
+        super().__init__(**kwargs)
+
+
 class PermitSerializer(serializers.ModelSerializer):
 
     abstraction_points = AbstractionPointSerializer(many=True)
     discharge_points = DischargePointSerializer(many=True)
+    # months may be missing, unlike the other quantities
+    time_per_month = MonthlyValuesField(validators=[validate_partial_monthly_json_values])
+    abstraction_m3_per_month = MonthlyValuesField()
+    abstraction_m3s_per_month = MonthlyValuesField()
+    discharge_m3_per_month = MonthlyValuesField()
+    discharge_m3s_per_month = MonthlyValuesField()
+    ev1_per_month = MonthlyValuesField()
+    ev2_per_month = MonthlyValuesField()
+    ev3_per_month = MonthlyValuesField()
+    ev123_per_month = MonthlyValuesField()
 
     class Meta:
         model = Permit
@@ -92,7 +145,10 @@ class PermitSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         abstraction_points_data = validated_data.pop('abstraction_points')
         discharge_points_data = validated_data.pop('discharge_points')
+        monthly_values = {
+            quantity: validated_data.pop(quantity) for quantity in MONTHLY_QUANTITIES if quantity in validated_data}
         permit = Permit.objects.create(**validated_data)
+        permit.set_monthly_values(monthly_values)
 
         for ap in abstraction_points_data:
             ap_obj, _ = AbstractionPoint.objects.get_or_create(**ap)
@@ -122,9 +178,15 @@ class PermitReadOnlySerializer(serializers.ModelSerializer):
         )
 
 
+class CoordinatesSerializer(serializers.Serializer):
+    coordinates = serializers.ListField(
+        child=serializers.ListField(child=serializers.FloatField(), min_length=2, max_length=2))
+
+
 class PermitValidationSerializer(serializers.Serializer):
     status = serializers.CharField()
-    remark = serializers.CharField()
+    # the current remark is kept if omitted
+    remark = serializers.CharField(required=False, allow_blank=True)
 
     def validate(self, attrs):
         status_choices = ['approved', 'denied', 'pending', 'archived']
@@ -136,6 +198,27 @@ class PermitValidationSerializer(serializers.Serializer):
         return super(PermitValidationSerializer, self).validate(attrs)
 
 
+class PermitBulkValidationItemSerializer(PermitValidationSerializer):
+    uid = serializers.UUIDField()
+
+
+class PermitBulkValidationSerializer(serializers.Serializer):
+    MAX_PERMITS = 1000
+
+    permits = PermitBulkValidationItemSerializer(many=True, allow_empty=False)
+    send_email = serializers.BooleanField(default=True)
+
+    def validate_permits(self, value):
+        if len(value) > self.MAX_PERMITS:
+            raise serializers.ValidationError("At most {} permits are allowed per request".format(self.MAX_PERMITS))
+
+        uids = [item['uid'] for item in value]
+        if len(set(uids)) != len(uids):
+            raise serializers.ValidationError("Each permit may be listed only once")
+
+        return value
+
+
 class SurfaceWaterBodySimpleSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -163,5 +246,20 @@ class NodeFlowMeasurementSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = NodeFlowMeasurement
-        fields = ('id', 'node', 'month', 'q50_value', 'ef_value', 'wafu_value')
-        read_only_fields = ('node', )
+        fields = ('id', 'node', 'month', 'q50_value', 'ef_value', 'wafu_value', 'computed')
+        read_only_fields = ('node', 'computed')
+
+
+class WaterHeightSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = WaterHeight
+        fields = ('measured_on', 'value')
+
+
+class JobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'payload', 'status', 'attempts', 'max_attempts', 'last_error', 'created_on',
+                  'available_on', 'finished_on')
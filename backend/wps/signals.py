@@ -1,41 +1,162 @@
 import logging
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models import Q
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
 from django.dispatch import receiver
 
-from .models import Permit
+from .models import (AbstractionPoint, DischargePoint, Permit,
+                     SurfaceWaterBody, WaterBodyNode)
+from .utils.importers import is_deleting_missing
+from .utils.jobs import enqueue_job
+from .utils.layer_cache import (LAYER_MODELS, bump_layer_version,
+                                get_model_layer)
+from .utils.spatial_index import water_body_index
+from .utils.water_balance import get_permit_water_body_ids, refresh_allocations
 
 logger = logging.getLogger(__name__)
 
+POINT_KINDS = {AbstractionPoint: 'abstraction', DischargePoint: 'discharge'}
+
 
 @receiver(post_save, sender=Permit)
 def permit_post_save(sender, instance, created, **kwargs):
     """
-        Create PDF for the permit if not already created.
+        Create PDF for the permit, the worker skips it if the PDF is up to date.
         Send e-mail if created.
     """
 
     if created:
         # Send email
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.send)(
-            settings.CHANNEL_NAME_PERMITS, {
-                'type': 'email_new_permit',
-                'data': {
-                    'submitted_on': instance.submitted_on.strftime('%d.%m.%Y %H:%M'),
-                    'submitted_by': {
-                        'name': instance.submitted_by.full_name,
-                        'email': instance.submitted_by.email
-                    },
-                    'operator_name': instance.operator_name
-                }
-            })
-
-    if not instance.pdf:
-        # send task to worker
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.send)(
-            settings.CHANNEL_NAME_PERMITS, {'type': 'create_pdf', 'data': {'obj_id': instance.id}})
+        enqueue_job('email_new_permit', {
+            'submitted_on': instance.submitted_on.strftime('%d.%m.%Y %H:%M'),
+            'submitted_by': {
+                'name': instance.submitted_by.full_name,
+                'email': instance.submitted_by.email
+            },
+            'operator_name': instance.operator_name
+        })
+
+    # queue job for the worker, stored in the same transaction as the permit
+    enqueue_job('create_pdf', {'obj_id': instance.id})
+
+
+@receiver(pre_delete, sender=Permit)
+def permit_pre_delete(sender, instance, **kwargs):
+    # links to the points are deleted without m2m_changed, remember the water bodies
+    instance._allocation_water_body_ids = get_permit_water_body_ids(instance)
+
+
+@receiver(post_delete, sender=Permit)
+def permit_allocations_post_delete(sender, instance, **kwargs):
+    """
+        Keep materialized water body allocations in sync when the permit is deleted.
+        Saving a permit doesn't change allocations, its quantities are refreshed where they are
+        written (admin) and its points through m2m_changed.
+    """
+
+    refresh_allocations(getattr(instance, '_allocation_water_body_ids', []))
+
+
+@receiver(pre_save, sender=AbstractionPoint)
+@receiver(pre_save, sender=DischargePoint)
+def point_pre_save(sender, instance, update_fields=None, **kwargs):
+    # approved flag and water body before the save, None if allocations can't change
+    instance._allocation_state = None
+    if instance.pk is not None and (update_fields is None or {'approved', 'water_body'} & set(update_fields)):
+        instance._allocation_state = sender.objects.filter(pk=instance.pk).values_list('approved', 'water_body').first()
+
+
+@receiver(post_save, sender=AbstractionPoint)
+@receiver(post_save, sender=DischargePoint)
+def point_allocations_post_save(sender, instance, **kwargs):
+    """
+        Refresh allocations of the previous and the current water body if the point was
+        approved/unapproved or moved to another water body (e.g. in the admin).
+    """
+
+    state = getattr(instance, '_allocation_state', None)
+    if state is not None and state != (instance.approved, instance.water_body_id):
+        refresh_allocations([state[1], instance.water_body_id], kinds=[POINT_KINDS[sender]])
+
+
+@receiver(post_delete, sender=AbstractionPoint)
+@receiver(post_delete, sender=DischargePoint)
+def point_allocations_post_delete(sender, instance, **kwargs):
+    if instance.approved:
+        refresh_allocations([instance.water_body_id], kinds=[POINT_KINDS[sender]])
+
+
+def points_changed(instance, action, reverse, model, pk_set, kind):
+    if reverse:
+        # instance is the point, pk_set are permit ids
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_allocations([instance.water_body_id], kinds=[kind])
+        return
+
+    if action == 'pre_clear':
+        instance._cleared_water_body_ids = get_permit_water_body_ids(instance, kind=kind)
+    elif action == 'post_clear':
+        refresh_allocations(getattr(instance, '_cleared_water_body_ids', []), kinds=[kind])
+    elif action in ('post_add', 'post_remove'):
+        water_body_ids = model.objects.filter(pk__in=pk_set).values_list('water_body', flat=True)
+        refresh_allocations(water_body_ids, kinds=[kind])
+
+
+@receiver(m2m_changed, sender=Permit.abstraction_points.through)
+def permit_abstraction_points_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    points_changed(instance, action, reverse, model, pk_set, 'abstraction')
+
+
+@receiver(m2m_changed, sender=Permit.discharge_points.through)
+def permit_discharge_points_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    points_changed(instance, action, reverse, model, pk_set, 'discharge')
+
+
+@receiver(post_save, sender=SurfaceWaterBody)
+@receiver(post_delete, sender=SurfaceWaterBody)
+def surface_water_body_changed(sender, instance, **kwargs):
+    """
+        Rebuild the in-process water body index on next lookup.
+    """
+
+    water_body_index.invalidate()
+
+
+@receiver(post_save, sender=SurfaceWaterBody)
+def surface_water_body_nodes_changed(sender, instance, **kwargs):
+    """
+        Nodes of the water body may have changed, refresh nearest node of its abstraction points.
+    """
+
+    AbstractionPoint.objects.filter(water_body=instance).refresh_nearest_node()
+
+
+@receiver(post_save, sender=WaterBodyNode)
+def water_body_node_post_save(sender, instance, **kwargs):
+    AbstractionPoint.objects.filter(
+        Q(water_body__node1=instance) | Q(water_body__node2=instance)).refresh_nearest_node()
+
+
+@receiver(post_delete, sender=WaterBodyNode)
+def water_body_node_post_delete(sender, instance, **kwargs):
+    if is_deleting_missing():
+        # import_waterbody_nodes refreshes all points once after the delete
+        return
+
+    # nearest_node is already set to NULL, pick the remaining node of the water body
+    AbstractionPoint.objects.filter(nearest_node__isnull=True, water_body__isnull=False).refresh_nearest_node()
+
+
+def reference_layer_changed(sender, **kwargs):
+    """
+        Invalidate cached responses and tiles of the layer (admin saves, imports) after commit,
+        bulk imports bump once through batch_layer_bumps().
+    """
+
+    bump_layer_version(get_model_layer(sender))
+
+
+for layer_model in LAYER_MODELS.values():
+    post_save.connect(reference_layer_changed, sender=layer_model)
+    post_delete.connect(reference_layer_changed, sender=layer_model)
@@ -0,0 +1,178 @@
+import os
+
+from django.conf import settings
+
+from .models import PERMIT_DATA_FS, Permit
+from .utils.jobs import LEASE_TIMEOUT, register_job
+from .utils.outbox import flush_outbox, queue_email
+from .utils.pdf import (finish_render, get_pdf_digest, get_pdf_name,
+                        is_latest_render, pdf_pool, start_render)
+
+# give up on a render well before the lease of the job expires and another worker claims it
+PDF_RENDER_TIMEOUT = LEASE_TIMEOUT / 2
+
+# jobs waiting for the PDF render pool, run by dedicated run_jobs threads only
+PDF_JOB_KINDS = ('create_pdf', )
+
+
+def get_pdf_context_data(obj):
+    abstraction_points = []
+    discharge_points = []
+
+    for ap in obj.abstraction_points.all():
+        wc = ap.water_body
+        abstraction_points.append({
+            'id': ap.id,
+            'coords': list(ap.geom.coords),
+            'identifier': ap.identifier,
+            'watercourse': {
+                'wb_code': wc.wb_code if wc else '-',
+                'name': wc.name if wc else '-'
+            },
+            'sub_basin': ap.subbasin.name if ap.subbasin else '-'
+        })
+
+    for dp in obj.discharge_points.all():
+        wc = dp.water_body
+        discharge_points.append({
+            'id': dp.id,
+            'coords': list(dp.geom.coords),
+            'watercourse': {
+                'wb_code': wc.wb_code if wc else '-',
+                'name': wc.name if wc else '-'
+            },
+            'sub_basin': dp.subbasin.name if dp.subbasin else '-'
+        })
+
+    context = {
+        'id': obj.id,
+        'permit_uid': obj.uid,
+        'submitted_by': {
+            'full_name': obj.submitted_by.full_name,
+            'email': obj.submitted_by.email
+        },
+        'operator_name': obj.operator_name,
+        'validated_by': obj.validated_by.full_name if obj.validated_by else '-',
+        'validated_on': obj.validated_on.strftime('%d.%m.%Y') if obj.validated_on else '-',
+        'status': obj.status,
+        'water_use_sector': obj.water_use_sector.name if obj.water_use_sector else '-',
+        'nace_code': obj.nace_code.code if obj.nace_code else '-',
+        'nace_description': obj.nace_code.description if obj.nace_code else '',
+        'abstraction_points': abstraction_points,
+        'discharge_points': discharge_points
+    }
+
+    return context
+
+
+def save_permit_pdf(permit_id, digest, relative_path_pdf, pdf):
+    try:
+        # failed, or the permit changed meanwhile and a newer render will store its PDF
+        if pdf is None or not is_latest_render(permit_id, digest):
+            return
+
+        # prepare output dir
+        fpath = PERMIT_DATA_FS.path(relative_path_pdf)
+        dirpath = os.path.dirname(fpath)
+
+        if not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+
+        with open(fpath, "wb") as f:
+            f.write(pdf)
+
+        # update only the file, the permit may have changed while rendering
+        previous = Permit.objects.filter(pk=permit_id).values_list('pdf', flat=True).first()
+        Permit.objects.filter(pk=permit_id).update(pdf=relative_path_pdf)
+
+        if previous and previous != relative_path_pdf:
+            PERMIT_DATA_FS.delete(previous)
+    finally:
+        finish_render(permit_id, digest)
+
+
+@register_job('create_pdf')
+def create_pdf(job):
+    obj = Permit.objects.filter(pk=job.payload['obj_id']).first()
+    if obj is None:
+        # permit was deleted meanwhile
+        return
+
+    # define context dict for template
+    context = get_pdf_context_data(obj)
+
+    # PDF file name is derived from the render inputs, skip if it is up to date
+    digest = get_pdf_digest(context)
+    relative_path_pdf = get_pdf_name(obj.uid, digest)
+
+    if obj.pdf.name == relative_path_pdf and PERMIT_DATA_FS.exists(relative_path_pdf):
+        return
+
+    # the same render is in flight in another worker, retry finds the PDF up to date
+    if not start_render(obj.pk, digest):
+        raise RuntimeError('PDF of permit {} is already being rendered'.format(obj.uid))
+
+    # render in the PDF pool and wait for the PDF, this thread only runs PDF jobs (see run_jobs)
+    pdf = None
+    try:
+        pdf = pdf_pool.render(context, timeout=PDF_RENDER_TIMEOUT)
+    finally:
+        save_permit_pdf(obj.pk, digest, relative_path_pdf, pdf)
+
+    if pdf is None:
+        raise RuntimeError('Rendering PDF of permit {} failed'.format(obj.uid))
+
+
+@register_job('email_permit_status_update')
+def email_permit_status_update(job):
+    obj = Permit.objects.get(pk=job.payload['obj_id'])
+
+    # send e-mail
+    subject = "Permit Application - status update"
+    message = (
+        "Permit application with UID: {} has been validated.\n\n"
+        "Status: {}\n\nValidated on:{}\nValidated by: {}".format(
+            str(obj.uid), obj.status.upper(), obj.validated_on.strftime('%d.%m.%Y'), obj.validated_by.full_name)
+    )
+
+    if obj.remark:
+        message += ("\n\nRemark: {}".format(obj.remark))
+
+    # keyed by the job, a retried job doesn't send the e-mail twice
+    queue_email(subject, message, [obj.submitted_by.email], key='job-{}'.format(job.pk))
+    flush_outbox()
+
+
+@register_job('email_new_permit')
+def email_new_permit(job):
+    data = job.payload
+    submitted_by = data['submitted_by']
+    submitted_on = data['submitted_on']
+    operator_name = data['operator_name']
+
+    # send e-mail
+    subject_for_user = "AMBU - Water Permit Application"
+    message_to_user = (
+        "Dear {},\n\n"
+        "Thank you for submitting your water permit request through our app. "
+        "We have received your application and it will be reviewed by our team.\n"
+        "You will receive an email notification once the permit is validated.\n\n"
+        "Best regards,\nAMBU Team".format(submitted_by['name'])
+    )
+
+    subject_for_admin = "Water Permit Request - Review Required"
+    message_to_admin = (
+        "A water permit request has been submitted via WPS web app and requires your review.\n\n"
+        "Submitted by: {full_name} ({email})\nOperator name: {operator}\n"
+        "Submitted on: {dt}\nURL for review: -".format(
+            full_name=submitted_by['name'],
+            email=submitted_by['email'],
+            operator=operator_name,
+            dt=submitted_on
+        )
+    )
+
+    # mail to user and admin, sent over one connection
+    queue_email(subject_for_user, message_to_user, [submitted_by['email']], key='job-{}-user'.format(job.pk))
+    queue_email(subject_for_admin, message_to_admin, [settings.ADMIN_EMAIL], key='job-{}-admin'.format(job.pk))
+    flush_outbox()
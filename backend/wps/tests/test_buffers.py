@@ -0,0 +1,38 @@
+import io
+
+from django.contrib.gis.geos import LineString, MultiLineString, Point
+from django.core.management import call_command
+from django.test import TestCase
+from wps.models import SurfaceWaterBody
+
+LINE = LineString((19.80, 41.30), (19.90, 41.30))
+
+# a degree of latitude is ~111 km
+NORTH_150M = Point(19.85, 41.30135)
+NORTH_250M = Point(19.85, 41.30225)
+
+
+class BufferTestCase(TestCase):
+
+    def setUp(self):
+        self.water_body = SurfaceWaterBody.objects.create(name='wb01', wb_code='WB01', geom=MultiLineString(LINE))
+
+    def test_buffer_computed_on_save(self):
+        buffer = self.water_body.buffer200
+        self.assertEqual((buffer.geom_type, buffer.srid), ('MultiPolygon', 4326))
+        self.assertTrue(buffer.contains(NORTH_150M))
+        self.assertFalse(buffer.contains(NORTH_250M))
+
+    def test_refresh_buffers(self):
+        queryset = SurfaceWaterBody.objects.filter(pk=self.water_body.pk)
+        self.assertEqual(queryset.refresh_buffers(distance=100), 1)
+        self.assertFalse(queryset.get().buffer200.contains(NORTH_150M))
+
+        self.assertEqual(SurfaceWaterBody.objects.filter(pk__in=[]).refresh_buffers(), 0)
+
+    def test_rebuild_buffers_command(self):
+        stdout = io.StringIO()
+        call_command('rebuild_buffers', '--distance', '300', stdout=stdout)
+
+        self.assertIn('Buffers of 1 water bodies rebuilt', stdout.getvalue())
+        self.assertTrue(SurfaceWaterBody.objects.get(pk=self.water_body.pk).buffer200.contains(NORTH_250M))
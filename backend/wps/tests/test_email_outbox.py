@@ -0,0 +1,64 @@
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from wps.models import OutboxEmail
+from wps.utils.outbox import flush_outbox, queue_email
+
+
+class CountingBackend(EmailBackend):
+    """
+        In-memory backend counting opened connections and failing for 'fail@example.com'.
+    """
+
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        if any('fail@example.com' in message.to for message in messages):
+            raise ConnectionError('Recipient refused')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='wps.tests.test_email_outbox.CountingBackend')
+class EmailOutboxTestCase(TestCase):
+
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def test_flush_over_single_connection(self):
+        for i in range(250):
+            queue_email('Subject', 'Body', ['user{}@example.com'.format(i)])
+
+        stats = flush_outbox(batch_size=100)
+
+        self.assertEqual(stats, {'sent': 250, 'retried': 0, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 250)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertFalse(OutboxEmail.objects.exclude(status='sent').exists())
+
+    def test_retry_with_backoff(self):
+        ok = queue_email('Subject', 'Body', ['user@example.com'])
+        failing = queue_email('Subject', 'Body', ['fail@example.com'])
+
+        stats = flush_outbox(max_attempts=2)
+        self.assertEqual(stats, {'sent': 1, 'retried': 1, 'failed': 0})
+
+        ok.refresh_from_db()
+        failing.refresh_from_db()
+        self.assertEqual(ok.status, 'sent')
+        self.assertEqual((failing.status, failing.attempts), ('queued', 1))
+        self.assertGreater(failing.next_attempt_on, timezone.now())
+
+        # not due yet
+        self.assertEqual(flush_outbox(max_attempts=2)['retried'], 0)
+
+        OutboxEmail.objects.filter(pk=failing.pk).update(next_attempt_on=timezone.now())
+        self.assertEqual(flush_outbox(max_attempts=2)['failed'], 1)
+
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ('failed', 2))
+        self.assertEqual(failing.last_error, 'Recipient refused')
@@ -0,0 +1,46 @@
+from datetime import date
+
+from django.contrib.gis.geos import Point
+from django.db.models import signals
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from user.models import User
+from wps.models import NodeFlowMeasurement, WaterBodyNode
+
+
+class FlowMeasurementsTestCase(APITestCase):
+
+    def setUp(self):
+        signals.post_save.receivers = []
+
+        self.user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        self.node = WaterBodyNode.objects.create(node_id=1, geom=Point(19.80, 41.30))
+        for month in (1, 2, 3):
+            NodeFlowMeasurement.objects.create(
+                node=self.node, month=date(2023, month, 1), q50_value=month, ef_value=1, wafu_value=1)
+        # daily flows only cover February
+        NodeFlowMeasurement.objects.create(
+            node=self.node, month=date(2023, 2, 1), q50_value=20, ef_value=1, wafu_value=1, computed=True)
+
+        self.url = reverse("flow-measurements", kwargs={"pk": self.node.pk})
+        self.client.force_authenticate(self.user)
+
+    def test_computed_month_replaces_imported(self):
+        response = self.client.get(self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(
+            [(obj["month"], obj["q50_value"], obj["computed"]) for obj in data["results"]],
+            [("2023-01-01", 1, False), ("2023-02-01", 20, True), ("2023-03-01", 3, False)])
+
+    def test_unknown_node(self):
+        response = self.client.get(reverse("flow-measurements", kwargs={"pk": self.node.pk + 1}), format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase, TestCase
+from wps.models import NodeFlowMeasurement, WaterBodyNode
+from wps.utils.flow_statistics import (build_measurements,
+                                       compute_monthly_statistics,
+                                       ingest_daily_flows,
+                                       refresh_flow_statistics)
+
+
+def days(start, count):
+    return [start + timedelta(days=i) for i in range(count)]
+
+
+class MonthlyStatisticsTestCase(SimpleTestCase):
+
+    def test_percentiles_match_numpy(self):
+        rng = np.random.default_rng(1)
+        dates = np.array(days(date(2020, 1, 1), 3 * 365), dtype='datetime64[D]')
+        nodes = np.array([1, 2] * len(dates), dtype=np.int64)
+        dates = np.repeat(dates, 2)
+        values = rng.random(len(dates)) * 10
+
+        result_nodes, months, years, q50, q95 = compute_monthly_statistics(nodes, dates, values)
+        self.assertEqual(len(result_nodes), 24)
+
+        calendar_months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+        for node, month, year, median, low in zip(result_nodes, months, years, q50, q95):
+            selected = values[(nodes == node) & (calendar_months == month)]
+            self.assertAlmostEqual(median, np.percentile(selected, 50))
+            self.assertAlmostEqual(low, np.percentile(selected, 5))
+            self.assertEqual(year, 2022)
+
+    def test_missing_values_are_ignored(self):
+        rows = [(1, day, value) for day, value in zip(days(date(2023, 1, 1), 5), [1, float('nan'), 3, 5, float('inf')])]
+
+        measurement, = build_measurements(rows)
+        self.assertEqual((measurement.node_id, measurement.month), (1, date(2023, 1, 1)))
+        self.assertEqual(measurement.q50_value, 3)
+        self.assertAlmostEqual(measurement.ef_value, 1.2)
+        self.assertAlmostEqual(measurement.wafu_value, 1.8)
+        self.assertTrue(measurement.computed)
+
+        self.assertEqual(build_measurements([(1, date(2023, 1, 1), float('nan'))]), [])
+        self.assertEqual(build_measurements([]), [])
+
+
+class RefreshFlowStatisticsTestCase(TestCase):
+
+    def setUp(self):
+        self.node = WaterBodyNode.objects.create(node_id=1, geom=Point(19.80, 41.30))
+        self.imported = NodeFlowMeasurement.objects.create(
+            node=self.node, month=date(2023, 1, 1), q50_value=100, ef_value=50, wafu_value=50)
+
+    def test_imported_measurements_are_kept(self):
+        ingest_daily_flows([(self.node.pk, day, 2.0) for day in days(date(2023, 1, 1), 31)])
+
+        self.imported.refresh_from_db()
+        self.assertFalse(self.imported.computed)
+        self.assertEqual(self.imported.q50_value, 100)
+
+        computed = NodeFlowMeasurement.objects.get(node=self.node, computed=True)
+        self.assertEqual((computed.month, computed.q50_value), (date(2023, 1, 1), 2.0))
+
+        # recomputing replaces only the computed statistics
+        self.assertEqual(refresh_flow_statistics(), 1)
+        self.assertEqual(NodeFlowMeasurement.objects.filter(node=self.node).count(), 2)
+        self.assertTrue(NodeFlowMeasurement.objects.filter(pk=self.imported.pk).exists())
@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+from wps.management.commands.import_all import check_acyclic, load_manifest
+
+LAYERS = {
+    'basins': {'command': 'import_basins', 'args': ['basins.geojson']},
+    'watercourse': {'command': 'import_watercourse', 'args': ['watercourse.geojson', '--batch-size', '10']},
+    'nodes': {'command': 'import_waterbody_nodes', 'depends_on': ['watercourse']},
+    'flows': {'command': 'import_waterbody_nodes_flows', 'depends_on': ['nodes']},
+}
+
+
+class ImportAllTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        open(os.path.join(self.data_dir, 'basins.geojson'), 'w').close()
+
+        self.checkpoint_dir = os.path.join(self.data_dir, 'import')
+        self.checkpoint = os.path.join(self.data_dir, 'manifest.checkpoint.json')
+        self.commands = []
+        self.failing = set()
+
+        # layers run in threads of this process, commands are recorded instead of executed
+        for target, value in [
+            ('ProcessPoolExecutor', ThreadPoolExecutor),
+            ('run_layer', self.run_layer),
+            ('CHECKPOINT_DIR', self.checkpoint_dir),
+        ]:
+            patcher = mock.patch('wps.management.commands.import_all.{}'.format(target), value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_layer(self, command, args):
+        self.commands.append(command)
+        if command in self.failing:
+            raise RuntimeError('{} failed'.format(command))
+        return 1.0, '{} done'.format(command)
+
+    def write_manifest(self, layers=LAYERS):
+        path = os.path.join(self.data_dir, 'manifest.json')
+        with open(path, 'w') as f:
+            json.dump({'layers': layers}, f)
+        return path
+
+    def import_all(self, *args):
+        stdout = io.StringIO()
+        call_command('import_all', self.write_manifest(), '--workers', '2', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def read_checkpoint(self):
+        with open(self.checkpoint) as f:
+            return json.load(f)
+
+    def test_load_manifest(self):
+        layers = load_manifest(self.write_manifest())
+
+        self.assertEqual(layers['basins']['args'], [os.path.join(self.data_dir, 'basins.geojson')])
+        # missing files and options are passed through
+        self.assertEqual(layers['watercourse']['args'], ['watercourse.geojson', '--batch-size', '10'])
+        self.assertEqual(layers['basins']['depends_on'], [])
+
+        with self.assertRaisesMessage(CommandError, 'Layer "nodes" depends on unknown layer "watercourse"'):
+            load_manifest(self.write_manifest({'nodes': LAYERS['nodes']}))
+
+        with self.assertRaisesMessage(CommandError, 'Layer "basins" has no command'):
+            load_manifest(self.write_manifest({'basins': {'args': []}}))
+
+    def test_dependency_cycle(self):
+        layers = load_manifest(self.write_manifest(
+            dict(LAYERS, watercourse=dict(LAYERS['watercourse'], depends_on=['flows']))))
+
+        with self.assertRaisesMessage(CommandError, 'Dependency cycle between layers: flows, nodes, watercourse'):
+            check_acyclic(layers)
+
+    def test_import_all(self):
+        output = self.import_all()
+
+        self.assertIn('All layers imported successfully', output)
+        self.assertEqual(sorted(self.commands), sorted(layer['command'] for layer in LAYERS.values()))
+        self.assertLess(
+            self.commands.index('import_waterbody_nodes'), self.commands.index('import_waterbody_nodes_flows'))
+        # no checkpoint without --resume or --checkpoint
+        self.assertFalse(os.path.exists(self.checkpoint_dir))
+
+    def test_resume_after_failure(self):
+        self.failing.add('import_waterbody_nodes')
+
+        with self.assertRaisesMessage(CommandError, 'Import failed for: flows, nodes. Re-run with --resume'):
+            self.import_all('--checkpoint', self.checkpoint)
+
+        self.assertNotIn('import_waterbody_nodes_flows', self.commands)
+        self.assertEqual(set(self.read_checkpoint()), {'basins', 'watercourse'})
+
+        self.failing.clear()
+        self.commands.clear()
+        output = self.import_all('--checkpoint', self.checkpoint, '--resume')
+
+        self.assertIn('Skipping basins', output)
+        self.assertEqual(self.commands, ['import_waterbody_nodes', 'import_waterbody_nodes_flows'])
+        self.assertEqual(set(self.read_checkpoint()), set(LAYERS))
+
+    def test_default_checkpoint(self):
+        self.failing.add('import_basins')
+
+        with self.assertRaisesMessage(CommandError, 'Import failed for: basins. Run with --resume'):
+            self.import_all()
+
+        self.commands.clear()
+        self.failing.clear()
+        self.import_all('--resume')
+
+        # the first run kept no state, everything runs again
+        self.assertEqual(len(self.commands), len(LAYERS))
+        with open(os.path.join(self.checkpoint_dir, 'manifest.checkpoint.json')) as f:
+            self.assertEqual(set(json.load(f)), set(LAYERS))
@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from wps.models import Basin
+from wps.utils.importers import FeatureImportCommand, iter_json_array
+
+FEATURES = [{'type': 'Feature', 'properties': {'name': ']'}}, {'type': 'Feature', 'properties': {}}]
+
+
+class IterJsonArrayTestCase(SimpleTestCase):
+
+    def iter_items(self, data, key='features', read_size=3):
+        return list(iter_json_array(io.StringIO(json.dumps(data)), key, read_size=read_size))
+
+    def test_top_level_features(self):
+        data = {'type': 'FeatureCollection', 'name': 'features', 'bbox': [[1, 2]], 'features': FEATURES}
+        self.assertEqual(self.iter_items(data), FEATURES)
+
+    def test_nested_features_key_is_skipped(self):
+        data = {'properties': {'features': [1, 2]}, 'features': FEATURES}
+        self.assertEqual(self.iter_items(data), FEATURES)
+
+        with self.assertRaises(ValueError):
+            self.iter_items({'properties': {'features': [1, 2]}})
+
+    def test_array_file(self):
+        self.assertEqual(self.iter_items(FEATURES, key=None), FEATURES)
+
+
+class FeatureImportCommandTestCase(SimpleTestCase):
+
+    def test_build_object_is_required(self):
+        class Command(FeatureImportCommand):
+            pass
+
+        with self.assertRaises(TypeError):
+            Command()
+
+
+def basin_feature(inspire_id, x=0):
+    ring = [[x, 40], [x + 1, 40], [x + 1, 41], [x, 41], [x, 40]]
+    return {
+        'type': 'Feature',
+        'properties': {'INSPIRE_ID': inspire_id},
+        'geometry': {'type': 'MultiPolygon', 'coordinates': [[ring]]}
+    }
+
+
+class ImportCommandTestCase(TestCase):
+
+    def import_basins(self, features, *args):
+        fd, path = tempfile.mkstemp(suffix='.geojson')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+        stdout = io.StringIO()
+        call_command('import_basins', path, '--batch-size', '2', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_import_in_batches(self):
+        features = [basin_feature('B{}'.format(i), i) for i in range(5)]
+        # no source id, or repeated in the file
+        features += [basin_feature(''), basin_feature('B0', 10)]
+
+        output = self.import_basins(features)
+
+        self.assertIn('7 features read, 5 created, 0 updated, 0 unchanged, 0 deleted, 2 skipped', output)
+        self.assertEqual(
+            list(Basin.objects.order_by('source_id').values_list('source_id', 'name')),
+            [('B{}'.format(i), 'B{}'.format(i)) for i in range(5)])
+        self.assertEqual(Basin.objects.get(source_id='B3').geom.extent, (3, 40, 4, 41))
+
+    def test_reimport_upserts_changed_features(self):
+        self.import_basins([basin_feature('B{}'.format(i), i) for i in range(5)])
+        pks = dict(Basin.objects.values_list('source_id', 'pk'))
+
+        features = [basin_feature('B{}'.format(i), i) for i in range(4)]
+        features[1] = basin_feature('B1', 20)
+        output = self.import_basins(features, '--delete-missing')
+
+        self.assertIn('4 features read, 0 created, 1 updated, 3 unchanged, 1 deleted, 0 skipped', output)
+        self.assertEqual(dict(Basin.objects.values_list('source_id', 'pk')), {
+            source_id: pk for source_id, pk in pks.items() if source_id != 'B4'})
+        self.assertEqual(Basin.objects.get(source_id='B1').geom.extent, (20, 40, 21, 41))
+
+    def test_delete_missing_guard(self):
+        self.import_basins([basin_feature('B{}'.format(i), i) for i in range(5)])
+
+        for features in ([], [basin_feature('B0'), basin_feature('B1', 20)]):
+            with self.assertRaises(CommandError):
+                self.import_basins(features, '--delete-missing')
+
+        # the whole import is rolled back
+        self.assertEqual(Basin.objects.count(), 5)
+        self.assertEqual(Basin.objects.get(source_id='B1').geom.extent, (1, 40, 2, 41))
+
+        output = self.import_basins([basin_feature('B0')], '--delete-missing', '--force')
+        self.assertIn('4 deleted', output)
+        self.assertEqual(list(Basin.objects.values_list('source_id', flat=True)), ['B0'])
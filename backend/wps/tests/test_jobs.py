@@ -0,0 +1,118 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+from wps.consumers import PermitConsumer
+from wps.management.commands.run_jobs import Command as RunJobsCommand
+from wps.models import Job
+from wps.tasks import PDF_JOB_KINDS
+from wps.utils.jobs import (JOB_HANDLERS, claim_job, enqueue_job,
+                            get_job_metrics, requeue_jobs, run_pending_jobs)
+
+calls = []
+
+
+def sample_job(job):
+    calls.append(job.pk)
+    if job.payload.get('fail'):
+        raise ValueError('Failed on purpose')
+
+
+class JobQueueTestCase(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+        # registered only for the test, not for run_jobs and the metrics of other tests
+        patcher = mock.patch.dict(JOB_HANDLERS, {'test_job': sample_job})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rolled_back_job_is_discarded(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                enqueue_job('test_job', {})
+                raise ValueError
+
+        self.assertFalse(Job.objects.exists())
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            enqueue_job('unknown', {})
+
+    def test_run_job(self):
+        job = enqueue_job('test_job', {})
+
+        self.assertEqual(run_pending_jobs(), {'done': 1, 'retried': 0, 'dead': 0})
+        self.assertEqual(calls, [job.pk])
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('done', 1))
+        self.assertIsNotNone(job.finished_on)
+
+        # nothing left to run
+        self.assertEqual(run_pending_jobs(), {'done': 0, 'retried': 0, 'dead': 0})
+
+    def test_retry_and_dead_letter(self):
+        job = enqueue_job('test_job', {'fail': True}, max_attempts=2)
+
+        self.assertEqual(run_pending_jobs(), {'done': 0, 'retried': 1, 'dead': 0})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.available_on, timezone.now())
+        self.assertIn('Failed on purpose', job.last_error)
+
+        # backoff, not due yet
+        self.assertEqual(run_pending_jobs()['retried'], 0)
+
+        Job.objects.filter(pk=job.pk).update(available_on=timezone.now())
+        self.assertEqual(run_pending_jobs(), {'done': 0, 'retried': 0, 'dead': 1})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('dead', 2))
+        self.assertEqual(get_job_metrics()['test_job']['dead'], 1)
+
+        self.assertEqual(requeue_jobs(Job.objects.filter(status='dead')), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 0))
+
+    def test_expired_lease_is_claimed_again(self):
+        job = enqueue_job('test_job', {})
+        self.assertEqual(claim_job().pk, job.pk)
+
+        # still leased by the first worker
+        self.assertIsNone(claim_job())
+
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        claimed = claim_job()
+        self.assertEqual((claimed.pk, claimed.attempts), (job.pk, 2))
+
+    def test_metrics_lag(self):
+        enqueue_job('test_job', {}, delay=timedelta(minutes=-5))
+
+        metrics = get_job_metrics()['test_job']
+        self.assertEqual(metrics['queued'], 1)
+        self.assertGreaterEqual(metrics['lag'], 5 * 60)
+
+    def test_pdf_jobs_run_in_own_workers(self):
+        command = RunJobsCommand()
+        other_kinds = sorted(kind for kind in JOB_HANDLERS if kind not in PDF_JOB_KINDS)
+
+        with mock.patch('wps.management.commands.run_jobs.PDF_WORKERS', 3):
+            self.assertEqual(
+                command.get_worker_kinds({'kind': None, 'concurrency': None}),
+                [list(PDF_JOB_KINDS)] * 3 + [other_kinds])
+            self.assertEqual(
+                command.get_worker_kinds({'kind': ['create_pdf', 'test_job'], 'concurrency': 2}),
+                [['create_pdf']] * 2 + [['test_job']] * 2)
+
+    def test_consumer_leaves_pdf_jobs(self):
+        job = enqueue_job('test_job', {})
+        pdf_job = enqueue_job('create_pdf', {'obj_id': 0})
+
+        PermitConsumer().run_jobs({'type': 'run_jobs'})
+
+        self.assertEqual(calls, [job.pk])
+        pdf_job.refresh_from_db()
+        self.assertEqual((pdf_job.status, pdf_job.attempts), ('queued', 0))
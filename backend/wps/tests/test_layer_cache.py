@@ -0,0 +1,62 @@
+from django.contrib.gis.geos import Polygon
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from user.models import User
+from wps.models import Basin
+from wps.utils.layer_cache import (batch_layer_bumps, bump_layer_version,
+                                   get_layer_version)
+
+
+class LayerCacheTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        for i in range(3):
+            Basin.objects.create(name='basin{}'.format(i), geom=Polygon.from_bbox((i, 40, i + 1, 41)))
+
+        self.url = reverse("basin-list")
+        self.client.force_authenticate(self.user)
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # another query string is another response
+        response = self.client.get(self.url, {"page": 1}, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bump_after_commit(self):
+        etag = self.client.get(self.url, format="json")['ETag']
+        version = get_layer_version('basins')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_layer_version('basins')
+            self.assertEqual(get_layer_version('basins'), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_layer_version('basins'), version)
+
+        response = self.client.get(self.url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 3)
+
+    def test_bulk_delete_bumps_once(self):
+        version = get_layer_version('basins')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with batch_layer_bumps():
+                Basin.objects.all().delete()
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(get_layer_version('basins'), version)
@@ -0,0 +1,45 @@
+from django.contrib.gis.geos import (LineString, MultiLineString, MultiPolygon,
+                                     Point)
+from django.test import TestCase
+from wps.models import AbstractionPoint, SurfaceWaterBody, WaterBodyNode
+
+LINE = LineString((19.80, 41.30), (19.90, 41.30))
+
+
+class NearestNodeTestCase(TestCase):
+
+    def setUp(self):
+        self.west = WaterBodyNode.objects.create(node_id=1, geom=Point(19.80, 41.30))
+        self.east = WaterBodyNode.objects.create(node_id=2, geom=Point(19.90, 41.30))
+        self.water_body = SurfaceWaterBody.objects.create(
+            name='wb01',
+            wb_code='WB01',
+            geom=MultiLineString(LINE),
+            buffer200=MultiPolygon(LINE.buffer(0.002)),
+            node1=self.west,
+            node2=self.east
+        )
+        self.point = AbstractionPoint.objects.create(geom=Point(19.82, 41.30), water_body=self.water_body)
+
+    def test_set_on_save(self):
+        self.assertEqual(self.point.nearest_node_id, self.west.id)
+        self.assertEqual(self.point.closest_node, {'id': self.west.id, 'node_id': 1})
+
+        self.point.geom = Point(19.88, 41.30)
+        self.point.save()
+        self.assertEqual(AbstractionPoint.objects.get(pk=self.point.pk).nearest_node_id, self.east.id)
+
+    def test_point_without_water_body(self):
+        point = AbstractionPoint.objects.create(geom=Point(19.82, 41.30))
+        self.assertIsNone(point.nearest_node_id)
+        self.assertIsNone(point.closest_node)
+
+    def test_refresh_queryset(self):
+        AbstractionPoint.objects.filter(pk=self.point.pk).update(nearest_node=None)
+
+        self.assertEqual(AbstractionPoint.objects.all().refresh_nearest_node(), {self.point.pk: self.west.id})
+        self.assertEqual(AbstractionPoint.objects.filter(pk__in=[]).refresh_nearest_node(), {})
+
+    def test_deleted_node(self):
+        self.west.delete()
+        self.assertEqual(AbstractionPoint.objects.get(pk=self.point.pk).nearest_node_id, self.east.id)
@@ -0,0 +1,70 @@
+import io
+import json
+import os
+import tempfile
+from datetime import date
+
+from django.contrib.gis.geos import Point
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from wps.models import NodeFlowMeasurement, WaterBodyNode
+
+
+def node_flow(node_id, q50):
+    return {'node_id': node_id, 'q50': q50, 'q95': q50 / 2, 'wafu': q50 / 4}
+
+
+class NodeFlowsImportTestCase(TestCase):
+
+    def setUp(self):
+        self.node1 = WaterBodyNode.objects.create(node_id=1, geom=Point(19.80, 41.30))
+        self.node2 = WaterBodyNode.objects.create(node_id=2, geom=Point(19.90, 41.30))
+
+    def write_file(self, content, suffix='.json'):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        return path
+
+    def import_flows(self, data, year=2023):
+        stdout = io.StringIO()
+        call_command(
+            'import_waterbody_nodes_flows', self.write_file(json.dumps(data)), '--year', str(year), stdout=stdout)
+        return stdout.getvalue()
+
+    def test_pks_by_node_id(self):
+        self.assertEqual(WaterBodyNode.objects.pks_by_node_id(), {1: self.node1.pk, 2: self.node2.pk})
+
+        WaterBodyNode.objects.create(node_id=2, geom=Point(19.95, 41.30))
+        with self.assertRaisesMessage(ValueError, 'Node ids used by several nodes: 2'):
+            WaterBodyNode.objects.pks_by_node_id()
+
+        self.assertEqual(WaterBodyNode.objects.filter(geom__isnull=True).pks_by_node_id(), {})
+
+    def test_import(self):
+        output = self.import_flows([{'January': [node_flow(1, 8), node_flow(2, 4), node_flow(3, 2)]}])
+
+        self.assertIn('1 unknown nodes skipped: 3', output)
+        self.assertIn('2 node flows imported', output)
+        self.assertEqual(
+            list(NodeFlowMeasurement.objects.order_by('node__node_id').values_list('node_id', 'month', 'q50_value')),
+            [(self.node1.pk, date(2023, 1, 1), 8), (self.node2.pk, date(2023, 1, 1), 4)])
+
+        # a second import updates the month in place
+        self.import_flows([{'January': [node_flow(1, 6)]}])
+        measurement = NodeFlowMeasurement.objects.get(node=self.node1)
+        self.assertEqual((measurement.q50_value, measurement.ef_value), (6, 3))
+        self.assertEqual(NodeFlowMeasurement.objects.count(), 2)
+
+    def test_ambiguous_node_id(self):
+        WaterBodyNode.objects.create(node_id=1, geom=Point(19.85, 41.30))
+
+        with self.assertRaisesMessage(CommandError, 'Node ids used by several nodes: 1'):
+            self.import_flows([{'January': [node_flow(1, 8)]}])
+        self.assertFalse(NodeFlowMeasurement.objects.exists())
+
+        path = self.write_file('node_id,date,value\n1,2023-01-01,2.0\n', suffix='.csv')
+        with self.assertRaisesMessage(CommandError, 'Node ids used by several nodes: 1'):
+            call_command('load_daily_flows', path, stdout=io.StringIO())
@@ -0,0 +1,134 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from user.models import User
+from wps.utils.pdf import METRICS_CACHE_KEY, PdfRenderPool
+
+PDF = b'%PDF-1.4'
+
+
+def fake_render_pdf(context):
+    if context.get('fail'):
+        raise ValueError('Failed on purpose')
+    # pisa reported an error
+    if context.get('invalid'):
+        return None
+    return PDF
+
+
+class PdfRenderPoolTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.delete(METRICS_CACHE_KEY)
+
+        patcher = mock.patch('wps.utils.pdf.render_pdf', side_effect=fake_render_pdf)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # renders inline, in the calling thread
+        self.pool = PdfRenderPool(workers=0, queue_size=1)
+
+    def test_render(self):
+        results = []
+        self.assertTrue(self.pool.submit({}, results.append))
+        self.assertEqual(results, [PDF])
+        self.assertEqual(self.pool.render({}), PDF)
+
+        metrics = self.pool.get_metrics()
+        self.assertEqual((metrics['queue_depth'], metrics['rendered'], metrics['failed']), (0, 2, 0))
+        self.assertIsNotNone(metrics['latency_max'])
+        self.assertEqual(cache.get(METRICS_CACHE_KEY), metrics)
+
+    def test_full_queue(self):
+        nested = mock.Mock()
+        results = []
+
+        def callback(pdf):
+            # the only slot is taken by the render calling back
+            results.append(self.pool.get_metrics()['queue_depth'])
+            results.append(self.pool.submit({}, nested, timeout=0))
+            results.append(self.pool.render({}, timeout=0))
+
+        with self.assertLogs('wps.utils.pdf', 'WARNING'):
+            self.assertTrue(self.pool.submit({}, callback))
+
+        self.assertEqual(results, [1, False, None])
+        nested.assert_not_called()
+        # rejected renders aren't counted
+        self.assertEqual(self.pool.get_metrics()['rendered'], 1)
+        self.assertEqual(self.pool.render({}), PDF)
+
+    def test_failed_render(self):
+        results = []
+
+        with self.assertLogs('wps.utils.pdf', 'ERROR') as logs:
+            self.assertTrue(self.pool.submit({'fail': True}, results.append))
+        self.assertIn('PDF rendering failed', logs.output[0])
+
+        self.assertTrue(self.pool.submit({'invalid': True}, results.append))
+        self.assertEqual(results, [None, None])
+
+        def callback(pdf):
+            raise OSError('Disk full')
+
+        with self.assertLogs('wps.utils.pdf', 'ERROR') as logs:
+            self.assertTrue(self.pool.submit({}, callback))
+        self.assertIn('Storing rendered PDF failed', logs.output[0])
+
+        metrics = self.pool.get_metrics()
+        self.assertEqual((metrics['queue_depth'], metrics['rendered'], metrics['failed']), (0, 0, 3))
+        # the slot of a failed render is released
+        self.assertEqual(self.pool.render({}), PDF)
+
+
+class PdfRenderMetricsTestCase(APITestCase):
+
+    def setUp(self):
+        cache.delete(METRICS_CACHE_KEY)
+
+        self.user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        self.admin = User.objects.create(
+            username="test-admin",
+            email="admin@example.com",
+            first_name="Test",
+            last_name="Admin",
+            app_role=Group.objects.create(name='Admin')
+        )
+        self.url = reverse("pdf-metrics")
+
+    def test_forbidden(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics(self):
+        self.client.force_authenticate(self.admin)
+
+        # nothing published yet
+        response = self.client.get(self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {})
+
+        pool = PdfRenderPool(workers=0, queue_size=2)
+        with mock.patch('wps.utils.pdf.render_pdf', side_effect=fake_render_pdf):
+            pool.render({})
+            pool.render({'invalid': True})
+
+        response = self.client.get(self.url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual(data, pool.get_metrics())
+        self.assertEqual(
+            {key: data[key] for key in ('workers', 'queue_size', 'queue_depth', 'rendered', 'failed')},
+            {'workers': 0, 'queue_size': 2, 'queue_depth': 0, 'rendered': 1, 'failed': 1})
@@ -0,0 +1,76 @@
+from django.contrib.gis.geos import (LineString, MultiLineString, MultiPolygon,
+                                     Point)
+from django.db import connection
+from django.db.models import signals
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from user.models import User
+from wps.models import (AbstractionPoint, DischargePoint, NaceCode, Permit,
+                        SurfaceWaterBody, WaterBodyNode, WaterUseSector)
+
+from .setup import TEST_GEOM
+
+LINE = LineString((19.80, 41.30), (19.90, 41.30))
+
+
+class PermitListQueriesTestCase(APITestCase):
+
+    def setUp(self):
+        signals.post_save.receivers = []
+
+        self.nace = NaceCode.objects.create(code='A1', description='test')
+        self.water_use_sector = WaterUseSector.objects.create(name='sector01', geom=TEST_GEOM)
+        self.user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        self.water_body = SurfaceWaterBody.objects.create(
+            name='wb01',
+            wb_code='WB01',
+            geom=MultiLineString(LINE),
+            buffer200=MultiPolygon(LINE.buffer(0.002)),
+            node1=WaterBodyNode.objects.create(node_id=1, geom=Point(19.80, 41.30)),
+            node2=WaterBodyNode.objects.create(node_id=2, geom=Point(19.90, 41.30))
+        )
+
+    def create_permits(self, count):
+        for _ in range(count):
+            permit = Permit.objects.create(
+                submitted_by=self.user,
+                validated_by=self.user,
+                operator_name='Test',
+                nace_code=self.nace,
+                water_use_sector=self.water_use_sector,
+                pdf='fake.pdf'
+            )
+            permit.abstraction_points.add(
+                AbstractionPoint.objects.create(geom=Point(19.84, 41.30), water_body=self.water_body))
+            permit.discharge_points.add(
+                DischargePoint.objects.create(geom=Point(19.86, 41.30), water_body=self.water_body))
+
+    def count_list_queries(self):
+        url = reverse("permit-list")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {"page_size": 100}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response.json()
+
+    def test_permit_list_constant_queries(self):
+        self.client.force_authenticate(self.user)
+
+        self.create_permits(1)
+        queries_single, _ = self.count_list_queries()
+
+        self.create_permits(99)
+        queries_page, data = self.count_list_queries()
+
+        # the whole page is serialized
+        self.assertEqual(len(data["results"]), 100)
+        self.assertEqual(queries_single, queries_page)
+        self.assertEqual(data["results"][0]["abstraction_points"][0]["closest_node"]["node_id"], 1)
+        self.assertAlmostEqual(data["results"][0]["map_location"][0], 19.85)
+        self.assertAlmostEqual(data["results"][0]["map_location"][1], 41.30)
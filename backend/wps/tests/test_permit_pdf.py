@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import signals
+from django.test import TestCase
+from user.models import User
+from wps.models import PERMIT_DATA_FS, Job, Permit
+from wps.tasks import create_pdf, get_pdf_context_data
+from wps.utils.pdf import (PdfRenderPool, finish_render, get_pdf_digest,
+                           start_render)
+
+
+class PermitPdfTestCase(TestCase):
+
+    def setUp(self):
+        signals.post_save.receivers = []
+        cache.clear()
+
+        self.user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        self.permit = Permit.objects.create(submitted_by=self.user, operator_name='Test')
+        self.job = Job(kind='create_pdf', payload={'obj_id': self.permit.pk})
+
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir)
+        self.permit_dir = os.path.join(data_dir, str(self.permit.uid))
+
+        self.render_pdf = mock.Mock(side_effect=lambda context: 'PDF {}'.format(context['status']).encode())
+        for target, value in [
+            ('wps.models.PERMIT_DATA_FS.location', data_dir),
+            ('wps.tasks.pdf_pool', PdfRenderPool(workers=0, queue_size=1)),
+            ('wps.utils.pdf.render_pdf', self.render_pdf),
+        ]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get_digest(self):
+        return get_pdf_digest(get_pdf_context_data(Permit.objects.get(pk=self.permit.pk)))
+
+    def read_pdf(self):
+        permit = Permit.objects.get(pk=self.permit.pk)
+        with PERMIT_DATA_FS.open(permit.pdf.name) as f:
+            return f.read()
+
+    def test_unchanged_permit_is_skipped(self):
+        create_pdf(self.job)
+        self.assertEqual(self.read_pdf(), b'PDF pending')
+
+        create_pdf(self.job)
+        self.assertEqual(self.render_pdf.call_count, 1)
+
+        # the file was removed, it is rendered again
+        PERMIT_DATA_FS.delete(Permit.objects.get(pk=self.permit.pk).pdf.name)
+        create_pdf(self.job)
+        self.assertEqual(self.render_pdf.call_count, 2)
+        self.assertEqual(self.read_pdf(), b'PDF pending')
+
+    def test_status_change_replaces_file(self):
+        create_pdf(self.job)
+        previous = Permit.objects.get(pk=self.permit.pk).pdf.name
+
+        Permit.objects.filter(pk=self.permit.pk).update(status='approved')
+        create_pdf(self.job)
+
+        current = Permit.objects.get(pk=self.permit.pk).pdf.name
+        self.assertNotEqual(current, previous)
+        self.assertEqual(self.read_pdf(), b'PDF approved')
+        self.assertEqual(os.listdir(self.permit_dir), [os.path.basename(current)])
+
+    def test_duplicate_render_is_coalesced(self):
+        digest = self.get_digest()
+        self.assertTrue(start_render(self.permit.pk, digest))
+
+        # another worker renders the same PDF, the job is retried later
+        with self.assertRaisesMessage(RuntimeError, 'is already being rendered'):
+            create_pdf(self.job)
+        self.render_pdf.assert_not_called()
+
+        finish_render(self.permit.pk, digest)
+        create_pdf(self.job)
+        self.assertEqual(self.read_pdf(), b'PDF pending')
+
+    def test_outdated_render_is_dropped(self):
+        def render_pdf(context):
+            # the permit changed while rendering, a newer render was started
+            start_render(self.permit.pk, 'newer')
+            return b'PDF'
+
+        self.render_pdf.side_effect = render_pdf
+        create_pdf(self.job)
+
+        self.assertFalse(Permit.objects.get(pk=self.permit.pk).pdf)
+        self.assertFalse(os.path.exists(self.permit_dir))
+
+        # the in-flight mark of the dropped render is cleared
+        self.assertTrue(start_render(self.permit.pk, self.get_digest()))
@@ -1,9 +1,14 @@
+import uuid
+
+from django.contrib.auth.models import Group
+from django.contrib.gis.geos import Point
 from django.db.models import signals
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from user.models import User
-from wps.models import NaceCode, Permit, WaterUseSector
+from wps.models import (AbstractionPoint, DischargePoint, Job, NaceCode, Permit,
+                        WaterUseSector)
 
 from .setup import TEST_GEOM
 
@@ -48,9 +53,99 @@ class PermitTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(data["results"]), 0)
 
+    def test_permit_time_per_month(self):
+        url = reverse("permit-list")
+        self.client.force_authenticate(self.user01)
+        data = {"abstraction_points": [], "discharge_points": [], "operator_name": "Test", "nace_code": self.nace.pk}
+
+        for time_per_month in ({"Jan": 8}, {"1": "8h"}, {"13": 8}, [8]):
+            response = self.client.post(url, {**data, "time_per_month": time_per_month}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, time_per_month)
+            self.assertIn("time_per_month", response.json())
+
+        # months may be missing
+        response = self.client.post(url, {**data, "time_per_month": {"1": 8, "7": 4.5}}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        permit = Permit.objects.exclude(pk=self.obj.pk).get()
+        self.assertEqual(permit.time_per_month, {"1": 8, "7": 4.5})
+
     def test_permit_validate_forbidden(self):
         url = reverse("permit-validate", kwargs={"uid": str(self.obj.uid)})
         self.client.force_authenticate(self.user01)
         data = {"status": "approved", "remark": "test", "send_email": False}
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_permit_bulk_validate_forbidden(self):
+        url = reverse("permit-bulk-validate")
+        self.client.force_authenticate(self.user01)
+        data = {"permits": [{"uid": str(self.obj.uid), "status": "approved"}]}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def create_admin(self):
+        return User.objects.create(
+            username="test-admin",
+            email="admin@example.com",
+            first_name="Test",
+            last_name="Admin",
+            app_role=Group.objects.create(name='Admin')
+        )
+
+    def test_permit_validate(self):
+        approved = Permit.objects.create(
+            submitted_by=self.user01, operator_name='Test', nace_code=self.nace, status='approved')
+        ap = AbstractionPoint.objects.create(geom=Point(19.85, 41.30), approved=True)
+        approved.abstraction_points.add(ap)
+        self.obj.abstraction_points.add(ap)
+        self.obj.remark = 'previous'
+        self.obj.save()
+
+        url = reverse("permit-validate", kwargs={"uid": str(self.obj.uid)})
+        self.client.force_authenticate(self.create_admin())
+
+        response = self.client.post(url, {"status": "unknown", "send_email": False}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(url, {"status": "denied", "send_email": False}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.obj.refresh_from_db()
+        self.assertEqual((self.obj.status, self.obj.remark), ("denied", "previous"))
+        # still approved by the other permit
+        self.assertTrue(AbstractionPoint.objects.get(pk=ap.pk).approved)
+
+    def test_permit_bulk_validate(self):
+        admin = self.create_admin()
+        denied = Permit.objects.create(submitted_by=self.user01, operator_name='Test', nace_code=self.nace)
+        ap = AbstractionPoint.objects.create(geom=Point(19.85, 41.30))
+        dp = DischargePoint.objects.create(geom=Point(19.86, 41.31), approved=True)
+        self.obj.abstraction_points.add(ap)
+        denied.discharge_points.add(dp)
+        Job.objects.all().delete()
+
+        url = reverse("permit-bulk-validate")
+        self.client.force_authenticate(admin)
+        data = {"permits": [
+            {"uid": str(self.obj.uid), "status": "approved", "remark": "ok"},
+            {"uid": str(denied.uid), "status": "denied"}
+        ]}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"validated": 2})
+
+        self.obj.refresh_from_db()
+        denied.refresh_from_db()
+        self.assertEqual((self.obj.status, self.obj.remark, self.obj.validated_by), ("approved", "ok", admin))
+        self.assertEqual((denied.status, denied.remark), ("denied", ""))
+        self.assertTrue(AbstractionPoint.objects.get(pk=ap.pk).approved)
+        self.assertFalse(DischargePoint.objects.get(pk=dp.pk).approved)
+
+        # PDF and e-mail jobs queued for each permit
+        self.assertEqual(Job.objects.filter(kind='create_pdf').count(), 2)
+        self.assertEqual(Job.objects.filter(kind='email_permit_status_update').count(), 2)
+
+        # unknown permit, nothing is validated
+        data = {"permits": [{"uid": str(uuid.uuid4()), "status": "approved"}]}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
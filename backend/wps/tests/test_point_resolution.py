@@ -0,0 +1,85 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.gis.geos import (LineString, MultiLineString, MultiPolygon,
+                                     Point, Polygon)
+from django.db.models import signals
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from user.models import User
+from wps.models import (Basin, NodeFlowMeasurement, SubBasin,
+                        SurfaceWaterBody, WaterBodyNode)
+from wps.views import PointResolution
+
+LINE = LineString((19.80, 41.30), (19.90, 41.30))
+
+
+class PointResolutionTestCase(APITestCase):
+
+    def setUp(self):
+        signals.post_save.receivers = []
+
+        self.user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        self.basin = Basin.objects.create(name='basin', geom=Polygon.from_bbox((19, 41, 20, 42)))
+        self.sub_basin = SubBasin.objects.create(
+            name='first', geom=Polygon.from_bbox((19.5, 41, 20, 42)), basin=self.basin)
+        # overlapping sub-basin, the first one (lowest id) is picked
+        SubBasin.objects.create(name='second', geom=Polygon.from_bbox((19.8, 41, 20, 42)), basin=self.basin)
+
+        self.west = WaterBodyNode.objects.create(node_id=1, geom=Point(19.80, 41.30))
+        self.east = WaterBodyNode.objects.create(node_id=2, geom=Point(19.90, 41.30))
+        self.water_body = SurfaceWaterBody.objects.create(
+            name='wb01',
+            wb_code='WB01',
+            geom=MultiLineString(LINE),
+            buffer200=MultiPolygon(LINE.buffer(0.002)),
+            node1=self.west,
+            node2=self.east
+        )
+        NodeFlowMeasurement.objects.create(
+            node=self.east, month=date(2023, 1, 1), q50_value=5, ef_value=3, wafu_value=2)
+        NodeFlowMeasurement.objects.create(
+            node=self.east, month=date(2023, 2, 1), q50_value=5, ef_value=3, wafu_value=4)
+        # computed statistics replace the imported measurement of February only
+        NodeFlowMeasurement.objects.create(
+            node=self.east, month=date(2023, 2, 1), q50_value=6, ef_value=3, wafu_value=3, computed=True)
+
+        self.url = reverse("point-resolution")
+        self.client.force_authenticate(self.user)
+
+    def test_resolve_points(self):
+        response = self.client.post(
+            self.url, {"coordinates": [[19.88, 41.30], [19.60, 41.50], [10, 10]]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        near, inland, outside = response.json()
+
+        self.assertEqual(near["coordinates"], [19.88, 41.30])
+        self.assertEqual(near["water_body"]["wb_code"], "WB01")
+        self.assertEqual(near["sub_basin"]["id"], self.sub_basin.id)
+        self.assertEqual(near["basin"]["id"], self.basin.id)
+        self.assertEqual(near["closest_node"]["node_id"], 2)
+        self.assertEqual([flow["wafu_value"] for flow in near["closest_node"]["flows"]], [2, 3])
+
+        self.assertIsNone(inland["water_body"])
+        self.assertIsNone(inland["closest_node"])
+        self.assertEqual(inland["sub_basin"]["id"], self.sub_basin.id)
+
+        self.assertEqual(
+            (outside["water_body"], outside["sub_basin"], outside["basin"], outside["closest_node"]),
+            (None, None, None, None))
+
+    def test_invalid_body(self):
+        for data in ({}, {"coordinates": [[19.88]]}, {"coordinates": "19.88,41.30"}, [[19.88, 41.30]]):
+            response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_too_many_points(self):
+        with mock.patch.object(PointResolution, 'MAX_POINTS', 1):
+            response = self.client.post(self.url, {"coordinates": [[19.88, 41.30]] * 2}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
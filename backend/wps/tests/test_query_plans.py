@@ -0,0 +1,94 @@
+import uuid
+from datetime import date, datetime, timedelta
+
+from django.contrib.gis.geos import (LineString, MultiLineString, MultiPolygon,
+                                     Point, Polygon)
+from django.db import connection
+from django.db.models import signals
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from user.models import User
+from wps.models import (AbstractionPoint, Basin, GaugingStation,
+                        NodeFlowMeasurement, Permit, SurfaceWaterBody,
+                        WaterBodyNode, WaterHeight)
+
+POINT = Point(19.85, 41.30, srid=4326)
+
+
+class QueryPlanTestCase(APITestCase):
+    """
+        Hot lookups must be served by an index. Sequential scans are disabled for the planner,
+        so a plan still containing one means no usable index exists.
+    """
+
+    def setUp(self):
+        signals.post_save.receivers = []
+
+        user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        node = WaterBodyNode.objects.create(node_id=1, geom=Point(19.80, 41.30))
+
+        for i in range(20):
+            line = LineString((19.80 + i, 41.30), (19.90 + i, 41.30))
+            water_body = SurfaceWaterBody.objects.create(
+                name='wb{}'.format(i),
+                wb_code='WB{}'.format(i),
+                geom=MultiLineString(line),
+                buffer200=MultiPolygon(line.buffer(0.002))
+            )
+            Basin.objects.create(name='basin{}'.format(i), geom=Polygon.from_bbox((i, 40, i + 1, 41)))
+            AbstractionPoint.objects.create(geom=Point(19.85 + i, 41.30), water_body=water_body, approved=i % 2 == 0)
+            Permit.objects.create(submitted_by=user, operator_name='Test')
+
+        self.water_body = water_body
+        self.node = node
+        self.station = GaugingStation.objects.create(name='station', geom=POINT, water_body=water_body)
+
+        now = timezone.now()
+        WaterHeight.objects.bulk_create([
+            WaterHeight(gauging_station=self.station, value=i, measured_on=now - timedelta(minutes=15 * i))
+            for i in range(200)
+        ])
+        NodeFlowMeasurement.objects.bulk_create([
+            NodeFlowMeasurement(node=node, month=date(2023, month, 1), q50_value=1, ef_value=1, wafu_value=1)
+            for month in range(1, 13)
+        ])
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index=None):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan, plan)
+        if index:
+            self.assertIn(index, plan, plan)
+
+    def test_permit_by_uid(self):
+        self.assertUsesIndex(Permit.objects.filter(uid=uuid.uuid4()))
+
+    def test_permit_by_status(self):
+        self.assertUsesIndex(Permit.objects.filter(status='approved'))
+
+    def test_approved_abstraction_points_of_water_body(self):
+        # the plain foreign key index would avoid a sequential scan as well
+        self.assertUsesIndex(
+            AbstractionPoint.objects.filter(approved=True, water_body=self.water_body), 'approved_abstraction_wb')
+
+    def test_water_body_by_buffer(self):
+        self.assertUsesIndex(SurfaceWaterBody.objects.filter(buffer200__intersects=POINT))
+
+    def test_basin_by_geom(self):
+        self.assertUsesIndex(Basin.objects.filter(geom__intersects=POINT))
+
+    def test_node_flow_by_node_month(self):
+        self.assertUsesIndex(NodeFlowMeasurement.objects.filter(node=self.node, month=date(2023, 1, 1)))
+
+    def test_water_height_by_station_time_range(self):
+        end = timezone.make_aware(datetime(2030, 1, 1))
+        self.assertUsesIndex(WaterHeight.objects.filter(
+            gauging_station=self.station, measured_on__range=(end - timedelta(days=365 * 10), end)))
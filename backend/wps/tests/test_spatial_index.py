@@ -0,0 +1,68 @@
+from django.contrib.gis.geos import LineString, MultiLineString, MultiPolygon
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from user.models import User
+from wps.models import SurfaceWaterBody
+from wps.utils.spatial_index import water_body_index
+
+# ~100 m east of the point (a degree of longitude is ~84 km at 41.3°N)
+EAST_LINE = LineString((19.8512, 41.29), (19.8512, 41.31))
+# ~111 m north of the point, closer in degrees but farther in meters
+NORTH_LINE = LineString((19.84, 41.301), (19.86, 41.301))
+
+
+class SurfaceWaterBodyIndexTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        self.east = self.create_water_body('east', EAST_LINE)
+        self.north = self.create_water_body('north', NORTH_LINE)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            water_body_index.invalidate()
+
+    def create_water_body(self, code, line):
+        return SurfaceWaterBody.objects.create(
+            name=code, wb_code=code, geom=MultiLineString(line), buffer200=MultiPolygon(line.buffer(0.002)))
+
+    def test_nearest_in_meters(self):
+        self.assertEqual(water_body_index.locate(19.85, 41.30)['id'], self.east.id)
+
+    def test_outside_buffers(self):
+        self.assertIsNone(water_body_index.locate(20.5, 41.30))
+
+    def test_rebuilt_after_commit(self):
+        self.assertEqual(water_body_index.locate(19.85, 41.30)['id'], self.east.id)
+
+        with transaction.atomic():
+            closer = self.create_water_body('closer', LineString((19.8501, 41.29), (19.8501, 41.31)))
+            water_body_index.invalidate()
+
+            # not rebuilt before the commit
+            self.assertEqual(water_body_index.locate(19.85, 41.30)['id'], self.east.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            water_body_index.invalidate()
+
+        self.assertEqual(water_body_index.locate(19.85, 41.30)['id'], closer.id)
+
+    def test_batch_location(self):
+        url = reverse("water-body-per-location")
+        self.client.force_authenticate(self.user)
+
+        response = self.client.post(url, {"coordinates": [[19.85, 41.30], [20.5, 41.30]]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data[0]['wb_code'], 'east')
+        self.assertIsNone(data[1])
+
+        for coordinates in ([[19.85]], "19.85,41.30", [["a", "b"]]):
+            response = self.client.post(url, {"coordinates": coordinates}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
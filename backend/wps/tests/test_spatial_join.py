@@ -0,0 +1,83 @@
+import io
+
+from django.contrib.gis.geos import (LineString, MultiLineString, Point,
+                                     Polygon)
+from django.core.management import call_command
+from django.test import TestCase
+from wps.models import Basin, GaugingStation, SubBasin, SurfaceWaterBody
+from wps.utils.layer_cache import get_layer_version
+from wps.utils.spatial_join import relink_spatial, spatial_join
+
+
+class SpatialJoinTestCase(TestCase):
+
+    def setUp(self):
+        self.west = Basin.objects.create(name='west', geom=Polygon.from_bbox((19, 40, 20, 41)))
+        self.east = Basin.objects.create(name='east', geom=Polygon.from_bbox((20, 40, 21, 41)))
+        self.sub_basins = [
+            SubBasin.objects.create(name='sb{}'.format(i), geom=Polygon.from_bbox((x, 40, x + 0.1, 40.1)))
+            for i, x in enumerate([19.2, 20.2])
+        ]
+
+        # parallel water bodies ~280 m apart, both buffers contain the station
+        self.water_bodies = [
+            SurfaceWaterBody.objects.create(
+                name='wb{}'.format(i),
+                wb_code='WB{}'.format(i),
+                geom=MultiLineString(LineString((19.80, y), (19.90, y)))
+            )
+            for i, y in enumerate([41.30, 41.3025])
+        ]
+        self.station = GaugingStation.objects.create(name='gs01', geom=Point(19.85, 41.3015))
+
+    def test_subbasin_basin(self):
+        self.assertEqual(spatial_join('subbasin-basin'), 2)
+        self.assertEqual(
+            list(SubBasin.objects.order_by('name').values_list('basin_id', flat=True)), [self.west.pk, self.east.pk])
+
+        # unchanged rows aren't updated
+        self.assertEqual(spatial_join('subbasin-basin'), 0)
+
+        SubBasin.objects.filter(pk=self.sub_basins[0].pk).update(geom=Polygon.from_bbox((20.5, 40, 20.6, 40.1)))
+        self.assertEqual(spatial_join('subbasin-basin', ids=[self.sub_basins[1].pk]), 0)
+        self.assertEqual(spatial_join('subbasin-basin', ids=[self.sub_basins[0].pk]), 1)
+        self.assertEqual(SubBasin.objects.get(pk=self.sub_basins[0].pk).basin_id, self.east.pk)
+
+        Basin.objects.filter(pk=self.east.pk).update(geom=Polygon.from_bbox((30, 40, 31, 41)))
+        self.assertEqual(spatial_join('subbasin-basin'), 2)
+        self.assertFalse(SubBasin.objects.filter(basin__isnull=False).exists())
+
+    def test_nearest_water_body(self):
+        self.assertEqual(spatial_join('gauging-station-water-body'), 1)
+        self.assertEqual(GaugingStation.objects.get(pk=self.station.pk).water_body_id, self.water_bodies[1].pk)
+
+    def test_layers_bumped_after_commit(self):
+        versions = {layer: get_layer_version(layer) for layer in ('sub-basins', 'gauging-stations', 'basins')}
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            counts = relink_spatial()
+            self.assertEqual(get_layer_version('sub-basins'), versions['sub-basins'])
+
+        self.assertEqual(counts, {
+            'subbasin-basin': 2,
+            'gauging-station-water-body': 1,
+            'abstraction-point-subbasin': 0,
+            'discharge-point-subbasin': 0,
+            'assessment-point-subbasin': 0,
+        })
+
+        # one bump per changed layer
+        self.assertEqual(len(callbacks), 2)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_layer_version('sub-basins'), versions['sub-basins'])
+        self.assertNotEqual(get_layer_version('gauging-stations'), versions['gauging-stations'])
+        self.assertEqual(get_layer_version('basins'), versions['basins'])
+
+    def test_relink_spatial_command(self):
+        stdout = io.StringIO()
+        call_command('relink_spatial', '--only', 'subbasin-basin', stdout=stdout)
+
+        self.assertIn('subbasin-basin: 2 rows changed', stdout.getvalue())
+        self.assertNotIn('gauging-station-water-body', stdout.getvalue())
+        self.assertIsNone(GaugingStation.objects.get(pk=self.station.pk).water_body_id)
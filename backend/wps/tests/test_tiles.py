@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.gis.geos import LineString, MultiLineString, MultiPolygon
+from django.db.models import signals
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from user.models import User
+from wps.models import SurfaceWaterBody
+from wps.utils.layer_cache import bump_layer_version
+
+LINE = LineString((19.80, 41.30), (19.90, 41.30))
+
+
+class VectorTileTestCase(APITestCase):
+
+    def setUp(self):
+        signals.post_save.receivers = []
+
+        self.user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        SurfaceWaterBody.objects.create(
+            name='wb01', wb_code='WB01', geom=MultiLineString(LINE), buffer200=MultiPolygon(LINE.buffer(0.002)))
+
+        tiles_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tiles_dir, ignore_errors=True)
+        patcher = mock.patch('wps.utils.tiles.TILES_DIR', tiles_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tile_path = os.path.join(tiles_dir, 'water-bodies', '0', '0', '0.pbf')
+
+        self.client.force_authenticate(self.user)
+
+    def get_tile(self, layer='water-bodies', z=0, x=0, y=0, **headers):
+        url = reverse("vector-tile", kwargs={"layer": layer, "z": z, "x": x, "y": y})
+        return self.client.get(url, **headers)
+
+    def test_tile_is_cached(self):
+        response = self.get_tile()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertTrue(response.content)
+        self.assertTrue(os.path.exists(self.tile_path))
+
+        etag = response['ETag']
+        response = self.get_tile(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_layer_bump_invalidates_tiles(self):
+        etag = self.get_tile()['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_layer_version('water-bodies')
+
+        self.assertFalse(os.path.exists(self.tile_path))
+
+        response = self.get_tile(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalid_tile(self):
+        self.assertEqual(self.get_tile(layer='unknown').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get_tile(z=1, x=2).status_code, status.HTTP_400_BAD_REQUEST)
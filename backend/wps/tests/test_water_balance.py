@@ -0,0 +1,100 @@
+from datetime import date
+
+from django.contrib.gis.geos import (LineString, MultiLineString, MultiPolygon,
+                                     Point)
+from django.db.models import signals
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from user.models import User
+from wps.models import (AbstractionPoint, NodeFlowMeasurement, Permit,
+                        SurfaceWaterBody, WaterBodyNode)
+from wps.utils.water_balance import get_water_balance
+
+LINE = LineString((19.80, 41.30), (19.90, 41.30))
+
+
+def monthly(value):
+    return {str(month): value for month in range(1, 13)}
+
+
+class WaterBalanceTestCase(APITestCase):
+
+    def setUp(self):
+        signals.post_save.receivers = []
+
+        self.user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        self.node = WaterBodyNode.objects.create(node_id=1, geom=Point(19.80, 41.30))
+        for month in range(1, 13):
+            NodeFlowMeasurement.objects.create(
+                node=self.node, month=date(2023, month, 1), q50_value=5, ef_value=3, wafu_value=2)
+
+        self.water_body = SurfaceWaterBody.objects.create(
+            name='wb01',
+            wb_code='WB01',
+            geom=MultiLineString(LINE),
+            buffer200=MultiPolygon(LINE.buffer(0.002)),
+            node1=self.node
+        )
+
+        self.permit = self.create_permit(approved=False, m3=10, m3s=0.5)
+        self.other = self.create_permit(approved=True, m3=100, m3s=1.5)
+        self.create_permit(approved=False, m3=1000, m3s=10)
+
+    def create_permit(self, approved, m3, m3s):
+        permit = Permit.objects.create(submitted_by=self.user, operator_name='Test', pdf='fake.pdf')
+        permit.set_monthly_values({
+            'abstraction_m3_per_month': monthly(m3),
+            'abstraction_m3s_per_month': monthly(m3s)
+        })
+        ap = AbstractionPoint.objects.create(geom=Point(19.85, 41.30), water_body=self.water_body, approved=approved)
+        permit.abstraction_points.add(ap)
+        return permit
+
+    def test_water_balance_excludes_reference_permit(self):
+        balance = get_water_balance(self.water_body, permit=self.other)
+        self.assertEqual(balance['allocated_m3'], monthly(0))
+
+    def test_water_balance_headroom(self):
+        balance = get_water_balance(self.water_body, permit=self.permit)
+        self.assertEqual(balance['node']['id'], self.node.id)
+        self.assertEqual(balance['allocated_m3'], monthly(100))
+        self.assertEqual(balance['headroom_m3s'], monthly(0.5))
+
+    def test_other_licenses_success(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("waterbody-other-licenses", kwargs={"pk": self.water_body.pk})
+        response = self.client.get(url, {"permit_id": self.permit.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), monthly(100))
+
+    def test_water_balance_excludes_permits_sharing_reference_points(self):
+        shared = Permit.objects.create(submitted_by=self.user, operator_name='Test', pdf='fake.pdf')
+        shared.set_monthly_values({
+            'abstraction_m3_per_month': monthly(7),
+            'abstraction_m3s_per_month': monthly(0.1)
+        })
+        shared.abstraction_points.add(self.other.abstraction_points.get())
+
+        balance = get_water_balance(self.water_body, permit=self.other)
+        self.assertEqual(balance['allocated_m3'], monthly(0))
+
+        balance = get_water_balance(self.water_body, permit=self.permit)
+        self.assertEqual(balance['allocated_m3'], monthly(107))
+
+    def test_deleted_point_refreshes_allocations(self):
+        self.other.abstraction_points.get().delete()
+
+        balance = get_water_balance(self.water_body, permit=self.permit)
+        self.assertEqual(balance['allocated_m3'], monthly(0))
+
+    def test_deleted_permit_refreshes_allocations(self):
+        self.other.delete()
+
+        balance = get_water_balance(self.water_body, permit=self.permit)
+        self.assertEqual(balance['allocated_m3'], monthly(0))
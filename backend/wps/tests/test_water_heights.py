@@ -0,0 +1,90 @@
+from django.contrib.auth.models import Group
+from django.contrib.gis.geos import Point
+from django.db.models import signals
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from user.models import User
+from wps.models import GaugingStation, WaterHeight
+
+
+class WaterHeightTestCase(APITestCase):
+
+    def setUp(self):
+        signals.post_save.receivers = []
+
+        self.user = User.objects.create(
+            username="test-user",
+            email="test@example.com",
+            first_name="Test",
+            last_name="User"
+        )
+        self.admin = User.objects.create(
+            username="test-admin",
+            email="admin@example.com",
+            first_name="Test",
+            last_name="Admin",
+            app_role=Group.objects.create(name='Admin')
+        )
+        self.station = GaugingStation.objects.create(name='station', geom=Point(19.85, 41.30))
+        self.url = reverse("gauging-station-water-heights", kwargs={"pk": self.station.pk})
+
+    def ingest(self):
+        readings = [
+            {"measured_on": "2026-01-01T{:02d}:{:02d}:00Z".format(hour, minute), "value": hour * 10 + minute / 15}
+            for hour in range(2) for minute in (0, 15, 30, 45)
+        ]
+        self.client.force_authenticate(self.admin)
+        return self.client.post(self.url, readings, format="json")
+
+    def test_ingest_forbidden(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, [], format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_ingest_replaces_readings(self):
+        self.assertEqual(self.ingest().status_code, status.HTTP_201_CREATED)
+        response = self.ingest()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["stored"], 8)
+        self.assertEqual(WaterHeight.objects.filter(gauging_station=self.station).count(), 8)
+
+    def test_hourly_buckets(self):
+        self.ingest()
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url, {
+            "bucket": "hour", "start": "2026-01-01T00:00:00Z", "end": "2026-01-02T00:00:00Z"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual(len(data), 2)
+        self.assertEqual([(b["min"], b["max"], b["count"]) for b in data], [(0, 3, 4), (10, 13, 4)])
+        self.assertAlmostEqual(data[1]["mean"], 11.5)
+
+    def test_invalid_bucket(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url, {"bucket": "week"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_datetime(self):
+        self.client.force_authenticate(self.user)
+        for value in ("yesterday", "2024-13-01T00:00"):
+            response = self.client.get(self.url, {"start": value}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ndjson_ingest(self):
+        url = reverse("water-heights-ingest")
+        body = "\n".join([
+            '{{"station": {}, "measured_on": "2026-01-01T00:00:00Z", "value": 1.5}}'.format(self.station.pk),
+            '{{"station": {}, "measured_on": "2026-01-01T00:00:00Z", "value": 2.5}}'.format(self.station.pk),
+            '{{"station": {}, "measured_on": "2026-01-01T00:15:00Z", "value": 3}}'.format(self.station.pk + 1),
+            '{"station": 1, "measured_on": "yesterday", "value": 3}',
+            'not json',
+        ])
+        self.client.force_authenticate(self.admin)
+        response = self.client.generic("POST", url, body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual((data["accepted"], data["rejected"]), (2, 3))
+        self.assertEqual(WaterHeight.objects.get(gauging_station=self.station).value, 2.5)
@@ -29,3 +29,35 @@ class WaterUseSectorTestCase(APITestCase):
         data = response.json()
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(data["results"]), 1)
+
+    def get_geometry(self, params):
+        self.client.force_authenticate(self.user)
+        url = reverse("water-use-sectors")
+        response = self.client.get(url, params, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()["results"][0]["geom"]
+
+    def assertFirstPoint(self, geom, places=6):
+        for value, expected in zip(geom["coordinates"][0][0], TEST_GEOM.coords[0][0]):
+            self.assertAlmostEqual(value, expected, places=places)
+
+    def test_water_use_sector_full_geometry(self):
+        self.assertFirstPoint(self.get_geometry({}))
+
+    def test_water_use_sector_geometry_precision(self):
+        geom = self.get_geometry({"precision": 2})
+        self.assertEqual(geom["coordinates"][0][0], [round(value, 2) for value in TEST_GEOM.coords[0][0]])
+
+    def test_water_use_sector_simplified_geometry(self):
+        # a cached simplification level and an arbitrary tolerance
+        for tolerance in (0.01, 0.02):
+            geom = self.get_geometry({"simplify": tolerance})
+            self.assertEqual(geom["type"], "Polygon")
+            self.assertFirstPoint(geom)
+
+    def test_water_use_sector_invalid_geometry_params(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("water-use-sectors")
+        for params in ({"simplify": "a"}, {"precision": "a"}, {"simplify": -1}, {"precision": 16}):
+            response = self.client.get(url, params, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
@@ -8,10 +8,16 @@ urlpatterns = [
     path('basins/', views.BasinList.as_view(), name='basin-list'),
     path('basins/<int:pk>/sub-basins/', views.SubBasinList.as_view(), name='sub-basin-list'),
     path('sub-basins/', views.SubBasinMapList.as_view(), name='sub-basin-map-list'),
+    path('tiles/<str:layer>/<int:z>/<int:x>/<int:y>.pbf', views.VectorTile.as_view(), name='vector-tile'),
     path('permits/', views.PermitList.as_view(), name='permit-list'),
     path('permits/<int:pk>/', views.PermitDetail.as_view(), name='permit-detail'),
     path('permits/<str:uid>/xlsx-export/', views.PermitXlsxExport.as_view(), name='permit-xlsx-export'),
     path('permits/<str:uid>/validate/', views.PermitValidationView.as_view(), name='permit-validate'),
+    path('permits/validate/', views.PermitBulkValidationView.as_view(), name='permit-bulk-validate'),
+    path('pdf/metrics/', views.PdfRenderMetrics.as_view(), name='pdf-metrics'),
+    path('jobs/metrics/', views.JobMetrics.as_view(), name='job-metrics'),
+    path('jobs/dead/', views.DeadJobList.as_view(), name='dead-jobs'),
+    path('jobs/<int:pk>/retry/', views.DeadJobRetry.as_view(), name='dead-job-retry'),
     path('abstraction-points/', views.AbstractionPointList.as_view(), name='abstraction-points'),
     path(
         'abstraction-points/<int:pk>/water-use/',
@@ -32,7 +38,13 @@ urlpatterns = [
     path('discharge-points/', views.DischargePointList.as_view(), name='discharge-points'),
     path('water-courses/', views.WaterCourseList.as_view(), name='water-courses'),
     path('water-bodies/location/', views.WaterBodyLocation.as_view(), name='water-body-per-location'),
+    path('points/resolve/', views.PointResolution.as_view(), name='point-resolution'),
     path('gauging-stations/', views.GaugingStationList.as_view(), name='gauging-stations'),
+    path('gauging-stations/water-heights/', views.WaterHeightIngest.as_view(), name='water-heights-ingest'),
+    path(
+        'gauging-stations/<int:pk>/water-heights/',
+        views.GaugingStationWaterHeights.as_view(),
+        name='gauging-station-water-heights'),
     path('waterbody-nodes/', views.WaterBodyNodeList.as_view(), name='waterbody-nodes'),
     path(
         'waterbody-nodes/<int:pk>/flow-measurements/',
@@ -41,5 +53,9 @@ urlpatterns = [
     path(
         'waterbodies/<int:pk>/other-licenses/',
         views.WaterBodyOtherLicenses.as_view(),
-        name='waterbody-other-licenses')
+        name='waterbody-other-licenses'),
+    path(
+        'waterbodies/<int:pk>/water-balance/',
+        views.WaterBodyBalance.as_view(),
+        name='waterbody-water-balance')
 ]
@@ -0,0 +1,151 @@
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+
+from wps.models import NodeDailyFlow, NodeFlowMeasurement
+
+# Percentiles of the daily flows: Q50 is the median, Q95 the flow exceeded 95% of the time
+Q50_PERCENTILE = 50
+Q95_PERCENTILE = 5
+
+# Number of nodes whose daily series are loaded at once
+NODE_CHUNK_SIZE = 100
+
+INGEST_BATCH_SIZE = 5000
+
+
+def grouped_percentile(sorted_values, starts, counts, percentile):
+    """
+        Percentile of every group of sorted_values (groups are given by start and size),
+        interpolated linearly as numpy.percentile does.
+    """
+
+    position = starts + (counts - 1) * percentile / 100.0
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def compute_monthly_statistics(nodes, dates, values):
+    """
+        Q50/Q95 of daily flows per node and calendar month over all years.
+
+        Arguments are equally long arrays (node pk, datetime64[D], flow), missing (NaN) and
+        infinite flows are ignored.
+        Returns: (nodes, months, last years, q50, q95) arrays, one item per node and month
+    """
+
+    finite = np.isfinite(values)
+    nodes, dates, values = nodes[finite], dates[finite], values[finite]
+    if not values.size:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, values, values
+
+    months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    keys = nodes.astype(np.int64) * 12 + (months - 1)
+
+    order = np.lexsort((values, keys))
+    keys, values, years = keys[order], values[order], years[order]
+
+    group_keys, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+
+    return (
+        group_keys // 12,
+        group_keys % 12 + 1,
+        np.maximum.reduceat(years, starts),
+        grouped_percentile(values, starts, counts, Q50_PERCENTILE),
+        grouped_percentile(values, starts, counts, Q95_PERCENTILE),
+    )
+
+
+def build_measurements(rows):
+    if not rows:
+        return []
+
+    nodes, dates, values = zip(*rows)
+    statistics = compute_monthly_statistics(
+        np.array(nodes, dtype=np.int64), np.array(dates, dtype='datetime64[D]'), np.array(values, dtype=np.float64))
+
+    # environmental flow is Q95, water available for use is the flow above it
+    return [
+        NodeFlowMeasurement(
+            node_id=int(node_id),
+            month=date(int(year), int(month), 1),
+            q50_value=float(q50),
+            ef_value=float(q95),
+            wafu_value=max(float(q50 - q95), 0.0),
+            computed=True
+        )
+        for node_id, month, year, q50, q95 in zip(*statistics)
+    ]
+
+
+def refresh_flow_statistics(node_ids=None, months=None):
+    """
+        Recompute monthly flow statistics of the given (default all) nodes and calendar months
+        from their daily flows. Each statistic is stored as a computed NodeFlowMeasurement dated
+        to the last year with data for the month, imported measurements are never changed.
+
+        Returns: number of stored statistics
+    """
+
+    if node_ids is None:
+        node_ids = NodeDailyFlow.objects.values_list('node', flat=True).distinct()
+    node_ids = sorted(set(node_ids))
+
+    count = 0
+    for i in range(0, len(node_ids), NODE_CHUNK_SIZE):
+        chunk = node_ids[i:i + NODE_CHUNK_SIZE]
+
+        flows = NodeDailyFlow.objects.filter(node__in=chunk)
+        stale = NodeFlowMeasurement.objects.filter(node__in=chunk, computed=True)
+        if months is not None:
+            flows = flows.filter(date__month__in=months)
+            stale = stale.filter(month__month__in=months)
+
+        measurements = build_measurements(list(flows.values_list('node', 'date', 'value')))
+
+        with transaction.atomic():
+            # the last year of a month may have moved, only computed rows are replaced
+            stale.delete()
+            NodeFlowMeasurement.objects.bulk_create(
+                measurements,
+                update_conflicts=True,
+                unique_fields=['node', 'month', 'computed'],
+                update_fields=['q50_value', 'ef_value', 'wafu_value']
+            )
+
+        count += len(measurements)
+
+    return count
+
+
+def ingest_daily_flows(rows):
+    """
+        Store (node pk, date, flow) rows, replacing already stored days, and recompute
+        statistics of the affected nodes and months.
+
+        Returns: number of stored statistics
+    """
+
+    # the same day may only be upserted once per statement, the last row wins
+    objs = {
+        (node_id, day): NodeDailyFlow(node_id=node_id, date=day, value=value)
+        for node_id, day, value in rows
+    }
+
+    with transaction.atomic():
+        NodeDailyFlow.objects.bulk_create(
+            objs.values(),
+            batch_size=INGEST_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['node', 'date'],
+            update_fields=['value']
+        )
+
+        return refresh_flow_statistics(
+            node_ids={node_id for node_id, _ in objs.keys()},
+            months=sorted({day.month for _, day in objs.keys()})
+        )
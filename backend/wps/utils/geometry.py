@@ -0,0 +1,53 @@
+from django.contrib.gis.db.models.functions import AsGeoJSON, GeomOutputGeoFunc
+from django.core.cache import cache
+
+from wps.utils.layer_cache import get_layer_version, get_model_layer
+
+# Tolerances (in degrees) used by the frontend zoom levels; their GeoJSON is cached
+SIMPLIFY_LEVELS = (0.0001, 0.001, 0.01)
+
+GEOMETRY_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Used when only 'simplify' is requested, requests without params get full geometries
+DEFAULT_PRECISION = 8
+
+MAX_PRECISION = 15
+
+
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    function = 'ST_SimplifyPreserveTopology'
+
+
+def geojson_expression(tolerance=None, precision=DEFAULT_PRECISION, field_name='geom'):
+    expression = field_name
+    if tolerance:
+        expression = SimplifyPreserveTopology(field_name, tolerance)
+    return AsGeoJSON(expression, precision=precision)
+
+
+def is_cached_level(tolerance):
+    return tolerance in SIMPLIFY_LEVELS
+
+
+def get_cache_key(model, tolerance, precision):
+    version = get_layer_version(get_model_layer(model))
+    return 'wps:geometries:{}:{}:{}:{}'.format(model._meta.label_lower, version, tolerance, precision)
+
+
+def get_cached_geometries(model, tolerance, precision):
+    """
+        GeoJSON strings of all model geometries for a common simplification level.
+
+        Returns: {pk: geojson}
+    """
+
+    key = get_cache_key(model, tolerance, precision)
+    geometries = cache.get(key)
+
+    if geometries is None:
+        geometries = dict(
+            model.objects.annotate(geom_json=geojson_expression(tolerance, precision)).values_list('pk', 'geom_json'))
+        cache.set(key, geometries, GEOMETRY_CACHE_TIMEOUT)
+
+    return geometries
+
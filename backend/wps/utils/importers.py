@@ -0,0 +1,288 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from wps.utils.layer_cache import batch_layer_bumps, bump_layer_version
+from wps.utils.spatial_join import relink_layer
+
+READ_SIZE = 1 << 16
+
+WHITESPACE = ' \t\n\r'
+
+_deleting = threading.local()
+
+
+def is_deleting_missing():
+    """
+        True while an import deletes missing rows in this thread, per-row post_delete handlers
+        skip refreshes the import does once afterwards (after_import).
+    """
+
+    return getattr(_deleting, 'active', False)
+
+
+def find_top_level_array(f, key, read_size=READ_SIZE):
+    """
+        Read the file up to the start of the array under the key of the top-level object,
+        keys of nested objects (e.g. a 'features' property) are skipped.
+
+        Returns: the rest of the read buffer after the opening bracket
+    """
+
+    depth = 0
+    in_string = escape = False
+    expect_key = False
+    raw_key = None
+    current_key = None
+    value_key = None
+
+    while True:
+        chunk = f.read(read_size)
+        if not chunk:
+            raise ValueError("JSON array '{}' not found".format(key))
+
+        for i, char in enumerate(chunk):
+            if in_string:
+                if raw_key is not None and (escape or char != '"'):
+                    raw_key.append(char)
+                if escape:
+                    escape = False
+                elif char == '\\':
+                    escape = True
+                elif char == '"':
+                    in_string = False
+                    if raw_key is not None:
+                        current_key = json.loads('"{}"'.format(''.join(raw_key)))
+                        raw_key = None
+            elif char == '"':
+                in_string = True
+                if depth == 1 and expect_key:
+                    raw_key = []
+                    expect_key = False
+            elif char in '{[':
+                if depth == 0 and char == '[':
+                    raise ValueError("JSON array '{}' not found, the file is an array".format(key))
+                if depth == 1 and char == '[' and value_key == key:
+                    return chunk[i + 1:]
+                depth += 1
+                expect_key = depth == 1
+            elif char in '}]':
+                depth -= 1
+            elif depth == 1 and char == ':':
+                value_key = current_key
+            elif depth == 1 and char == ',':
+                expect_key = True
+                value_key = None
+
+
+def iter_json_array(f, key=None, read_size=READ_SIZE):
+    """
+        Incrementally yield items of a JSON array without loading the whole file.
+        If key is given, the array is looked up under that key of the top-level object
+        (e.g. 'features' of a GeoJSON FeatureCollection), otherwise the file itself is an array.
+    """
+
+    decoder = json.JSONDecoder()
+
+    if key:
+        buf = find_top_level_array(f, key, read_size)
+    else:
+        start = re.compile(r'^\s*\[')
+        buf = ''
+        while True:
+            match = start.search(buf)
+            if match:
+                break
+            chunk = f.read(read_size)
+            if not chunk:
+                raise ValueError('JSON array not found')
+            buf += chunk
+        buf = buf[match.end():]
+
+    pos = 0
+    size = read_size
+    eof = False
+
+    while True:
+        while pos < len(buf) and buf[pos] in WHITESPACE + ',':
+            pos += 1
+
+        if pos < len(buf) and buf[pos] == ']':
+            return
+
+        if pos < len(buf):
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # a scalar ending exactly at the buffer end may be cut off (e.g. a number)
+                if end < len(buf) or eof:
+                    pos = end
+                    size = read_size
+                    yield item
+                    continue
+
+        if eof:
+            raise ValueError('Unexpected end of JSON array')
+
+        # item is incomplete, drop consumed part of the buffer and read more (growing reads for large items)
+        buf = buf[pos:]
+        pos = 0
+        chunk = f.read(size)
+        size *= 2
+        if not chunk:
+            eof = True
+        buf += chunk
+
+
+def get_content_hash(feature):
+    return hashlib.sha1(json.dumps(feature, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+class FeatureImportCommand(ABC, BaseCommand):
+    """
+        Base command for streaming, idempotent GeoJSON imports.
+
+        Features are parsed one by one and matched to existing rows on source_id (the value of
+        source_id_property). New features are converted to model instances by build_object()
+        and written with bulk_create, changed features (different content hash) with bulk_update,
+        unchanged features are skipped. Everything runs in batches inside a single transaction.
+    """
+
+    model = None
+    source_id_property = None
+    # model fields set by build_object(), overwritten for changed features
+    fields = ('name', 'geom')
+    features_key = 'features'
+    layer = None
+    batch_size = 1000
+    # --delete-missing refuses to run without --force if the file has fewer features than this
+    # share of the existing rows (e.g. a truncated or wrong file)
+    min_seen_ratio = 0.5
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_path', type=str, help='Path to the GeoJSON file')
+        parser.add_argument(
+            '--batch-size', type=int, default=self.batch_size, help='Number of features written at once')
+        parser.add_argument(
+            '--delete-missing', action='store_true', help='Delete rows which are not present in the file')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Delete missing rows even if the file has none or much fewer features than the table')
+
+    @abstractmethod
+    def build_object(self, feature):
+        """
+            Unsaved model instance of the feature with the fields set
+        """
+
+    def after_import(self, stats):
+        pass
+
+    def get_source_id(self, feature):
+        value = feature['properties'].get(self.source_id_property)
+        return str(value) if value not in (None, '') else None
+
+    def write_batch(self, created, updated, stats):
+        if created:
+            self.model.objects.bulk_create(created)
+            stats['created'] += len(created)
+        if updated:
+            self.model.objects.bulk_update(updated, [*self.fields, 'content_hash'])
+            stats['updated'] += len(updated)
+
+    def delete_missing(self, source_ids, stats, force=False):
+        total = self.model.objects.count()
+        if not force and total and len(source_ids) < total * self.min_seen_ratio:
+            raise CommandError(
+                'Refusing to delete missing rows, the file has {} features and the table {} rows. '
+                'Use --force to delete them anyway.'.format(len(source_ids), total))
+
+        missing = self.model.objects.exclude(source_id__in=source_ids)
+
+        _deleting.active = True
+        try:
+            stats['deleted'] = missing.delete()[1].get(self.model._meta.label, 0)
+        finally:
+            _deleting.active = False
+
+    def report(self, stats, started, msg='Progress'):
+        elapsed = time.monotonic() - started
+        rate = stats['read'] / elapsed if elapsed else 0
+        self.stdout.write(
+            '{}: {} features read, {} created, {} updated, {} unchanged, {} deleted, {} skipped '
+            'in {:.1f}s ({:.0f} features/s)'.format(
+                msg, stats['read'], stats['created'], stats['updated'], stats['unchanged'], stats['deleted'],
+                stats['skipped'], elapsed, rate))
+
+    def handle(self, *args, **options):
+        file_path = options['file_path']
+        batch_size = options['batch_size']
+
+        stats = {'read': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'skipped': 0}
+        started = time.monotonic()
+
+        # row signals of deleted features bump the layer once, at the end
+        with open(file_path) as f, batch_layer_bumps(), transaction.atomic():
+            existing = {
+                source_id: (pk, content_hash) for source_id, pk, content_hash in
+                self.model.objects.exclude(source_id=None).values_list('source_id', 'pk', 'content_hash')
+            }
+            seen = set()
+            created = []
+            updated = []
+
+            for feature in iter_json_array(f, self.features_key):
+                stats['read'] += 1
+
+                source_id = self.get_source_id(feature)
+                if source_id is None or source_id in seen:
+                    stats['skipped'] += 1
+                    continue
+                seen.add(source_id)
+
+                content_hash = get_content_hash(feature)
+                pk, current_hash = existing.get(source_id, (None, None))
+                if current_hash == content_hash:
+                    stats['unchanged'] += 1
+                    continue
+
+                obj = self.build_object(feature)
+                obj.source_id = source_id
+                obj.content_hash = content_hash
+
+                if pk is None:
+                    created.append(obj)
+                else:
+                    obj.pk = pk
+                    updated.append(obj)
+
+                if len(created) + len(updated) >= batch_size:
+                    self.write_batch(created, updated, stats)
+                    created = []
+                    updated = []
+                    self.report(stats, started)
+
+            self.write_batch(created, updated, stats)
+
+            if options['delete_missing']:
+                self.delete_missing(seen, stats, force=options['force'])
+
+            self.after_import(stats)
+
+            if self.layer and (stats['created'] or stats['updated'] or stats['deleted']):
+                for name, count in relink_layer(self.layer).items():
+                    self.stdout.write('{} rows relinked ({})'.format(count, name))
+
+                bump_layer_version(self.layer)
+
+        self.report(stats, started, msg='Done')
+        self.stdout.write(self.style.SUCCESS('Data imported successfully'))
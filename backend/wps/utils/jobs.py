@@ -0,0 +1,237 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from wps.models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+# Delay (in seconds) before the first retry, doubled with every further attempt
+RETRY_BACKOFF = 30
+
+MAX_RETRY_DELAY = 60 * 60
+
+# Running jobs are claimed again by another worker after this many seconds
+LEASE_TIMEOUT = getattr(settings, 'WPS_JOB_LEASE_TIMEOUT', 60 * 10)
+
+# Finished jobs are kept this long for metrics and inspection
+JOB_RETENTION = timedelta(days=getattr(settings, 'WPS_JOB_RETENTION_DAYS', 7))
+
+THROUGHPUT_WINDOW = timedelta(hours=1)
+
+# {kind: handler(job)}, filled by @register_job in wps.tasks
+JOB_HANDLERS = {}
+
+
+def register_job(kind):
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def wake_workers():
+    # only a hint, jobs which were not picked up are found by the next poll of run_jobs
+    try:
+        async_to_sync(get_channel_layer().send)(settings.CHANNEL_NAME_PERMITS, {'type': 'run_jobs'})
+    except Exception:
+        logger.warning('Job workers could not be notified', exc_info=True)
+
+
+def enqueue_jobs(kind, payloads, delay=None, max_attempts=MAX_ATTEMPTS):
+    """
+        Store jobs in the current transaction, they are visible to workers once it commits
+        and are discarded if it rolls back. Workers are notified after the commit.
+
+        Returns: list of created jobs
+    """
+
+    if kind not in JOB_HANDLERS:
+        raise ValueError('Unknown job kind: {}'.format(kind))
+
+    available_on = timezone.now() + (delay or timedelta())
+    jobs = Job.objects.bulk_create([
+        Job(kind=kind, payload=payload, available_on=available_on, max_attempts=max_attempts)
+        for payload in payloads
+    ])
+
+    if jobs:
+        transaction.on_commit(wake_workers)
+    return jobs
+
+
+def enqueue_job(kind, payload, **kwargs):
+    return enqueue_jobs(kind, [payload], **kwargs)[0]
+
+
+def get_retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BACKOFF * 2 ** (attempts - 1), MAX_RETRY_DELAY))
+
+
+def get_due_jobs(kinds=None):
+    now = timezone.now()
+    jobs = Job.objects.filter(Q(status='queued', available_on__lte=now) | Q(status='running', locked_until__lt=now))
+    if kinds:
+        jobs = jobs.filter(kind__in=kinds)
+    return jobs
+
+
+def claim_job(kinds=None, lease=LEASE_TIMEOUT):
+    """
+        Lock the next due job (or a running one with an expired lease) and mark it as running.
+        Rows are locked with SKIP LOCKED, so several workers may claim concurrently.
+
+        Returns: job or None if there is no due job
+    """
+
+    with transaction.atomic():
+        for job in get_due_jobs(kinds).select_for_update(skip_locked=True).order_by('available_on')[:10]:
+            now = timezone.now()
+
+            if job.status == 'running' and job.attempts >= job.max_attempts:
+                # the worker died (or hung) on the last attempt
+                job.status = 'dead'
+                job.last_error = 'Lease expired'
+                job.finished_on = now
+                job.locked_until = None
+                job.save(update_fields=['status', 'last_error', 'finished_on', 'locked_until'])
+                logger.error('Job %s (%s) is dead: lease expired', job.pk, job.kind)
+                continue
+
+            job.status = 'running'
+            job.attempts += 1
+            job.locked_until = now + timedelta(seconds=lease)
+            job.save(update_fields=['status', 'attempts', 'locked_until'])
+            return job
+
+    return None
+
+
+def run_job(job):
+    """
+        Run handler of the claimed job. Failed jobs are retried with exponential backoff and
+        marked as dead after max_attempts. Handlers must be idempotent, a job may run more than once.
+
+        Returns: new status of the job
+    """
+
+    try:
+        handler = JOB_HANDLERS[job.kind]
+        handler(job)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = 'dead'
+            logger.error('Job %s (%s) is dead after %s attempts', job.pk, job.kind, job.attempts, exc_info=True)
+        else:
+            job.status = 'queued'
+            job.available_on = timezone.now() + get_retry_delay(job.attempts)
+            logger.warning('Job %s (%s) failed (attempt %s)', job.pk, job.kind, job.attempts, exc_info=True)
+    else:
+        job.status = 'done'
+        job.last_error = ''
+
+    if job.status != 'queued':
+        job.finished_on = timezone.now()
+
+    # the lease may have expired meanwhile and the job was claimed by another worker, which owns it now
+    Job.objects.filter(pk=job.pk, status='running', attempts=job.attempts).update(
+        status=job.status,
+        last_error=job.last_error,
+        available_on=job.available_on,
+        finished_on=job.finished_on,
+        locked_until=None
+    )
+    return job.status
+
+
+def run_pending_jobs(kinds=None, limit=None):
+    """
+        Claim and run due jobs until there are none left (or limit jobs ran).
+
+        Returns: {'done': n, 'retried': n, 'dead': n}
+    """
+
+    stats = {'done': 0, 'retried': 0, 'dead': 0}
+    count = 0
+
+    while limit is None or count < limit:
+        job = claim_job(kinds)
+        if job is None:
+            break
+
+        result = run_job(job)
+        stats['retried' if result == 'queued' else result] += 1
+        count += 1
+
+    return stats
+
+
+def requeue_jobs(jobs):
+    """
+        Queue dead (or any other) jobs again with a fresh set of attempts.
+
+        Returns: number of requeued jobs
+    """
+
+    count = jobs.update(
+        status='queued', attempts=0, last_error='', available_on=timezone.now(), locked_until=None, finished_on=None)
+
+    if count:
+        transaction.on_commit(wake_workers)
+    return count
+
+
+def prune_jobs(retention=JOB_RETENTION):
+    """
+        Delete done jobs finished before the retention period, dead jobs are kept.
+    """
+
+    return Job.objects.filter(status='done', finished_on__lt=timezone.now() - retention).delete()[0]
+
+
+def get_job_metrics():
+    """
+        Queue state of each job kind: number of queued, running and dead jobs, jobs done in the
+        last hour (throughput per minute) and lag (seconds the oldest due job has been waiting).
+    """
+
+    now = timezone.now()
+    rows = (
+        Job.objects
+        .values('kind')
+        .annotate(
+            queued=Count('pk', filter=Q(status='queued')),
+            running=Count('pk', filter=Q(status='running')),
+            dead=Count('pk', filter=Q(status='dead')),
+            done=Count('pk', filter=Q(status='done', finished_on__gte=now - THROUGHPUT_WINDOW)),
+            oldest_due=Min('available_on', filter=Q(status='queued', available_on__lte=now))
+        )
+        .order_by('kind')
+    )
+
+    metrics = {
+        kind: {'queued': 0, 'running': 0, 'dead': 0, 'done_last_hour': 0, 'lag': 0} for kind in JOB_HANDLERS
+    }
+    for row in rows:
+        metrics[row['kind']] = {
+            'queued': row['queued'],
+            'running': row['running'],
+            'dead': row['dead'],
+            'done_last_hour': row['done'],
+            'lag': (now - row['oldest_due']).total_seconds() if row['oldest_due'] else 0
+        }
+
+    for value in metrics.values():
+        value['throughput'] = value['done_last_hour'] / (THROUGHPUT_WINDOW.total_seconds() / 60)
+
+    return metrics
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+import uuid
+from contextlib import contextmanager
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+from wps.models import (Basin, GaugingStation, NaceCode, SubBasin,
+                        SurfaceWaterBody, WaterBodyNode, WaterCourseNetwork,
+                        WaterUseSector, Wetland)
+from wps.utils.tiles import TILE_LAYERS, invalidate_tile_cache
+
+# Static reference layers, changed only by import commands and admin
+LAYER_MODELS = {
+    'nace-codes': NaceCode,
+    'basins': Basin,
+    'sub-basins': SubBasin,
+    'water-bodies': SurfaceWaterBody,
+    'water-course-network': WaterCourseNetwork,
+    'wetlands': Wetland,
+    'water-use-sectors': WaterUseSector,
+    'gauging-stations': GaugingStation,
+    'waterbody-nodes': WaterBodyNode,
+}
+
+LAYER_RESPONSE_TIMEOUT = 60 * 60 * 24
+
+_batch = threading.local()
+
+
+def get_model_layer(model):
+    for layer, layer_model in LAYER_MODELS.items():
+        if layer_model is model:
+            return layer
+    return None
+
+
+def get_layer_version(layer):
+    key = 'wps:layer-version:{}'.format(layer)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+
+    return version
+
+
+def _bump_layer_version(layer):
+    cache.set('wps:layer-version:{}'.format(layer), uuid.uuid4().hex, None)
+
+    if layer in TILE_LAYERS:
+        invalidate_tile_cache(layer)
+
+
+def bump_layer_version(layer):
+    """
+        Invalidate cached responses, tiles and geometries of the layer once the current
+        transaction commits (right away outside of a transaction), so that no request caches
+        the old rows under the new version. Inside batch_layer_bumps() the layer is bumped
+        once, when the batch ends.
+    """
+
+    layers = getattr(_batch, 'layers', None)
+    if layers is not None:
+        layers.add(layer)
+        return
+
+    transaction.on_commit(partial(_bump_layer_version, layer))
+
+
+@contextmanager
+def batch_layer_bumps():
+    """
+        Bump every layer changed inside the block only once, for bulk operations sending
+        per-row signals (QuerySet.delete, get_or_create in a loop).
+    """
+
+    if getattr(_batch, 'layers', None) is not None:
+        yield
+        return
+
+    _batch.layers = set()
+    try:
+        yield
+    finally:
+        layers = _batch.layers
+        _batch.layers = None
+        for layer in layers:
+            bump_layer_version(layer)
+
+
+def get_layers_etag(layers, path):
+    versions = ':'.join(get_layer_version(layer) for layer in layers)
+    digest = hashlib.sha1('{}:{}'.format(versions, path).encode('utf-8')).hexdigest()
+    return '"{}"'.format(digest)
+
+
+def get_cached_response_data(etag):
+    return cache.get('wps:layer-response:{}'.format(etag))
+
+
+def set_cached_response_data(etag, data):
+    cache.set('wps:layer-response:{}'.format(etag), data, LAYER_RESPONSE_TIMEOUT)
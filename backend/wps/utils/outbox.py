@@ -0,0 +1,116 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import BadHeaderError, EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from wps.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# Number of emails locked and sent at once
+FLUSH_BATCH_SIZE = 100
+
+MAX_ATTEMPTS = 5
+
+# Delay (in seconds) before the first retry, doubled with every further attempt
+RETRY_BACKOFF = 60
+
+
+def queue_email(subject, body, recipients, from_email=None, key=None):
+    """
+        Queue e-mail for sending. E-mails with a key are queued only once, repeated calls with
+        the same key return the already queued e-mail.
+    """
+
+    fields = {
+        'subject': subject,
+        'body': body,
+        'from_email': from_email or settings.DEFAULT_FROM_EMAIL,
+        'recipients': list(recipients)
+    }
+
+    if key is None:
+        return OutboxEmail.objects.create(**fields)
+    return OutboxEmail.objects.get_or_create(key=key, defaults=fields)[0]
+
+
+def get_retry_delay(attempts):
+    return timedelta(seconds=RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def send_batch(emails, connection, max_attempts, stats):
+    now = timezone.now()
+
+    for email in emails:
+        email.attempts += 1
+        message = EmailMessage(email.subject, email.body, email.from_email, email.recipients, connection=connection)
+
+        try:
+            connection.send_messages([message])
+        except BadHeaderError as e:
+            # retrying won't help
+            email.status = 'failed'
+            email.last_error = str(e)
+        except Exception as e:
+            logger.warning('E-mail %s sending failed (attempt %s): %s', email.pk, email.attempts, e)
+            email.last_error = str(e)
+            if email.attempts >= max_attempts:
+                email.status = 'failed'
+            else:
+                email.next_attempt_on = now + get_retry_delay(email.attempts)
+                stats['retried'] += 1
+                continue
+        else:
+            email.status = 'sent'
+            email.sent_on = now
+            email.last_error = ''
+            stats['sent'] += 1
+            continue
+
+        logger.error('E-mail %s sending failed: %s', email.pk, email.last_error)
+        stats['failed'] += 1
+
+
+def flush_outbox(batch_size=FLUSH_BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+        Send due queued emails in batches over a single reused connection.
+        Rows are locked with SKIP LOCKED, so several flushes may run concurrently.
+
+        Returns: {'sent': n, 'retried': n, 'failed': n}
+    """
+
+    stats = {'sent': 0, 'retried': 0, 'failed': 0}
+    connection = None
+
+    try:
+        while True:
+            with transaction.atomic():
+                emails = list(
+                    OutboxEmail.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(status='queued', next_attempt_on__lte=timezone.now())
+                    .order_by('next_attempt_on')[:batch_size]
+                )
+
+                if not emails:
+                    break
+
+                if connection is None:
+                    connection = get_connection()
+                    connection.open()
+
+                send_batch(emails, connection, max_attempts, stats)
+
+                OutboxEmail.objects.bulk_update(
+                    emails, ['status', 'attempts', 'last_error', 'next_attempt_on', 'sent_on'])
+
+            if len(emails) < batch_size:
+                break
+    finally:
+        if connection is not None:
+            connection.close()
+
+    return stats
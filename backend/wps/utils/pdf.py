@@ -0,0 +1,260 @@
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.template.loader import get_template
+from xhtml2pdf import pisa
+
+logger = logging.getLogger(__name__)
+
+PDF_TEMPLATE = 'permit_pdf.html'
+
+# Number of render processes, 0 renders inline in the job worker
+PDF_WORKERS = getattr(settings, 'WPS_PDF_WORKERS', 2)
+
+# Renders submitted and not yet finished; submitting more blocks the job worker (backpressure)
+PDF_QUEUE_SIZE = getattr(settings, 'WPS_PDF_QUEUE_SIZE', 4 * max(PDF_WORKERS, 1))
+
+METRICS_CACHE_KEY = 'wps:pdf-metrics'
+
+METRICS_TIMEOUT = 60 * 60
+
+# Number of latest renders used for latency metrics
+LATENCY_WINDOW = 100
+
+# Duplicate render requests are ignored for this long (or until the render finishes)
+RENDER_LOCK_TIMEOUT = 60 * 10
+
+_template = None
+
+_template_digest = None
+
+
+def get_pdf_template():
+    # compiled once per process
+    global _template
+    if _template is None:
+        _template = get_template(PDF_TEMPLATE)
+    return _template
+
+
+def get_template_digest():
+    global _template_digest
+    if _template_digest is None:
+        _template_digest = hashlib.sha256(get_pdf_template().template.source.encode('utf-8')).hexdigest()
+    return _template_digest
+
+
+def get_pdf_digest(context):
+    """
+        Hash of everything the rendered PDF depends on (template source and context).
+    """
+
+    payload = json.dumps(context, sort_keys=True, default=str)
+    return hashlib.sha256('{}:{}'.format(get_template_digest(), payload).encode('utf-8')).hexdigest()
+
+
+def get_pdf_name(permit_uid, digest):
+    return os.path.join(str(permit_uid), 'permit_{}.pdf'.format(digest[:16]))
+
+
+def start_render(permit_id, digest):
+    """
+        Mark the render of the permit PDF as in flight and as the latest requested one.
+
+        Returns: False if the same render is already in flight
+    """
+
+    cache.set('wps:pdf-latest:{}'.format(permit_id), digest, RENDER_LOCK_TIMEOUT)
+    return cache.add('wps:pdf-render:{}:{}'.format(permit_id, digest), True, RENDER_LOCK_TIMEOUT)
+
+
+def finish_render(permit_id, digest):
+    cache.delete('wps:pdf-render:{}:{}'.format(permit_id, digest))
+
+
+def is_latest_render(permit_id, digest):
+    return cache.get('wps:pdf-latest:{}'.format(permit_id)) in (None, digest)
+
+
+def render_pdf(context):
+    """
+        Render permit PDF from the template context.
+
+        Returns: PDF bytes or None if rendering failed
+    """
+
+    html = get_pdf_template().render(context)
+    result = io.BytesIO()
+
+    pdf = pisa.pisaDocument(io.BytesIO(html.encode('UTF-8')), result)
+
+    if pdf.err:
+        return None
+
+    return result.getvalue()
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+    # compile the template and load pisa fonts and CSS defaults before the first real render
+    get_pdf_template()
+    pisa.pisaDocument(io.BytesIO(b'<p>warm-up</p>'), io.BytesIO())
+
+
+def _render_in_worker(context):
+    started = time.monotonic()
+    pdf = render_pdf(context)
+    return pdf, time.monotonic() - started
+
+
+class PdfRenderPool:
+    """
+        Renders permit PDFs in a pool of worker processes with warm templates.
+
+        At most queue_size renders are pending at once, submit() blocks above that so jobs
+        stay in the queue instead of piling up in memory.
+    """
+
+    def __init__(self, workers=PDF_WORKERS, queue_size=PDF_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self._rendered = 0
+        self._failed = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._render_times = deque(maxlen=LATENCY_WINDOW)
+
+    def get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._executor
+
+    def get_metrics(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            render_times = list(self._render_times)
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queue_depth': self._pending,
+                'rendered': self._rendered,
+                'failed': self._failed,
+                'latency_avg': sum(latencies) / len(latencies) if latencies else None,
+                'latency_max': max(latencies) if latencies else None,
+                'render_avg': sum(render_times) / len(render_times) if render_times else None,
+            }
+
+    def publish_metrics(self):
+        cache.set(METRICS_CACHE_KEY, self.get_metrics(), METRICS_TIMEOUT)
+
+    def submit(self, context, callback, timeout=None):
+        """
+            Render PDF for the context and call callback(pdf) with the result (None if rendering failed).
+            In pool mode the callback runs in a pool thread, after the call returns.
+
+            Returns: False (and callback isn't called) if the queue stayed full for timeout seconds
+        """
+
+        queued = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            return False
+        with self._lock:
+            self._pending += 1
+
+        if not self.workers:
+            try:
+                result, error = _render_in_worker(context), None
+            except Exception as e:
+                result, error = None, e
+            self._finish(queued, callback, result, error)
+            return True
+
+        future = self.get_executor().submit(_render_in_worker, context)
+        future.add_done_callback(lambda f: self._done(f, queued, callback))
+        self.publish_metrics()
+        return True
+
+    def _done(self, future, queued, callback):
+        try:
+            result, error = future.result(), None
+        except Exception as e:
+            result, error = None, e
+
+        try:
+            self._finish(queued, callback, result, error)
+        finally:
+            # callbacks run in the executor thread, don't leave its connections open
+            connections.close_all()
+
+    def _finish(self, queued, callback, result, error):
+        pdf = None
+        if error is not None:
+            logger.error('PDF rendering failed', exc_info=error)
+        else:
+            pdf = result[0]
+
+        try:
+            callback(pdf)
+        except Exception:
+            logger.exception('Storing rendered PDF failed')
+            pdf = None
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._latencies.append(time.monotonic() - queued)
+                if result is not None:
+                    self._render_times.append(result[1])
+                if pdf is None:
+                    self._failed += 1
+                else:
+                    self._rendered += 1
+            self._slots.release()
+            self.publish_metrics()
+
+    def render(self, context, timeout=None):
+        """
+            Render PDF for the context in the pool and wait for the result.
+
+            Returns: PDF bytes or None if rendering failed (or didn't finish in timeout seconds,
+            including the wait for a free queue slot)
+        """
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        done = threading.Event()
+        result = {}
+
+        def callback(pdf):
+            result['pdf'] = pdf
+            done.set()
+
+        if not self.submit(context, callback, timeout=timeout):
+            logger.warning('PDF rendering queue stayed full for %s seconds', timeout)
+            return None
+
+        if not done.wait(max(deadline - time.monotonic(), 0) if deadline is not None else None):
+            logger.warning('PDF rendering did not finish in %s seconds', timeout)
+        return result.get('pdf')
+
+
+pdf_pool = PdfRenderPool()
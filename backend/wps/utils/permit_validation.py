@@ -0,0 +1,72 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from wps.models import Permit
+from wps.utils.jobs import enqueue_jobs
+from wps.utils.water_balance import KINDS, refresh_allocations
+
+
+def get_related_name(kind):
+    return Permit._meta.get_field(KINDS[kind]['relation']).related_query_name()
+
+
+def get_points(kind, permit_ids):
+    # points linked to the permits, joined through the m2m table
+    point_model = KINDS[kind]['point_model']
+    return point_model.objects.filter(**{'{}__in'.format(get_related_name(kind)): permit_ids})
+
+
+def validate_permits(validations, user, send_email=True):
+    """
+        Set status and remark of many permits and the approved flag of their points with
+        set-based updates in a single transaction. Allocations of the affected water bodies
+        are refreshed once, PDF and e-mail jobs are queued in bulk.
+
+        validations: {permit_id: {'status': status, 'remark': remark}}, the remark of a permit
+        is kept if it is missing or None
+
+        Returns: ids of validated permits (missing permits are skipped)
+    """
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        permit_ids = list(
+            Permit.objects.select_for_update().filter(pk__in=list(validations)).values_list('pk', flat=True))
+
+        # one UPDATE per distinct status and remark
+        groups = defaultdict(list)
+        for pk in permit_ids:
+            groups[(validations[pk]['status'], validations[pk].get('remark'))].append(pk)
+
+        for (status, remark), ids in groups.items():
+            values = {'status': status, 'validated_on': now, 'validated_by': user}
+            if remark is not None:
+                values['remark'] = remark
+            Permit.objects.filter(pk__in=ids).update(**values)
+
+        approved_ids = [pk for pk in permit_ids if validations[pk]['status'] == 'approved']
+        not_approved_ids = [pk for pk in permit_ids if validations[pk]['status'] != 'approved']
+
+        water_body_ids = set()
+        for kind in KINDS:
+            water_body_ids.update(
+                get_points(kind, permit_ids).filter(water_body__isnull=False).values_list('water_body', flat=True))
+
+            # a point shared by several permits stays approved if any of them is approved,
+            # including approved permits outside of this validation (statuses are updated above)
+            get_points(kind, not_approved_ids).exclude(
+                **{'{}__status'.format(get_related_name(kind)): 'approved'}).update(approved=False)
+            get_points(kind, approved_ids).update(approved=True)
+
+        # Update materialized water body allocations
+        refresh_allocations(water_body_ids)
+
+        # QuerySet.update doesn't send post_save, queue the jobs of the permit signals
+        enqueue_jobs('create_pdf', [{'obj_id': pk} for pk in permit_ids])
+        if send_email:
+            enqueue_jobs('email_permit_status_update', [{'obj_id': pk} for pk in permit_ids])
+
+    return permit_ids
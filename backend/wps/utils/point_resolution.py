@@ -0,0 +1,66 @@
+import os
+
+from django.db import connection
+
+from wps.models import NodeFlowMeasurement
+
+with open(os.path.join(os.path.dirname(__file__), 'sql', 'resolve_points.sql')) as f:
+    RESOLVE_POINTS_SQL = f.read()
+
+# Number of points resolved by a single spatial query
+CHUNK_SIZE = 1000
+
+
+def get_node_flows(node_ids):
+    # statistics computed from daily flows replace the imported measurement of the same month
+    flows = {node_id: [] for node_id in node_ids}
+    measurements = (
+        NodeFlowMeasurement.objects
+        .filter(node__in=node_ids)
+        .order_by('node', 'month', '-computed')
+        .distinct('node', 'month')
+        .values('node', 'month', 'q50_value', 'ef_value', 'wafu_value')
+    )
+
+    for obj in measurements:
+        flows[obj.pop('node')].append(obj)
+
+    return flows
+
+
+def _resolve_chunk(coordinates):
+    params = {
+        'lons': [lon for lon, _ in coordinates],
+        'lats': [lat for _, lat in coordinates]
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(RESOLVE_POINTS_SQL, params)
+        return cursor.fetchall()
+
+
+def resolve_points(coordinates):
+    """
+        Resolve surface water body, sub-basin, basin and closest node (with its monthly flows)
+        for every (lon, lat) pair. One spatial query is executed per CHUNK_SIZE points and one
+        query for flows of all matched nodes.
+    """
+
+    rows = []
+    for i in range(0, len(coordinates), CHUNK_SIZE):
+        rows.extend(_resolve_chunk(coordinates[i:i + CHUNK_SIZE]))
+
+    flows = get_node_flows({row[8] for row in rows if row[8]})
+
+    results = []
+    for (lon, lat), row in zip(coordinates, rows):
+        _, wb_id, wb_code, wb_name, sb_id, sb_name, basin_id, basin_name, node_pk, node_id = row
+        results.append({
+            'coordinates': [lon, lat],
+            'water_body': {'id': wb_id, 'wb_code': wb_code, 'name': wb_name} if wb_id else None,
+            'sub_basin': {'id': sb_id, 'name': sb_name} if sb_id else None,
+            'basin': {'id': basin_id, 'name': basin_name} if basin_id else None,
+            'closest_node': {'id': node_pk, 'node_id': node_id, 'flows': flows[node_pk]} if node_pk else None
+        })
+
+    return results
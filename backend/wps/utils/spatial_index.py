@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import shapely
+from django.contrib.gis.db.models.functions import Transform
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.cache import cache
+from django.db import transaction
+
+from wps.models import BUFFER_SRID, SurfaceWaterBody
+
+INDEX_VERSION_CACHE_KEY = 'wps:surface-water-body-index-version'
+
+# How often (in seconds) a worker checks whether another worker changed the water bodies
+VERSION_CHECK_INTERVAL = 30
+
+IndexState = namedtuple('IndexState', ('tree', 'lines', 'records', 'version', 'checked_on'))
+
+
+def project_points(points):
+    """
+        Transform shapely points from EPSG:4326 to the metric CRS of the buffers (BUFFER_SRID)
+        in a single GDAL call.
+    """
+
+    multipoint = GEOSGeometry(memoryview(shapely.to_wkb(shapely.multipoints(points))), srid=4326)
+    multipoint.transform(BUFFER_SRID)
+    return shapely.get_parts(shapely.from_wkb(bytes(multipoint.wkb)))
+
+
+class SurfaceWaterBodyIndex:
+    """
+        In-process STRtree over SurfaceWaterBody.buffer200, water body lines are kept in
+        BUFFER_SRID to rank matches by distance in meters.
+        Built lazily once per worker and rebuilt when the shared index version changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def invalidate(self):
+        """
+            Rebuild the index in all workers once the current transaction commits. Bumping the
+            version earlier would let another worker rebuild from the old rows under the new version.
+        """
+
+        transaction.on_commit(self._bump_version)
+
+    def _bump_version(self):
+        try:
+            cache.incr(INDEX_VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(INDEX_VERSION_CACHE_KEY, 1, None)
+        self._state = None
+
+    def _build(self, version):
+        records = []
+        lines = []
+        buffers = []
+
+        water_bodies = SurfaceWaterBody.objects.filter(buffer200__isnull=False).annotate(
+            metric_geom=Transform('geom', BUFFER_SRID))
+
+        for wb_id, wb_code, name, geom, buffer200 in water_bodies.values_list(
+                'id', 'wb_code', 'name', 'metric_geom', 'buffer200'):
+            records.append({'id': wb_id, 'wb_code': wb_code, 'name': name})
+            lines.append(bytes(geom.wkb))
+            buffers.append(bytes(buffer200.wkb))
+
+        tree = shapely.STRtree(shapely.from_wkb(buffers)) if buffers else None
+        return IndexState(tree, shapely.from_wkb(lines), records, version, time.monotonic())
+
+    def get_state(self):
+        state = self._state
+        if state is not None and time.monotonic() - state.checked_on < VERSION_CHECK_INTERVAL:
+            return state
+
+        with self._lock:
+            state = self._state
+            version = cache.get(INDEX_VERSION_CACHE_KEY, 0)
+
+            if state is not None and state.version == version:
+                state = state._replace(checked_on=time.monotonic())
+            else:
+                state = self._build(version)
+
+            self._state = state
+            return state
+
+    def locate_many(self, coordinates):
+        """
+            Nearest water body (by distance to its geom in meters) among those whose buffer200
+            contains the point, for each (lon, lat) pair. None if no buffer matches.
+        """
+
+        result = [None] * len(coordinates)
+        state = self.get_state()
+
+        if not coordinates or state.tree is None:
+            return result
+
+        points = shapely.points(np.asarray(coordinates, dtype=float))
+        input_idx, tree_idx = state.tree.query(points, predicate='intersects')
+
+        if not len(input_idx):
+            return result
+
+        # degrees of longitude are shorter than degrees of latitude, rank in meters
+        matched, matched_idx = np.unique(input_idx, return_inverse=True)
+        projected = project_points(points[matched])
+        distances = shapely.distance(projected[matched_idx], state.lines[tree_idx])
+
+        # keep the closest water body for every input point
+        order = np.lexsort((distances, input_idx))
+        input_idx = input_idx[order]
+        tree_idx = tree_idx[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = input_idx[1:] != input_idx[:-1]
+
+        for i, j in zip(input_idx[first], tree_idx[first]):
+            result[i] = state.records[j]
+
+        return result
+
+    def locate(self, lon, lat):
+        return self.locate_many([(lon, lat)])[0]
+
+
+water_body_index = SurfaceWaterBodyIndex()
@@ -0,0 +1,89 @@
+from django.db import connection, transaction
+
+from wps.models import (AbstractionPoint, AssessmentPoint, DischargePoint,
+                        GaugingStation, SubBasin)
+from wps.utils.layer_cache import batch_layer_bumps, bump_layer_version
+
+# Link every child row to the first intersecting parent, using the GiST index of the parent geometry
+SPATIAL_JOIN_SQL = """
+UPDATE {table} t
+SET {column} = m.parent_id
+FROM (
+  SELECT c.id, (
+    SELECT p.id
+    FROM {parent_table} p
+    WHERE ST_Intersects(p.{parent_geom}, {child_geom})
+    ORDER BY {order_by}
+    LIMIT 1
+  ) AS parent_id
+  FROM {table} c
+  {where}
+) m
+WHERE t.id = m.id AND t.{column} IS DISTINCT FROM m.parent_id
+"""
+
+# name: (model, FK field, parent geometry, child geometry, order of candidate parents, cached layer)
+SPATIAL_JOINS = {
+    'subbasin-basin': (SubBasin, 'basin', 'geom', 'ST_Centroid(c.geom)', 'p.id', 'sub-basins'),
+    'gauging-station-water-body': (
+        GaugingStation, 'water_body', 'buffer200', 'c.geom', 'p.geom <-> c.geom', 'gauging-stations'),
+    'abstraction-point-subbasin': (AbstractionPoint, 'subbasin', 'geom', 'c.geom', 'p.id', None),
+    'discharge-point-subbasin': (DischargePoint, 'subbasin', 'geom', 'c.geom', 'p.id', None),
+    'assessment-point-subbasin': (AssessmentPoint, 'subbasin', 'geom', 'c.geom', 'p.id', None),
+}
+
+# spatial joins affected by a refresh of a layer
+LAYER_JOINS = {
+    'basins': ['subbasin-basin'],
+    'sub-basins': [
+        'subbasin-basin', 'abstraction-point-subbasin', 'discharge-point-subbasin', 'assessment-point-subbasin'],
+    'water-bodies': ['gauging-station-water-body'],
+    'gauging-stations': ['gauging-station-water-body'],
+}
+
+
+def spatial_join(name, ids=None):
+    """
+        Assign the parent of all (or only the given) child rows in a single UPDATE ... FROM.
+
+        Returns: number of changed rows
+    """
+
+    model, field_name, parent_geom, child_geom, order_by, layer = SPATIAL_JOINS[name]
+    field = model._meta.get_field(field_name)
+
+    sql = SPATIAL_JOIN_SQL.format(
+        table=model._meta.db_table,
+        column=field.column,
+        parent_table=field.related_model._meta.db_table,
+        parent_geom=parent_geom,
+        child_geom=child_geom,
+        order_by=order_by,
+        where='WHERE c.id = ANY(%s)' if ids is not None else ''
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(ids)] if ids is not None else [])
+        count = cursor.rowcount
+
+    if count and layer:
+        # deferred until the caller's transaction commits
+        bump_layer_version(layer)
+
+    return count
+
+
+def relink_spatial(names=None):
+    """
+        Run the given (default all) spatial joins in one transaction, changed layers are bumped
+        once after the commit.
+
+        Returns: {name: number of changed rows}
+    """
+
+    with batch_layer_bumps(), transaction.atomic():
+        return {name: spatial_join(name) for name in (SPATIAL_JOINS.keys() if names is None else names)}
+
+
+def relink_layer(layer):
+    return relink_spatial(LAYER_JOINS.get(layer, []))
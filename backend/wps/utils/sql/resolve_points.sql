@@ -0,0 +1,45 @@
+WITH pts AS (
+  SELECT
+    ord,
+    ST_SetSRID(ST_MakePoint(lon, lat), 4326) AS geom
+  FROM
+    unnest(%(lons)s::float8[], %(lats)s::float8[]) WITH ORDINALITY AS t(lon, lat, ord)
+)
+SELECT
+  pts.ord,
+  swb.id,
+  swb.wb_code,
+  swb.name,
+  sb.id,
+  sb.name,
+  b.id,
+  b.name,
+  node.id,
+  node.node_id
+FROM
+  pts
+LEFT JOIN LATERAL (
+  SELECT id, wb_code, name, node1_id, node2_id
+  FROM wps_surfacewaterbody
+  WHERE ST_Intersects(buffer200, pts.geom)
+  ORDER BY ST_Distance(geom, pts.geom), id
+  LIMIT 1
+) swb ON true
+LEFT JOIN LATERAL (
+  SELECT id, name, basin_id
+  FROM wps_subbasin
+  WHERE ST_Intersects(geom, pts.geom)
+  -- overlapping sub-basins: same choice as the abstraction-point-subbasin spatial join
+  ORDER BY id
+  LIMIT 1
+) sb ON true
+LEFT JOIN wps_basin b ON b.id = sb.basin_id
+LEFT JOIN LATERAL (
+  SELECT n.id, n.node_id
+  FROM wps_waterbodynode n
+  WHERE n.id IN (swb.node1_id, swb.node2_id)
+  ORDER BY n.geom <-> pts.geom, n.id
+  LIMIT 1
+) node ON true
+ORDER BY
+  pts.ord;
@@ -0,0 +1,22 @@
+WITH bounds AS (
+  SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom
+),
+mvtgeom AS (
+  SELECT
+    ST_AsMVTGeom(
+      ST_Transform(ST_SimplifyPreserveTopology(t.geom, %(tolerance)s), 3857),
+      bounds.geom
+    ) AS geom,
+    {columns}
+  FROM
+    {table} t,
+    bounds
+  WHERE
+    t.geom && ST_Transform(bounds.geom, 4326)
+)
+SELECT
+  ST_AsMVT(mvtgeom.*, %(layer)s)
+FROM
+  mvtgeom
+WHERE
+  mvtgeom.geom IS NOT NULL;
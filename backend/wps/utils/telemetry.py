@@ -0,0 +1,198 @@
+import csv
+import io
+import json
+import math
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from wps.models import GaugingStation, WaterHeight
+
+BUCKETS = ('hour', 'day', 'month')
+
+FORMATS = ('csv', 'ndjson')
+
+# Number of readings loaded by a single COPY
+BATCH_SIZE = 100000
+
+# Number of rejected readings reported per batch
+MAX_ERRORS = 20
+
+# the table outlives a batch when loading inside an outer transaction, hence IF NOT EXISTS + TRUNCATE
+STAGING_SQL = """
+CREATE TEMPORARY TABLE IF NOT EXISTS water_height_staging (
+  ordinal integer,
+  gauging_station_id bigint,
+  measured_on timestamptz,
+  value double precision
+) ON COMMIT DROP
+"""
+
+COPY_SQL = 'COPY water_height_staging (ordinal, gauging_station_id, measured_on, value) FROM STDIN'
+
+# the last reading of a station and timestamp in the batch wins, stored readings are replaced
+MERGE_SQL = """
+INSERT INTO wps_waterheight (gauging_station_id, measured_on, value)
+SELECT DISTINCT ON (gauging_station_id, measured_on) gauging_station_id, measured_on, value
+FROM water_height_staging
+ORDER BY gauging_station_id, measured_on, ordinal DESC
+ON CONFLICT (gauging_station_id, measured_on) DO UPDATE SET value = EXCLUDED.value
+"""
+
+
+def copy_from(cursor, sql, data):
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, 'copy_expert'):
+        # psycopg2
+        raw_cursor.copy_expert(sql, io.StringIO(data))
+    else:
+        # psycopg 3
+        with raw_cursor.copy(sql) as copy:
+            copy.write(data)
+
+
+def copy_water_heights(rows):
+    """
+        Store (station_id, measured_on, value) rows with COPY into a staging table and a single upsert.
+
+        Returns: number of distinct stored readings
+    """
+
+    data = ''.join(
+        '{}\t{}\t{}\t{!r}\n'.format(ordinal, station_id, measured_on.isoformat(), value)
+        for ordinal, (station_id, measured_on, value) in enumerate(rows)
+    )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(STAGING_SQL)
+        cursor.execute('TRUNCATE water_height_staging')
+        copy_from(cursor, COPY_SQL, data)
+        cursor.execute(MERGE_SQL)
+        return cursor.rowcount
+
+
+def ingest_water_heights(station, readings):
+    """
+        Store (measured_on, value) readings of the gauging station, replacing values of
+        already stored timestamps.
+
+        Returns: number of stored readings
+    """
+
+    return copy_water_heights([(station.pk, measured_on, value) for measured_on, value in readings])
+
+
+def iter_records(lines, fmt):
+    """
+        Yield reading records (dicts with station, measured_on and value) from CSV (with header)
+        or NDJSON lines. Lines which can't be decoded are yielded as ValueError.
+    """
+
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+        return
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield ValueError('Invalid JSON: {}'.format(e))
+            continue
+        yield record if isinstance(record, dict) else ValueError('Reading must be an object')
+
+
+def parse_measured_on(value):
+    try:
+        measured_on = datetime.fromisoformat(value)
+    except ValueError:
+        measured_on = parse_datetime(value)
+        if measured_on is None:
+            raise ValueError('Invalid measured_on: {}'.format(value))
+
+    if timezone.is_naive(measured_on):
+        measured_on = timezone.make_aware(measured_on)
+    return measured_on
+
+
+def parse_reading(record, station_ids):
+    if isinstance(record, ValueError):
+        raise record
+
+    try:
+        station_id = int(record['station'])
+        measured_on = parse_measured_on(record['measured_on'])
+        value = float(record['value'])
+    except KeyError as e:
+        raise ValueError('Missing {}'.format(e))
+    except TypeError:
+        raise ValueError('Invalid reading: {}'.format(record))
+
+    if station_id not in station_ids:
+        raise ValueError('Unknown station: {}'.format(station_id))
+    if not math.isfinite(value):
+        raise ValueError('Invalid value: {}'.format(value))
+
+    return station_id, measured_on, value
+
+
+def load_water_heights(records, batch_size=BATCH_SIZE):
+    """
+        Validate and store readings of many stations, one COPY per batch.
+
+        Yields per batch: {'batch', 'accepted', 'rejected', 'stored', 'errors'}
+    """
+
+    station_ids = set(GaugingStation.objects.values_list('pk', flat=True))
+
+    def flush(number, rows, rejected, errors):
+        return {
+            'batch': number,
+            'accepted': len(rows),
+            'rejected': rejected,
+            'stored': copy_water_heights(rows) if rows else 0,
+            'errors': errors
+        }
+
+    number = 1
+    rows = []
+    rejected = 0
+    errors = []
+
+    for record_no, record in enumerate(records, start=1):
+        try:
+            rows.append(parse_reading(record, station_ids))
+        except ValueError as e:
+            rejected += 1
+            if len(errors) < MAX_ERRORS:
+                errors.append({'record': record_no, 'error': str(e)})
+
+        if len(rows) + rejected >= batch_size:
+            yield flush(number, rows, rejected, errors)
+            number += 1
+            rows = []
+            rejected = 0
+            errors = []
+
+    if rows or rejected:
+        yield flush(number, rows, rejected, errors)
+
+
+def get_water_height_series(station, bucket, start, end):
+    """
+        Min/mean/max water height of the gauging station per bucket (hour, day or month) in [start, end).
+    """
+
+    return list(
+        WaterHeight.objects
+        .filter(gauging_station=station, measured_on__gte=start, measured_on__lt=end)
+        .annotate(bucket=Trunc('measured_on', bucket))
+        .values('bucket')
+        .annotate(min=Min('value'), mean=Avg('value'), max=Max('value'), count=Count('id'))
+        .order_by('bucket')
+    )
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+
+from wps.models import (SubBasin, SurfaceWaterBody, WaterCourseNetwork,
+                        WaterUseSector, Wetland)
+
+with open(os.path.join(os.path.dirname(__file__), 'sql', 'vector_tile.sql')) as f:
+    VECTOR_TILE_SQL = f.read()
+
+TILES_DIR = os.path.join(settings.DATA_DIR, 'tiles')
+
+# Geometry is simplified to roughly one pixel of a 256px tile at the requested zoom
+TILE_SIZE = 256
+
+TILE_LAYERS = {
+    'sub-basins': {'model': SubBasin, 'columns': ('id', 'name')},
+    'water-bodies': {'model': SurfaceWaterBody, 'columns': ('id', 'name', 'wb_code')},
+    'water-course-network': {'model': WaterCourseNetwork, 'columns': ('id', 'name')},
+    'wetlands': {'model': Wetland, 'columns': ('id', 'name')},
+    'water-use-sectors': {'model': WaterUseSector, 'columns': ('id', 'name')},
+}
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def get_tile_path(layer, z, x, y):
+    return os.path.join(TILES_DIR, layer, str(z), str(x), '{}.pbf'.format(y))
+
+
+def render_tile(layer, z, x, y):
+    config = TILE_LAYERS[layer]
+    sql = VECTOR_TILE_SQL.format(
+        table=config['model']._meta.db_table,
+        columns=', '.join('t.{}'.format(column) for column in config['columns'])
+    )
+    params = {'z': z, 'x': x, 'y': y, 'layer': layer, 'tolerance': 360.0 / (TILE_SIZE * 2 ** z)}
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    return bytes(row[0]) if row and row[0] else b''
+
+
+def get_tile(layer, z, x, y):
+    """
+        Return MVT tile for the layer, rendering it with PostGIS on the first request
+        and serving it from the on-disk tile cache afterwards.
+    """
+
+    fpath = get_tile_path(layer, z, x, y)
+
+    if os.path.exists(fpath):
+        with open(fpath, 'rb') as f:
+            return f.read()
+
+    tile = render_tile(layer, z, x, y)
+
+    dirpath = os.path.dirname(fpath)
+    os.makedirs(dirpath, exist_ok=True)
+
+    # write to a temporary file first so concurrent readers never see a partial tile
+    fd, tmp_path = tempfile.mkstemp(dir=dirpath)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(tile)
+    os.replace(tmp_path, fpath)
+
+    return tile
+
+
+def invalidate_tile_cache(layer):
+    shutil.rmtree(os.path.join(TILES_DIR, layer), ignore_errors=True)
@@ -0,0 +1,227 @@
+from django.db import transaction
+from django.db.models import Sum
+
+from wps.models import (AbstractionPoint, DischargePoint, NodeFlowMeasurement,
+                        PermitMonthlyValue, SurfaceWaterBody,
+                        WaterBodyMonthlyAllocation)
+
+MONTHS = [str(month) for month in range(1, 13)]
+
+# Permit relation and monthly quantity fields (m3, m3/s) for each allocation kind
+KINDS = {
+    'abstraction': {
+        'point_model': AbstractionPoint,
+        'relation': 'abstraction_points',
+        'm3': 'abstraction_m3_per_month',
+        'm3s': 'abstraction_m3s_per_month'
+    },
+    'discharge': {
+        'point_model': DischargePoint,
+        'relation': 'discharge_points',
+        'm3': 'discharge_m3_per_month',
+        'm3s': 'discharge_m3s_per_month'
+    }
+}
+
+
+def empty_months():
+    return {month: 0 for month in MONTHS}
+
+
+def empty_totals():
+    return {'m3': empty_months(), 'm3s': empty_months()}
+
+
+def compute_allocated_totals(water_body_ids=None, kind='abstraction', points=None):
+    """
+        Sum monthly quantities of approved permits for each water body in a single aggregate query.
+        A permit is counted once for every approved point it holds on the water body.
+        If water_body_ids is None, all water bodies with approved points are returned.
+        If points is given, only permits allocated through these points are summed.
+
+        Returns: {water_body_id: {'m3': {'1': total, ..., '12': total}, 'm3s': {...}}}
+    """
+
+    config = KINDS[kind]
+    relation = config['relation']
+    units = {config['m3']: 'm3', config['m3s']: 'm3s'}
+
+    approved_points = config['point_model'].objects.filter(approved=True, water_body__isnull=False)
+    if water_body_ids is not None:
+        approved_points = approved_points.filter(water_body__in=water_body_ids)
+    if points is not None:
+        approved_points = approved_points.filter(pk__in=points)
+
+    group_by = 'permit__{}__water_body'.format(relation)
+    rows = (
+        PermitMonthlyValue.objects
+        .filter(quantity__in=list(units), **{'permit__{}__in'.format(relation): approved_points})
+        .values_list(group_by, 'quantity', 'month')
+        .annotate(total=Sum('value'))
+        .order_by()
+    )
+
+    totals = {wb_id: empty_totals() for wb_id in water_body_ids or []}
+
+    for wb_id, quantity, month, total in rows:
+        wb_totals = totals.setdefault(wb_id, empty_totals())
+        wb_totals[units[quantity]][str(month)] = total
+
+    return totals
+
+
+def get_permit_water_body_ids(permit, kind=None):
+    kinds = [kind] if kind else KINDS.keys()
+    water_body_ids = set()
+
+    for kind in kinds:
+        related = getattr(permit, KINDS[kind]['relation'])
+        water_body_ids.update(related.filter(water_body__isnull=False).values_list('water_body', flat=True))
+
+    return water_body_ids
+
+
+def refresh_allocations(water_body_ids, kinds=None):
+    """
+        Recompute materialized monthly allocations for the given water bodies.
+        The water body rows are locked first, so concurrent refreshes of a water body run one
+        after another and each one sums the points committed by the previous ones.
+    """
+
+    water_body_ids = sorted(wb_id for wb_id in set(water_body_ids) if wb_id)
+    if not water_body_ids:
+        return
+
+    with transaction.atomic():
+        # locked in primary key order, refreshes of overlapping water bodies don't deadlock
+        locked = SurfaceWaterBody.objects.select_for_update().filter(pk__in=water_body_ids).order_by('pk')
+        list(locked.values_list('pk', flat=True))
+
+        objs = []
+        for kind in kinds or KINDS.keys():
+            totals = compute_allocated_totals(water_body_ids, kind=kind)
+            for wb_id, wb_totals in totals.items():
+                for month in MONTHS:
+                    objs.append(WaterBodyMonthlyAllocation(
+                        water_body_id=wb_id,
+                        kind=kind,
+                        month=int(month),
+                        total_m3=wb_totals['m3'][month],
+                        total_m3s=wb_totals['m3s'][month]
+                    ))
+
+        WaterBodyMonthlyAllocation.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=['water_body', 'kind', 'month'],
+            update_fields=['total_m3', 'total_m3s', 'updated_on']
+        )
+
+
+def refresh_permit_allocations(permit):
+    refresh_allocations(get_permit_water_body_ids(permit))
+
+
+def get_permit_contribution(water_body_ids, permit, kind='abstraction'):
+    """
+        Share of the materialized totals allocated through the approved points of the reference
+        permit, by the permit itself and by other permits sharing these points.
+    """
+
+    points = getattr(permit, KINDS[kind]['relation']).all()
+    return compute_allocated_totals(water_body_ids, kind=kind, points=points)
+
+
+def get_allocated_totals(water_body_ids, kind='abstraction', permit=None):
+    """
+        Monthly allocated totals read from the materialized allocation table.
+        Approved points of the reference permit (and so the permit itself) are excluded.
+
+        Returns: {water_body_id: {'m3': {'1': total, ..., '12': total}, 'm3s': {...}}}
+    """
+
+    totals = {wb_id: empty_totals() for wb_id in water_body_ids}
+    rows = (
+        WaterBodyMonthlyAllocation.objects
+        .filter(water_body__in=water_body_ids, kind=kind)
+        .values_list('water_body', 'month', 'total_m3', 'total_m3s')
+    )
+
+    for wb_id, month, total_m3, total_m3s in rows:
+        totals[wb_id]['m3'][str(month)] = total_m3
+        totals[wb_id]['m3s'][str(month)] = total_m3s
+
+    if permit is not None:
+        for wb_id, wb_contribution in get_permit_contribution(water_body_ids, permit, kind=kind).items():
+            for unit in ('m3', 'm3s'):
+                for month in MONTHS:
+                    totals[wb_id][unit][month] -= wb_contribution[unit][month]
+
+    return totals
+
+
+def get_wafu_per_month(node_ids):
+    """
+        Water available for use per month for each node.
+        If several years are stored, the latest measurement for the month wins,
+        computed statistics win over imported measurements.
+
+        Returns: {node_id: {'1': wafu, ..., '12': wafu}}
+    """
+
+    wafu = {node_id: {} for node_id in node_ids}
+    measurements = (
+        NodeFlowMeasurement.objects
+        .filter(node__in=node_ids)
+        .order_by('computed', 'month')
+        .values_list('node', 'month', 'wafu_value')
+    )
+
+    for node_id, month, value in measurements:
+        wafu[node_id][str(month.month)] = value
+
+    return wafu
+
+
+def get_headroom(allocated_m3s, wafu):
+    if not wafu:
+        return None
+
+    return {
+        month: wafu[month] - allocated_m3s[month] if month in wafu else None
+        for month in MONTHS
+    }
+
+
+def get_closest_node(water_body, permit=None):
+    if permit is not None:
+        ap = permit.abstraction_points.filter(water_body=water_body).first()
+        if ap and ap.closest_node:
+            return ap.closest_node
+
+    node = water_body.node1 or water_body.node2
+    if not node:
+        return None
+
+    return {'id': node.id, 'node_id': node.node_id}
+
+
+def get_water_balance(water_body, permit=None):
+    """
+        Allocated monthly totals for the water body (reference permit excluded) and the
+        remaining headroom against WAFU of the closest node.
+    """
+
+    totals = get_allocated_totals([water_body.id], permit=permit)[water_body.id]
+    node = get_closest_node(water_body, permit)
+    wafu = get_wafu_per_month([node['id']])[node['id']] if node else None
+
+    return {
+        'water_body': water_body.id,
+        'node': node,
+        'allocated_m3': totals['m3'],
+        'allocated_m3s': totals['m3s'],
+        'wafu': wafu or None,
+        'headroom_m3s': get_headroom(totals['m3s'], wafu)
+    }
+
@@ -1,6 +1,10 @@
 import json
+import math
+
 from django.core.exceptions import ValidationError
 
+MONTH_KEYS = [str(month) for month in range(1, 13)]
+
 
 def validate_monthly_json_values(value):
     # Check if the value is a valid JSON object
@@ -26,11 +30,25 @@ def validate_monthly_json_values(value):
             raise ValidationError(f"Invalid value for month {month}")
 
 
+def validate_partial_monthly_json_values(value):
+    # Months may be missing, but every given month must be 1-12 with a number
+    if not isinstance(value, dict):
+        raise ValidationError("The value should be a JSON object of months")
+
+    for month, month_value in value.items():
+        if month not in MONTH_KEYS:
+            raise ValidationError(f"Invalid month {month}")
+
+        if isinstance(month_value, bool) or not isinstance(month_value, (int, float)) \
+                or not math.isfinite(month_value):
+            raise ValidationError(f"Invalid value for month {month}")
+
+
 def validate_point_within_water_body(value):
     water_body = value.water_body
 
-    if not water_body:
-        return  # Skip validation if water_body is not set
+    if not water_body or water_body.buffer200 is None:
+        return  # Skip validation if water_body or its buffer is not set
 
     # Check if the geom is within the buffer200 of the related water_body
     if not water_body.buffer200.contains(value.geom):
@@ -1,49 +1,152 @@
 
 import uuid
+from datetime import timedelta
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from django.conf import settings
-from django.contrib.gis.geos import Point
+from django.core.cache import cache
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import filters, generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .models import (AbstractionPoint, AbstractionPointWaterUse, Basin,
                      DischargePoint, DischargePointWaterUse, GaugingStation,
-                     NaceCode, NodeFlowMeasurement, Permit, SubBasin,
+                     Job, NaceCode, NodeFlowMeasurement, Permit, SubBasin,
                      SurfaceWaterBody, WaterBodyNode, WaterUseSector)
-from .permissions import PermitObjectPermission, PermitValidationPermission
+from .permissions import (PermitObjectPermission, PermitValidationPermission,
+                          WaterHeightPermission)
 from .serializers import (AbstractionPointSerializer,
                           AbstractionPointWaterUseSerializer, BasinSerializer,
+                          CoordinatesSerializer,
                           DischargePointSerializer,
                           DischargePointWaterUseSerializer,
-                          GaugingStationSerializer, NaceCodeSerializer,
+                          GaugingStationSerializer, JobSerializer,
+                          NaceCodeSerializer,
                           NodeFlowMeasurementSerializer,
+                          PermitBulkValidationSerializer,
                           PermitReadOnlySerializer, PermitSerializer,
                           PermitValidationSerializer, SubBasinMapSerializer,
                           SubBasinSerializer, SurfaceWaterBodySimpleSerializer,
-                          WaterBodyNodeSerializer, WaterUseSectorSerializer)
+                          WaterBodyNodeSerializer, WaterHeightSerializer,
+                          WaterUseSectorSerializer)
 from .utils.export import export_permit_to_xlsx
+from .utils.geometry import (DEFAULT_PRECISION, MAX_PRECISION,
+                             geojson_expression, get_cached_geometries,
+                             is_cached_level)
+from .utils.jobs import get_job_metrics, requeue_jobs
+from .utils.layer_cache import (get_cached_response_data, get_layers_etag,
+                                set_cached_response_data)
+from .utils.pdf import METRICS_CACHE_KEY as PDF_METRICS_CACHE_KEY
+from .utils.permit_validation import validate_permits
+from .utils.point_resolution import resolve_points
+from .utils.spatial_index import water_body_index
+from .utils.telemetry import (BUCKETS, get_water_height_series,
+                              ingest_water_heights, iter_records,
+                              load_water_heights)
+from .utils.tiles import TILE_LAYERS, get_tile, is_valid_tile
+from .utils.water_balance import get_allocated_totals, get_water_balance
+
+
+class CachedLayerMixin:
+    """
+        Cache list responses of static reference layers on the layer version.
+        Supports conditional GET (ETag/If-None-Match).
+    """
+
+    layers = ()
+
+    def list(self, request, *args, **kwargs):
+        etag = get_layers_etag(self.layers, request.get_full_path())
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = get_cached_response_data(etag)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                set_cached_response_data(etag, data)
+            response = Response(data)
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class SimplifiedGeometryMixin:
+    """
+        Optional query params, applied in the database:
+            - simplify: tolerance (in degrees) for ST_SimplifyPreserveTopology
+            - precision: max number of decimal digits in GeoJSON coordinates
+        Without them geometries are serialized in full, as before.
+    """
+
+    def parse_geometry_params(self):
+        params = self.request.query_params
+
+        if 'simplify' not in params and 'precision' not in params:
+            return None
+
+        try:
+            tolerance = float(params.get('simplify', 0))
+            precision = int(params.get('precision', DEFAULT_PRECISION))
+        except ValueError:
+            raise ValidationError({'error': "'simplify' must be a number and 'precision' an integer!"})
+
+        if tolerance < 0 or not 0 <= precision <= MAX_PRECISION:
+            raise ValidationError({'error': "'simplify' or 'precision' is out of range!"})
+
+        return tolerance, precision
 
+    def get_geometry_params(self):
+        # parsed once per request, used by both the queryset and the serializer context
+        if not hasattr(self, '_geometry_params'):
+            self._geometry_params = self.parse_geometry_params()
+        return self._geometry_params
 
-class NaceCodeList(generics.ListAPIView):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.get_geometry_params()
+
+        if params is None:
+            return queryset
+
+        tolerance, precision = params
+        queryset = queryset.defer('geom')
+        if is_cached_level(tolerance):
+            return queryset
+        return queryset.annotate(geom_json=geojson_expression(tolerance, precision))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        params = self.get_geometry_params()
+
+        if params is not None and is_cached_level(params[0]):
+            context['geometries'] = get_cached_geometries(self.queryset.model, *params)
+        return context
+
+
+class NaceCodeList(CachedLayerMixin, generics.ListAPIView):
+    layers = ('nace-codes', )
     queryset = NaceCode.objects.all()
     serializer_class = NaceCodeSerializer
 
 
-class WaterUseSectorList(generics.ListAPIView):
+class WaterUseSectorList(CachedLayerMixin, SimplifiedGeometryMixin, generics.ListAPIView):
+    layers = ('water-use-sectors', )
     queryset = WaterUseSector.objects.all()
     serializer_class = WaterUseSectorSerializer
 
 
-class BasinList(generics.ListAPIView):
+class BasinList(CachedLayerMixin, generics.ListAPIView):
+    layers = ('basins', )
     queryset = Basin.objects.all()
     serializer_class = BasinSerializer
 
@@ -56,11 +159,51 @@ class SubBasinList(generics.ListAPIView):
         return SubBasin.objects.filter(basin=basin)
 
 
-class SubBasinMapList(generics.ListAPIView):
+class SubBasinMapList(CachedLayerMixin, SimplifiedGeometryMixin, generics.ListAPIView):
+    layers = ('sub-basins', )
     queryset = SubBasin.objects.all()
     serializer_class = SubBasinMapSerializer
 
 
+class VectorTile(APIView):
+
+    @swagger_auto_schema(
+        responses={'200': 'OK', '400': 'Bad Request', '404': 'Not Found'},
+        operation_id='VectorTile',
+        operation_description='Get Mapbox vector tile for the layer.'
+    )
+    def get(self, request, *args, **kwargs):
+        """
+            Get MVT tile defined by <layer>/<z>/<x>/<y> portion of the url.
+            Available layers: sub-basins, water-bodies, water-course-network, wetlands, water-use-sectors
+        """
+
+        layer = self.kwargs['layer']
+        z, x, y = self.kwargs['z'], self.kwargs['x'], self.kwargs['y']
+
+        if layer not in TILE_LAYERS:
+            return Response(status=status.HTTP_404_NOT_FOUND, data={'error': 'Unknown layer'})
+
+        if not is_valid_tile(z, x, y):
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': 'Tile is out of range'})
+
+        # revalidated on the layer version, re-imported layers are never served stale from the browser cache
+        etag = get_layers_etag((layer, ), request.path)
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(get_tile(layer, z, x, y), content_type='application/vnd.mapbox-vector-tile')
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def perform_content_negotiation(self, request, force=False):
+        # tiles are raw protobuf, map clients may send any Accept header
+        return super().perform_content_negotiation(request, force=True)
+
+
 class PermitList(generics.ListCreateAPIView):
     serializer_class = PermitSerializer
     filter_backends = (filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend)
@@ -71,8 +214,8 @@ class PermitList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         if self.request.user.app_role_name == 'Admin':
-            return Permit.objects.all()
-        return Permit.objects.filter(submitted_by=self.request.user)
+            return Permit.objects.for_list()
+        return Permit.objects.for_list().filter(submitted_by=self.request.user)
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -87,7 +230,7 @@ class PermitList(generics.ListCreateAPIView):
 class PermitDetail(generics.RetrieveAPIView):
     permission_class = [PermitObjectPermission]
     serializer_class = PermitSerializer
-    queryset = Permit.objects.all()
+    queryset = Permit.objects.prefetch_related('monthly_values')
 
 
 class PermitXlsxExport(APIView):
@@ -107,7 +250,7 @@ class PermitXlsxExport(APIView):
         except ValueError:
             return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': 'UID is not valid'})
 
-        obj = get_object_or_404(Permit, uid=uid)
+        obj = get_object_or_404(Permit.objects.prefetch_related('monthly_values'), uid=uid)
 
         if not request.user.app_role_id and not obj.submitted_by == request.user:
             return Response(status=status.HTTP_403_FORBIDDEN)
@@ -128,7 +271,7 @@ class AbstractionPointList(generics.ListCreateAPIView):
 
     def get_queryset(self):
         if self.request.user.app_role_name == 'Admin':
-            return AbstractionPoint.objects.all()
+            return AbstractionPoint.objects.select_related('nearest_node')
         return AbstractionPoint.objects.none()
 
 
@@ -215,36 +358,121 @@ class PermitValidationView(APIView):
             return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': 'UID is not valid'})
 
         permit = get_object_or_404(Permit, uid=uid)
-        data = request.data
-
-        # Update permit status
-        permit_status = data.get('status')
-        permit.status = permit_status
-        permit.remark = data.get('remark')
-        permit.validated_on = timezone.now()
-        permit.validated_by = request.user
-        permit.save()
-
-        # Update related APs and DPs (approved=True if permit confirmed)
-        approved = True if permit_status == 'approved' else False
-        for ap in permit.abstraction_points.all():
-            ap.approved = approved
-            ap.save()
-        for dp in permit.discharge_points.all():
-            dp.approved = approved
-            dp.save()
-
-        # Send email
-        send_email = data.get('send_email', True)
-        if send_email:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.send)(
-                settings.CHANNEL_NAME_PERMITS, {'type': 'email_permit_status_update', 'data': {'obj_id': permit.id}})
+
+        serializer = PermitValidationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # Update permit status and related APs and DPs (approved=True if permit confirmed),
+        # refresh allocations and queue PDF and e-mail
+        validate_permits(
+            {permit.pk: serializer.validated_data}, request.user, send_email=request.data.get('send_email', True))
 
         return Response(status=status.HTTP_200_OK)
 
 
-class WaterCourseList(generics.ListAPIView):
+class PermitBulkValidationView(APIView):
+
+    renderer_classes = [JSONRenderer]
+    permission_classes = [PermitValidationPermission]
+
+    @swagger_auto_schema(
+        responses={'200': 'OK', '400': 'Bad Request'},
+        operation_id='PermitBulkValidationView',
+        operation_description='Validate many permits at once.',
+        request_body=PermitBulkValidationSerializer
+    )
+    def post(self, request, *args, **kwargs):
+        """
+            Validate many permits in a single transaction.
+            Required body:
+                - permits: [{"uid": permit UID, "status": status, "remark": remark (optional, kept if omitted)}, ...]
+            Optional body:
+                - send_email (default: true)
+        """
+
+        serializer = PermitBulkValidationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        validations = {item['uid']: item for item in data['permits']}
+        ids = dict(Permit.objects.filter(uid__in=list(validations)).values_list('uid', 'pk'))
+
+        missing = [str(uid) for uid in validations if uid not in ids]
+        if missing:
+            error_msg = "Permits not found: {}".format(', '.join(missing))
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        validated = validate_permits(
+            {ids[uid]: item for uid, item in validations.items()}, request.user, send_email=data['send_email'])
+
+        return Response(status=status.HTTP_200_OK, data={'validated': len(validated)})
+
+
+class PdfRenderMetrics(APIView):
+    permission_classes = [PermitValidationPermission]
+
+    @swagger_auto_schema(
+        responses={'200': 'OK', '403': 'Forbidden'},
+        operation_id='PdfRenderMetrics',
+        operation_description='Get queue depth and render latency of the PDF worker'
+    )
+    def get(self, request, *args, **kwargs):
+        """
+            Get queue depth, render counts and latencies (in seconds) of the PDF worker pool.
+        """
+
+        return Response(status=status.HTTP_200_OK, data=cache.get(PDF_METRICS_CACHE_KEY) or {})
+
+
+class JobMetrics(APIView):
+    permission_classes = [PermitValidationPermission]
+
+    @swagger_auto_schema(
+        responses={'200': 'OK', '403': 'Forbidden'},
+        operation_id='JobMetrics',
+        operation_description='Get throughput and lag of the background jobs'
+    )
+    def get(self, request, *args, **kwargs):
+        """
+            Get number of queued, running and dead jobs, throughput (jobs done per minute in the
+            last hour) and lag (seconds the oldest due job is waiting) per job kind.
+        """
+
+        return Response(status=status.HTTP_200_OK, data=get_job_metrics())
+
+
+class DeadJobList(generics.ListAPIView):
+    permission_classes = [PermitValidationPermission]
+    serializer_class = JobSerializer
+    filter_backends = (DjangoFilterBackend, )
+    filterset_fields = ('kind', )
+
+    def get_queryset(self):
+        return Job.objects.filter(status='dead').order_by('-finished_on')
+
+
+class DeadJobRetry(APIView):
+    permission_classes = [PermitValidationPermission]
+
+    @swagger_auto_schema(
+        responses={'200': 'OK', '404': 'Not Found'},
+        operation_id='DeadJobRetry',
+        operation_description='Queue the dead job again'
+    )
+    def post(self, request, *args, **kwargs):
+        """
+            Queue the dead job again with a fresh set of attempts.
+        """
+
+        job = get_object_or_404(Job, pk=self.kwargs['pk'], status='dead')
+        requeue_jobs(Job.objects.filter(pk=job.pk))
+        job.refresh_from_db()
+
+        return Response(status=status.HTTP_200_OK, data=JobSerializer(job).data)
+
+
+class WaterCourseList(CachedLayerMixin, generics.ListAPIView):
+    layers = ('water-bodies', )
     serializer_class = SurfaceWaterBodySimpleSerializer
     queryset = SurfaceWaterBody.objects.all()
 
@@ -273,19 +501,70 @@ class WaterBodyLocation(APIView):
             error_msg = "'lat' and 'lon' are required as query params!"
             return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
 
-        point = Point(float(lon), float(lat))
+        try:
+            res = water_body_index.locate(float(lon), float(lat))
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": "'lat' and 'lon' must be numbers!"})
+
+        return Response(status=status.HTTP_200_OK, data=res)
+
+    @swagger_auto_schema(
+        request_body=CoordinatesSerializer,
+        responses={'200': 'OK', '400': 'Bad Request'},
+        operation_id='WaterBodyLocationBatch',
+        operation_description='Get matching waterbodies for many coordinates'
+    )
+    def post(self, request, *args, **kwargs):
+        """
+            Get matching waterbody for each coordinate pair
+            Required body:
+                - coordinates: [[lon, lat], ...]
+        """
+
+        serializer = CoordinatesSerializer(data=request.data)
+        if not serializer.is_valid():
+            error_msg = "'coordinates' must be a list of [lon, lat] pairs!"
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        coordinates = [tuple(pair) for pair in serializer.validated_data['coordinates']]
+        return Response(status=status.HTTP_200_OK, data=water_body_index.locate_many(coordinates))
 
-        water_body = SurfaceWaterBody.objects.filter(buffer200__intersects=point).first()
 
-        if not water_body:
-            res = None
-        else:
-            res = {'id': water_body.id, 'wb_code': water_body.wb_code, 'name': water_body.name}
+class PointResolution(APIView):
 
-        return Response(status=status.HTTP_200_OK, data=res)
+    MAX_POINTS = 10000
+
+    @swagger_auto_schema(
+        request_body=CoordinatesSerializer,
+        responses={'200': 'OK', '400': 'Bad Request'},
+        operation_id='PointResolution',
+        operation_description='Resolve waterbody, sub-basin, basin and closest node for many coordinates'
+    )
+    def post(self, request, *args, **kwargs):
+        """
+            Resolve waterbody, sub-basin, basin and closest node (with monthly flows) for each coordinate pair
+            Required body:
+                - coordinates: [[lon, lat], ...]
+        """
+
+        coordinates = request.data.get('coordinates') if isinstance(request.data, dict) else None
+
+        # checked before validation, validating a huge list is expensive
+        if isinstance(coordinates, list) and len(coordinates) > self.MAX_POINTS:
+            error_msg = "At most {} coordinates are allowed per request!".format(self.MAX_POINTS)
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        serializer = CoordinatesSerializer(data=request.data)
+        if not serializer.is_valid():
+            error_msg = "'coordinates' must be a list of [lon, lat] pairs!"
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        coordinates = [tuple(pair) for pair in serializer.validated_data['coordinates']]
+        return Response(status=status.HTTP_200_OK, data=resolve_points(coordinates))
 
 
-class GaugingStationList(generics.ListAPIView):
+class GaugingStationList(CachedLayerMixin, generics.ListAPIView):
+    layers = ('gauging-stations', 'water-bodies')
     serializer_class = GaugingStationSerializer
     queryset = GaugingStation.objects.all()
     filter_backends = (filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend)
@@ -295,7 +574,141 @@ class GaugingStationList(generics.ListAPIView):
     ordering = ('name', 'water_body')
 
 
-class WaterBodyNodeList(generics.ListAPIView):
+class GaugingStationWaterHeights(APIView):
+    permission_classes = [WaterHeightPermission]
+
+    MAX_READINGS = 10000
+    MAX_BUCKETS = 10000
+    BUCKET_HOURS = {'hour': 1, 'day': 24, 'month': 24 * 28}
+
+    def parse_datetime_param(self, name, default):
+        value = self.request.query_params.get(name)
+        if not value:
+            return default
+
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            # well formed, but not a valid datetime (e.g. month 13)
+            parsed = None
+        if parsed is None:
+            raise ValidationError({"error": "'{}' must be an ISO 8601 datetime!".format(name)})
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    @swagger_auto_schema(
+        responses={'200': 'OK', '400': 'Bad Request'},
+        operation_id='GaugingStationWaterHeights',
+        operation_description='Get min/mean/max water height per time bucket for gauging station'
+    )
+    def get(self, request, *args, **kwargs):
+        """
+            Get water height aggregated per bucket for gauging station defined by <id> portion of the url.
+            Optional params:
+                - bucket (hour, day or month; default day)
+                - start (ISO 8601 datetime; default 30 days before end)
+                - end (ISO 8601 datetime; default now)
+        """
+
+        station = get_object_or_404(GaugingStation, pk=self.kwargs['pk'])
+
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in BUCKETS:
+            error_msg = "'bucket' must be one of: {}".format(', '.join(BUCKETS))
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        end = self.parse_datetime_param('end', timezone.now())
+        start = self.parse_datetime_param('start', end - timedelta(days=30))
+
+        if start >= end:
+            error_msg = "'start' must be before 'end'!"
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        if (end - start).total_seconds() / 3600 / self.BUCKET_HOURS[bucket] > self.MAX_BUCKETS:
+            error_msg = "At most {} buckets are allowed per request, use a larger bucket!".format(self.MAX_BUCKETS)
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        return Response(status=status.HTTP_200_OK, data=get_water_height_series(station, bucket, start, end))
+
+    @swagger_auto_schema(
+        request_body=WaterHeightSerializer(many=True),
+        responses={'201': 'Created', '400': 'Bad Request'},
+        operation_id='GaugingStationWaterHeightsIngest',
+        operation_description='Store water height readings for gauging station'
+    )
+    def post(self, request, *args, **kwargs):
+        """
+            Store water height readings for gauging station defined by <id> portion of the url.
+            Readings of already stored timestamps are replaced.
+            Required body:
+                - [{"measured_on": ISO 8601 datetime, "value": float}, ...]
+        """
+
+        station = get_object_or_404(GaugingStation, pk=self.kwargs['pk'])
+
+        if not isinstance(request.data, list):
+            error_msg = "List of readings is required!"
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        if len(request.data) > self.MAX_READINGS:
+            error_msg = "At most {} readings are allowed per request!".format(self.MAX_READINGS)
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        serializer = WaterHeightSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        count = ingest_water_heights(
+            station, [(reading['measured_on'], reading['value']) for reading in serializer.validated_data])
+
+        return Response(status=status.HTTP_201_CREATED, data={"stored": count})
+
+
+class WaterHeightIngest(APIView):
+    permission_classes = [WaterHeightPermission]
+
+    CONTENT_TYPES = {
+        'text/csv': 'csv',
+        'application/x-ndjson': 'ndjson',
+    }
+
+    @swagger_auto_schema(
+        responses={'200': 'OK', '400': 'Bad Request', '403': 'Forbidden'},
+        operation_id='WaterHeightIngest',
+        operation_description='Load water height readings of many gauging stations from CSV or NDJSON'
+    )
+    def post(self, request, *args, **kwargs):
+        """
+            Load water height readings of many gauging stations. Readings of already stored
+            (station, measured_on) pairs are replaced, invalid readings are rejected.
+            Required body (Content-Type text/csv or application/x-ndjson), one reading per line:
+                - station (gauging station ID)
+                - measured_on (ISO 8601 datetime)
+                - value
+        """
+
+        fmt = self.CONTENT_TYPES.get(request.content_type.split(';')[0].strip())
+        if fmt is None:
+            error_msg = "Content-Type must be one of: {}".format(', '.join(self.CONTENT_TYPES.keys()))
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        try:
+            lines = request.body.decode('utf-8').splitlines()
+        except UnicodeDecodeError:
+            error_msg = "Body must be UTF-8 encoded!"
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        batches = list(load_water_heights(iter_records(lines, fmt)))
+
+        return Response(status=status.HTTP_200_OK, data={
+            'accepted': sum(batch['accepted'] for batch in batches),
+            'rejected': sum(batch['rejected'] for batch in batches),
+            'batches': batches
+        })
+
+
+class WaterBodyNodeList(CachedLayerMixin, generics.ListAPIView):
+    layers = ('waterbody-nodes', )
     serializer_class = WaterBodyNodeSerializer
     queryset = WaterBodyNode.objects.all()
 
@@ -305,7 +718,14 @@ class WaterBodyNodeFlowMeasurements(generics.ListAPIView):
 
     def get_queryset(self):
         node_obj = get_object_or_404(WaterBodyNode, pk=self.kwargs['pk'])
-        return NodeFlowMeasurement.objects.filter(node=node_obj)
+
+        # statistics computed from daily flows replace the imported measurement of the same month
+        return (
+            NodeFlowMeasurement.objects
+            .filter(node=node_obj)
+            .order_by('month', '-computed')
+            .distinct('month')
+        )
 
 
 class WaterBodyOtherLicenses(APIView):
@@ -330,43 +750,38 @@ class WaterBodyOtherLicenses(APIView):
 
         try:
             permit = Permit.objects.get(pk=permit_id)
-        except AbstractionPoint.DoesNotExist:
+        except (Permit.DoesNotExist, ValueError):
             error_msg = "Permit with that ID doesn't exist."
             return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
 
-        ap = permit.abstraction_points.all().first()
-
-        # get other approved abstraction points for this waterbody
-        other_aps = AbstractionPoint.objects.filter(approved=True, water_body=waterbody_obj).exclude(pk=ap.id)
-
-        # # # get other permits based on those other abstraction points # # #
-
-        other_permits = []
-
-        for obj in other_aps:
-            # get permits that uses this abstraction point (but exclude ref permit)
-            permits = obj.permit_abstraction_points.all().exclude(pk=permit_id)
-            for permit in permits:
-                other_permits.append(permit)
-
-        total_m3 = {
-            '1': 0,
-            '2': 0,
-            '3': 0,
-            '4': 0,
-            '5': 0,
-            '6': 0,
-            '7': 0,
-            '8': 0,
-            '9': 0,
-            '10': 0,
-            '11': 0,
-            '12': 0
-        }
-
-        for obj in other_permits:
-            values = obj.abstraction_m3_per_month
-            for k, v in values.items():
-                total_m3[k] += v
-
-        return Response(status=status.HTTP_200_OK, data=total_m3)
+        totals = get_allocated_totals([waterbody_obj.id], permit=permit)[waterbody_obj.id]
+
+        return Response(status=status.HTTP_200_OK, data=totals['m3'])
+
+
+class WaterBodyBalance(APIView):
+
+    @swagger_auto_schema(
+        responses={'200': 'OK', '400': 'Bad Request'},
+        operation_id='WaterBodyBalance',
+        operation_description='Get allocated monthly totals and remaining WAFU headroom for waterbody'
+    )
+    def get(self, request, *args, **kwargs):
+        """
+            Get allocated monthly totals and headroom for waterbody defined by <id> portion of the url.
+            Optional params:
+                - permit_id (reference permit, excluded from the totals)
+        """
+
+        waterbody_obj = get_object_or_404(SurfaceWaterBody, pk=self.kwargs['pk'])
+        permit_id = self.request.query_params.get('permit_id')
+
+        permit = None
+        if permit_id:
+            try:
+                permit = Permit.objects.get(pk=permit_id)
+            except (Permit.DoesNotExist, ValueError):
+                error_msg = "Permit with that ID doesn't exist."
+                return Response(status=status.HTTP_400_BAD_REQUEST, data={"error": error_msg})
+
+        return Response(status=status.HTTP_200_OK, data=get_water_balance(waterbody_obj, permit=permit))